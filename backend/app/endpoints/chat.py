@@ -1,54 +1,138 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, File, UploadFile
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, File, UploadFile, BackgroundTasks, HTTPException, Query
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 import os
 
 from app.worker import name_chat
 from inference.videorag import VideoRAG
-from app.utils.status_updates import getWebSocketMessageSender
+from inference.executors import database_executor, retrieval_executor
+from app.utils.status_updates import getWebSocketMessageSender, getWebSocketBytesSender
+from app.utils.stream_coalescer import StreamCoalescer, STREAM_PROTOCOLS
+from utils.tracing import start_trace, REQUEST_SECONDS
 
 router = APIRouter()
 video_rag = VideoRAG()
 
+async def handle_chat_request(request_data: Dict[str, Any], send_client, send_bytes, stream_protocol: str):
+    """Answer one chat message, streaming the response to the client."""
+    chat_id = request_data.get("chat_id")
+    message = request_data.get("message")
+    think = request_data.get("think", False)
+    video_names = request_data.get("video_names", [])
+    model = request_data.get("model")
+    video_mode = request_data.get("video_mode", "")
+    files = request_data.get("files", [])
+
+    if not chat_id or not message:
+        error_data = {"chat_id": chat_id, "type": "error", "content": "Invalid request data: missing chat_id or messages"}
+        await send_client(**error_data)
+        return
+
+    kind = "files" if files else "video" if video_names else "chat"
+    with start_trace() as trace:
+        outcome = "error"
+        try:
+            if await database_executor.run(video_rag.chat_history.ensure_chat, chat_id):
+                # Run name_chat in background (can run simultaneously with video processing)
+                asyncio.create_task(name_chat(chat_id, message))
+            
+            # Get the generator from video_rag.ask() and iterate through it
+            if files:
+                response_generator = await video_rag.ask_with_files(message, files, chat_id, model, think, send_client=send_client)
+            else:
+                response_generator = await video_rag.ask(message, video_names, chat_id, model, think, video_mode, send_client=send_client)
+            
+            # Clients that ask for it get the request's spans and generation stats with the done frame
+            done_fields = (lambda: {"trace": trace.to_dict()}) if request_data.get("trace") else None
+            try:
+                async with StreamCoalescer(send_client, send_bytes, protocol=stream_protocol, done_fields=done_fields) as stream:
+                    async for response_data in response_generator:
+                        await stream.send(response_data)
+            finally:
+                # A cancelled send leaves the generator suspended, closing it stores the partial answer
+                await response_generator.aclose()
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            REQUEST_SECONDS.observe(trace.elapsed(), kind=kind, outcome=outcome)
+
+async def handle_search_request(request_data: Dict[str, Any], send_client):
+    """Corpus-wide search over every ingested video."""
+    query = request_data.get("query", "")
+    results = await retrieval_executor.run(video_rag.context_extractor.search_library, query, request_data.get("limit", 10)) if query else []
+    await send_client(type="search_results", query=query, results=results, done=True)
+
 @router.websocket("/ws")
 async def websocket_chat(websocket: WebSocket):
-    send_client = getWebSocketMessageSender(websocket)
+    send_lock = asyncio.Lock()
+    send_client = getWebSocketMessageSender(websocket, send_lock)
+    send_bytes = getWebSocketBytesSender(websocket, send_lock)
+    stream_protocol = "json"
+
+    # Requests run as tasks so the connection keeps listening for "stop" while answering
+    active_chat_request: Optional[asyncio.Task] = None
+    active_chat_id = None
+    request_tasks = set()
+
+    def run_request(coro) -> asyncio.Task:
+        async def run():
+            try:
+                await coro
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Chat request failed: {e}")
+                await send_client(type="error", content=str(e), done=True)
+
+        task = asyncio.create_task(run())
+        request_tasks.add(task)
+        task.add_done_callback(request_tasks.discard)
+        return task
+
+    async def cancel_active_chat_request() -> bool:
+        if active_chat_request is None or active_chat_request.done():
+            return False
+        # Cancelling aborts the Ollama stream and pending pipeline stages, and the partial answer is stored
+        active_chat_request.cancel()
+        await asyncio.gather(active_chat_request, return_exceptions=True)
+        return True
+
     await websocket.accept()
     try:
         while True:
             data = await websocket.receive_text()
             request_data = json.loads(data)
 
-            chat_id = request_data.get("chat_id")
-            message = request_data.get("message")
-            think = request_data.get("think", False)
-            video_names = request_data.get("video_names", [])
-            model = request_data.get("model")
-            video_mode = request_data.get("video_mode", "")
-            files = request_data.get("files", [])
-
-            if not chat_id or not message:
-                error_data = {"chat_id": chat_id, "type": "error", "content": "Invalid request data: missing chat_id or messages"}
-                await send_client(**error_data)
+            # Clients opt in to the compact stream encoding once per connection
+            if request_data.get("type") == "negotiate":
+                requested = request_data.get("stream_protocol", "json")
+                stream_protocol = requested if requested in STREAM_PROTOCOLS else "json"
+                await send_client(type="negotiated", stream_protocol=stream_protocol)
                 continue
 
-            if chat_id == video_rag.chat_history.get_new_chat_id():
-                video_rag.chat_history.create_chat(chat_id=chat_id)
-                # Run name_chat in background (can run simultaneously with video processing)
-                asyncio.create_task(name_chat(chat_id, message))
-            
-            # Get the generator from video_rag.ask() and iterate through it
-            if files:
-                response_generator = await video_rag.ask_with_files(message, files, chat_id, model, think, send_client=send_client)
-            else:
-                response_generator = await video_rag.ask(message, video_names, chat_id, model, think, video_mode, send_client=send_client)
-            
-            async for response_data in response_generator:
-                await send_client(**response_data)
+            if request_data.get("type") == "search":
+                run_request(handle_search_request(request_data, send_client))
+                continue
+
+            # Stopping, or asking something new, ends the answer in progress
+            if await cancel_active_chat_request():
+                await send_client(chat_id=active_chat_id, type="markdown", content="", done=True, cancelled=True)
+            if request_data.get("type") == "stop":
+                continue
+
+            active_chat_id = request_data.get("chat_id")
+            active_chat_request = run_request(handle_chat_request(request_data, send_client, send_bytes, stream_protocol))
 
     except WebSocketDisconnect:
         print("WebSocket connection closed")
+    finally:
+        # Nobody is listening anymore, so free the model for other clients
+        for task in list(request_tasks):
+            task.cancel()
+        await asyncio.gather(*request_tasks, return_exceptions=True)
 
 @router.get("/local_models")
 async def get_local_models():
@@ -60,45 +144,90 @@ async def get_local_models():
 
 @router.get("/get_chats")
 async def get_chats():  
-    chats = video_rag.chat_history.get_chats()
+    chats = await database_executor.run(video_rag.chat_history.get_chats)
     return {"chats": chats}
 
 @router.get("/get_messages")
 async def get_messages(chat_id: int):
-    messages = video_rag.chat_history.get_history(chat_id)
+    messages = await database_executor.run(video_rag.chat_history.get_history, chat_id)
     return {"messages": messages}
 
+@router.get("/chats")
+async def list_chats_page(before_updated: Optional[str] = None, before_id: Optional[int] = None, limit: int = Query(50, ge=1, le=200)):
+    """List chat sessions by most recent update, one page at a time."""
+    return await database_executor.run(video_rag.chat_history.get_chats_page, before_updated, before_id, limit)
+
+@router.get("/messages")
+async def list_messages_page(
+    chat_id: int,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_thinking: bool = True
+):
+    """List the messages of a chat one page at a time, the most recent page first."""
+    return await database_executor.run(video_rag.chat_history.get_messages_page, chat_id, before, after, limit, include_thinking)
+
+@router.get("/message")
+async def get_message(chat_id: int, message_id: int):
+    """Get a single message, e.g. thinking content left out of a page."""
+    message = await database_executor.run(video_rag.chat_history.get_message, chat_id, message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
 @router.delete("/delete_chat")
 async def delete_chat(chat_id: int):
-    video_rag.chat_history.delete_chat(chat_id)
+    await database_executor.run(video_rag.chat_history.delete_chat, chat_id)
     return {"message": "Chat deleted successfully"}
 
 @router.post("/create_chat")
 async def create_chat():
     """Create a new chat session and return its ID."""
-    chat_id = video_rag.chat_history.get_new_chat_id()
+    chat_id = await database_executor.run(video_rag.chat_history.get_new_chat_id)
     return {"chat_id": chat_id, "message": "Chat created successfully"}
 
 @router.put("/update_chat_name")
 async def update_chat_name(chat_id: int, new_name: str):
     """Update the name of a chat session."""
-    video_rag.chat_history.update_chat_name(chat_id, new_name)
+    await database_executor.run(video_rag.chat_history.update_chat_name, chat_id, new_name)
     return {"message": "Chat name updated successfully"}
 
 @router.post("/upload_file")
 async def upload_file(file: UploadFile = File(...)):
     """Upload a file to the server."""
-    await video_rag.save_file(file)
-    return {"message": "File uploaded successfully"}
+    content_hash = await video_rag.save_file(file)
+    return {"message": "File uploaded successfully", "content_hash": content_hash}
 
 @router.post("/update_planner_model")
-async def update_planner_model(model_name: str):
-    """Update the planner model in the ollama client."""
+async def update_planner_model(model_name: str, background_tasks: BackgroundTasks):
+    """Update the planner model in the ollama client and preload it."""
     if model_name:
         video_rag.ollama_client.planner_llm = model_name
+        background_tasks.add_task(video_rag.ollama_client.warm_up, [model_name])
     print(f"Planner model updated to: {model_name}")
     return {"message": "Planner model updated successfully"}
 
+@router.post("/preload_model")
+async def preload_model(model_name: str, background_tasks: BackgroundTasks):
+    """Load the selected answer model ahead of the first question."""
+    background_tasks.add_task(video_rag.ollama_client.warm_up, [model_name])
+    return {"message": "Model preload scheduled"}
+
+@router.put("/answer_cache")
+async def update_answer_cache(enabled: bool):
+    """Enable or disable the semantic cache of final answers."""
+    video_rag.answer_cache.enabled = enabled
+    if not enabled:
+        video_rag.answer_cache.clear()
+    return {"message": f"Answer cache {'enabled' if enabled else 'disabled'}"}
+
+@router.put("/answer_cache_opt_out")
+async def update_answer_cache_opt_out(chat_id: int, opt_out: bool = True):
+    """Exclude a chat from the answer cache, or include it again."""
+    await database_executor.run(video_rag.chat_history.set_answer_cache_opt_out, chat_id, opt_out)
+    return {"message": "Answer cache preference updated successfully"}
+
 @router.get("/get_model_capabilities")
 async def get_model_capabilities(model_name: str):
     """Get the capabilities of a model."""
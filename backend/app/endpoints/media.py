@@ -1,35 +1,50 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
+import asyncio
+import json
 import os
-import shutil
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
-from preprocessing.download_video import is_youtube_video_downloadable, download_youtube_video
-from app.worker import process_video
+from preprocessing.download_video import is_youtube_video_downloadable
+from app.worker import process_video, youtube_import_jobs, download_pool
+from app.utils.progress_bus import progress_bus
+from inference.videorag import VideoRAG
+from inference.executors import retrieval_executor, database_executor
 from preprocessing.store_metadata import (
-    store_video_metadata, 
+    store_pending_video_metadata,
+    find_video_by_content_hash,
     get_video_metadata,
+    list_video_metadata,
     create_video_metadata_table,
 )
+from preprocessing.store_lexical_index import create_lexical_index_table
+from preprocessing.store_video_summaries import create_video_summary_table
 from preprocessing.ingest_video import delete_video_files
 from utils.sanitize_filename import sanitize_filename
+from utils.streaming_upload import PARTIAL_SUFFIX, save_upload
 
 router = APIRouter()
+video_rag = VideoRAG()
 
 ALLOWED_EXTENSIONS = {'mp4'}
 UPLOAD_DIR = os.path.abspath("./data/videos")
 THUMBNAIL_DIR = os.path.abspath("./data/thumbnails")
+# Idle progress streams send a keepalive this often, so proxies keep them open
+PROGRESS_KEEPALIVE_SEC = 15
 
 create_video_metadata_table()
+create_lexical_index_table()
+create_video_summary_table()
 
 class VideoResponse(BaseModel):
     status: str
     message: str
 
 class VideoDetails(BaseModel):
+    video_id: Optional[int] = None
     filename: str
     upload_time: datetime
     is_processed: bool
@@ -39,44 +54,103 @@ class VideoDetails(BaseModel):
     task_progress: Optional[int] = None
     thumbnail_path: Optional[str] = None    
 
+class YouTubeImportResponse(BaseModel):
+    status: str
+    message: str
+    job_id: str
+    filename: str
+
+class YouTubeImportJob(BaseModel):
+    job_id: str
+    url: str
+    status: str
+    video_name: Optional[str] = None
+
 class YouTubeCheckResponse(BaseModel):
     downloadable: bool
     url: str
 
+class SearchTimestamp(BaseModel):
+    modality: str
+    ts_start: float
+    ts_end: float
+    text: str
+
+class SearchResult(BaseModel):
+    video_name: str
+    score: float
+    best_timestamps: List[SearchTimestamp]
+
 @router.get("/videos", response_model=List[VideoDetails])
-async def list_uploaded_videos():
+async def list_uploaded_videos(
+    status: Optional[str] = Query(None, description="Only list videos with this task status"),
+    before_id: Optional[int] = Query(None, description="video_id of the last video of the previous page"),
+    limit: int = Query(500, ge=1, le=1000)
+):
     """
-    List all uploaded videos and their processing status
+    List uploaded videos and their processing status, most recently uploaded first
     """
-    if not os.path.exists(UPLOAD_DIR):
-        return []
-        
-    videos = []
-    for filename in os.listdir(UPLOAD_DIR):
-        if not any(filename.endswith(ext) for ext in ALLOWED_EXTENSIONS):
-            continue
-            
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        file_stat = os.stat(file_path)
-        
-        # Get metadata from database
-        metadata = get_video_metadata(file_path)
-        
-        video_info = VideoDetails(
-            filename=filename,
-            upload_time=datetime.fromtimestamp(file_stat.st_mtime),
-            is_processed=metadata is not None,
-            duration=metadata.get('duration') if metadata else None,
-            task_id=metadata.get('task_id') if metadata else None,
-            task_status=metadata.get('task_status') if metadata else None,
-            task_progress=metadata.get('task_progress') if metadata else None,
-            thumbnail_path=get_thumbnail_url(metadata.get('thumbnail_path')) if metadata else None
-        )
-        videos.append(video_info)
+    rows = await database_executor.run(list_video_metadata, status, before_id, limit)
 
-    # Sort by upload time, newest first
-    videos.sort(key=lambda x: x.upload_time, reverse=True)
-    return videos
+    return [VideoDetails(
+        video_id=metadata["id"],
+        filename=os.path.basename(metadata["video_path"]),
+        # SQLite CURRENT_TIMESTAMP is in UTC
+        upload_time=datetime.strptime(metadata["created_at"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc),
+        is_processed=True,
+        duration=metadata["duration"],
+        task_id=metadata["task_id"],
+        task_status=metadata["task_status"],
+        task_progress=metadata["task_progress"],
+        thumbnail_path=get_thumbnail_url(metadata["thumbnail_path"])
+    ) for metadata in rows]
+
+@router.get("/progress/stream")
+async def stream_ingest_progress():
+    """Stream ingest progress events as server-sent events."""
+    async def event_stream():
+        async with progress_bus.subscribe() as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=PROGRESS_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/progress/ws")
+async def websocket_ingest_progress(websocket: WebSocket):
+    """Push ingest progress events over a websocket."""
+    await websocket.accept()
+
+    async def forward_events():
+        async with progress_bus.subscribe() as queue:
+            while True:
+                await websocket.send_json(await queue.get())
+
+    # The client never sends anything, receiving only detects the disconnect
+    forward_task = asyncio.create_task(forward_events())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        forward_task.cancel()
+        await asyncio.gather(forward_task, return_exceptions=True)
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_videos(q: str = Query(..., description="Search question"), limit: int = Query(10, ge=1, le=100)):
+    """
+    Search all ingested videos and return the best matching videos with their timestamps
+    """
+    return await retrieval_executor.run(video_rag.context_extractor.search_library, q, limit)
 
 @router.post("/upload/local_video", response_model=VideoResponse)
 async def upload_local_video(file: UploadFile = File(...), background_tasks: BackgroundTasks = BackgroundTasks()):
@@ -84,24 +158,44 @@ async def upload_local_video(file: UploadFile = File(...), background_tasks: Bac
         if not any(file.filename.endswith(ext) for ext in ALLOWED_EXTENSIONS):
             raise HTTPException(status_code=400, detail="Invalid file extension")
             
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
         # Sanitize the filename to handle special characters
         sanitized_filename = sanitize_filename(file.filename)
         file_path = os.path.join(UPLOAD_DIR, sanitized_filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Start video processing task
         task_id = str(uuid.uuid4())
-        
-        # Store initial metadata with task info
-        store_video_metadata(
+        loop = asyncio.get_running_loop()
+
+        # Received under a temporary name, an ingested video is only replaced once the upload is accepted
+        staging_path = f"{file_path}.{task_id}{PARTIAL_SUFFIX}"
+        content_hash, _ = await save_upload(file, staging_path)
+
+        try:
+            # The same contents uploaded again are not ingested twice
+            existing = await database_executor.run(find_video_by_content_hash, content_hash)
+            if existing is not None and existing["task_status"] != "Failed" and os.path.exists(existing["video_path"]):
+                return VideoResponse(
+                    status="duplicate",
+                    message=f"Video already uploaded as {os.path.basename(existing['video_path'])}"
+                )
+
+            # Different contents must not replace a video that is ingested or being ingested
+            same_name = await database_executor.run(get_video_metadata, file_path)
+            if same_name is not None and same_name["task_status"] != "Failed" and os.path.exists(file_path):
+                raise HTTPException(status_code=409, detail=f"A different video named {sanitized_filename} already exists")
+
+            await loop.run_in_executor(None, os.replace, staging_path, file_path)
+        finally:
+            # Left behind only when the upload was rejected
+            if os.path.exists(staging_path):
+                await loop.run_in_executor(None, os.remove, staging_path)
+
+        # Metadata is extracted by the ingest worker, only register the video here
+        await database_executor.run(
+            store_pending_video_metadata,
             video_path=file_path,
-            audio_path="",  # Will be updated during processing
             task_id=task_id,
             task_status="Pending",
-            task_progress=0
+            task_progress=0,
+            content_hash=content_hash
         )
 
         background_tasks.add_task(process_video, file_path, 1.0, task_id)
@@ -110,53 +204,52 @@ async def upload_local_video(file: UploadFile = File(...), background_tasks: Bac
             status="success",
             message="Video uploaded successfully"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/check_youtube_video", response_model=YouTubeCheckResponse)
 async def check_youtube_video(url: str = Query(..., description="YouTube video URL")):
     return {
-        "downloadable": is_youtube_video_downloadable(url), 
+        # A network round trip, run next to the downloads rather than on the event loop
+        "downloadable": await asyncio.get_running_loop().run_in_executor(download_pool, is_youtube_video_downloadable, url),
         "url": url
     }
 
-@router.post("/upload/youtube_video", response_model=VideoResponse)
-async def upload_youtube_video(url: str = Query(..., description="YouTube video URL"), background_tasks: BackgroundTasks = BackgroundTasks()):
+@router.post("/upload/youtube_video", response_model=YouTubeImportResponse)
+async def upload_youtube_video(url: str = Query(..., description="YouTube video URL")):
+    """
+    Import a YouTube video in the background.
+
+    Returns once the video stream was found. Download and ingest progress are
+    reported on the progress stream under the returned filename.
+    """
+    job_id = youtube_import_jobs.start(url, UPLOAD_DIR)
     try:
-        downloaded_file_path = download_youtube_video(url, output_video_path=UPLOAD_DIR)
-        
-        # Sanitize the filename to handle special characters
-        original_filename = os.path.basename(downloaded_file_path)
-        sanitized_filename = sanitize_filename(original_filename)
-        
-        # Rename the file if needed
-        if original_filename != sanitized_filename:
-            sanitized_file_path = os.path.join(UPLOAD_DIR, sanitized_filename)
-            os.rename(downloaded_file_path, sanitized_file_path)
-            file_path = sanitized_file_path
-        else:
-            file_path = downloaded_file_path
-        
-        # Start video processing task
-        task_id = str(uuid.uuid4())
-    
-        # Store initial metadata with task info
-        store_video_metadata(
-            video_path=file_path,
-            audio_path="",  # Will be updated during processing
-            task_id=task_id,
-            task_status="Pending",
-            task_progress=0
-        )
-        
-        background_tasks.add_task(process_video, file_path, 1.0, task_id)
-        
-        return VideoResponse(
-            status="success",
-            message="Video uploaded successfully"
-        )
+        video_name = await youtube_import_jobs.wait_until_probed(job_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return YouTubeImportResponse(
+        status="success",
+        message="Video import started",
+        job_id=job_id,
+        filename=video_name
+    )
+
+@router.get("/youtube_imports", response_model=List[YouTubeImportJob])
+async def list_youtube_imports():
+    return youtube_import_jobs.list()
+
+@router.delete("/youtube_imports/{job_id}", response_model=VideoResponse)
+async def cancel_youtube_import(job_id: str):
+    if not youtube_import_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Import is not downloading")
+    return VideoResponse(
+        status="success",
+        message="Video import cancelled"
+    )
 
 def get_thumbnail_url(thumbnail_path: Optional[str]) -> Optional[str]:
     """Convert thumbnail file path to URL"""
@@ -182,6 +275,7 @@ async def delete_video(filename: str):
     try:
         video_path = os.path.join(UPLOAD_DIR, filename)
         delete_video_files(video_path)
+        video_rag.context_extractor.invalidate_video(filename)
         return VideoResponse(
             status="success",
             message="Video deleted successfully"
@@ -1,8 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.endpoints import chat, media
+from app.utils.loop_monitor import loop_lag_monitor
+from app.utils.progress_bus import progress_bus
+from inference.executors import retrieval_executor, database_executor
+from inference.videorag import VideoRAG
+from utils.tracing import metrics
 
-app = FastAPI()
+video_rag = VideoRAG()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_lag_monitor.start()
+    # Load the planner model in the background so the first question doesn't pay for it
+    warm_up_task = asyncio.create_task(video_rag.ollama_client.warm_up([video_rag.ollama_client.planner_llm]))
+    yield
+    warm_up_task.cancel()
+    await loop_lag_monitor.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,4 +36,28 @@ app.include_router(media.router, prefix="/media", tags=["media"])
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the Chrono API. Use /chat for chat functionalities."}
\ No newline at end of file
+    return {"message": "Welcome to the Chrono API. Use /chat for chat functionalities."}
+
+@app.get("/health")
+async def health():
+    """Report event loop lag, executor backlogs and cache statistics."""
+    return {
+        "event_loop_lag": loop_lag_monitor.stats(),
+        "executors": {
+            "retrieval": retrieval_executor.stats(),
+            "database": database_executor.stats(),
+        },
+        "retrieval_cache": video_rag.context_extractor.retrieval_cache.stats(),
+        "ollama": video_rag.ollama_client.stats(),
+        "answer_cache": video_rag.answer_cache.stats(),
+        "video_metadata_cache": video_rag.context_extractor.metadata_repository.stats(),
+        "ingest_progress": progress_bus.stats(),
+        "attachments": video_rag.upload_registry.stats(),
+        "pdf_index": video_rag.pdf_index.stats(),
+        "image_preparation": video_rag.image_preparer.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Export request latency metrics for Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
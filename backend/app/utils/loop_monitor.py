@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a fixed sleep.
+
+    Any blocking call on the loop shows up as lag, which delays every
+    other coroutine including all websocket token streams.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            self.samples += 1
+
+            if lag > self.warn_threshold:
+                print(f"Event loop lag: {lag * 1000:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_ms": round(self.last_lag * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+            "avg_ms": round(self.total_lag / self.samples * 1000, 2) if self.samples else 0.0,
+            "samples": self.samples,
+        }
+
+loop_lag_monitor = EventLoopLagMonitor()
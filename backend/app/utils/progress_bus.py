@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+
+# Events buffered per subscriber before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+# Task statuses after which a video has no further progress
+TERMINAL_STATUSES = {"Processed", "Failed", "Cancelled"}
+
+class ProgressEventBus:
+    """
+    Fans out ingest progress events to websocket and SSE subscribers.
+
+    Lives on the event loop. Worker threads publish through publish_threadsafe.
+    The latest event of every video still in progress is kept, so a new
+    subscriber starts from the current state instead of waiting for the next event.
+    Slow subscribers lose their oldest events rather than blocking publishers,
+    which is harmless since every event carries the full state of its video.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.latest: Dict[str, Dict[str, Any]] = {}
+
+    def publish(self, event: Dict[str, Any]):
+        video_name = event["video_name"]
+        if event.get("status") in TERMINAL_STATUSES:
+            self.latest.pop(video_name, None)
+        else:
+            self.latest[video_name] = event
+
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def publish_threadsafe(self, loop: asyncio.AbstractEventLoop, event: Dict[str, Any]):
+        loop.call_soon_threadsafe(self.publish, event)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Subscribe to progress events, starting with the latest event of every video in progress."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for event in list(self.latest.values())[-self.queue_size:]:
+            queue.put_nowait(event)
+
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "videos_in_progress": len(self.latest),
+        }
+
+progress_bus = ProgressEventBus()
@@ -1,19 +1,42 @@
 from fastapi import WebSocket
-from typing import List
+from typing import List, Optional
+import asyncio
 import json
 import os
 
-def getWebSocketMessageSender(websocket: WebSocket):
+def getWebSocketMessageSender(websocket: WebSocket, send_lock: Optional[asyncio.Lock] = None):
     """
     Returns a function that sends messages to the WebSocket connection.
     
     Args:
         websocket (WebSocket): The WebSocket connection.
+        send_lock (Optional[asyncio.Lock]): Lock shared with other senders of the same connection.
     
     Returns:
         Callable: A function that takes a message and sends it to the WebSocket.
     """
+    # Pipeline stages may report progress concurrently, so frames are serialized
+    send_lock = send_lock or asyncio.Lock()
+
     async def send_client(**kwargs):
-        await websocket.send_text(json.dumps(kwargs, ensure_ascii=False))
+        async with send_lock:
+            await websocket.send_text(json.dumps(kwargs, ensure_ascii=False))
     
-    return send_client
\ No newline at end of file
+    return send_client
+
+def getWebSocketBytesSender(websocket: WebSocket, send_lock: asyncio.Lock):
+    """
+    Returns a function that sends binary frames to the WebSocket connection.
+
+    Args:
+        websocket (WebSocket): The WebSocket connection.
+        send_lock (asyncio.Lock): Lock shared with the message sender of the same connection.
+
+    Returns:
+        Callable: A function that takes bytes and sends them to the WebSocket.
+    """
+    async def send_bytes(data: bytes):
+        async with send_lock:
+            await websocket.send_bytes(data)
+
+    return send_bytes
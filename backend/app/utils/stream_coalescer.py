@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+# Buffered content is flushed at least this often
+STREAM_FLUSH_INTERVAL_MS = 40
+# ... or as soon as this many bytes are buffered
+STREAM_FLUSH_BYTES = 2048
+
+# Stream protocols a client can negotiate
+STREAM_PROTOCOLS = ("json", "binary")
+# First byte of a binary frame, identifying its channel
+CHANNEL_CODES = {"thinking": b"t", "markdown": b"m"}
+
+class StreamCoalescer:
+    """
+    Coalesces streamed answer chunks into fewer websocket frames.
+
+    Content is buffered in arrival order, with consecutive chunks of the same
+    channel (thinking or markdown) merged, and flushed every STREAM_FLUSH_INTERVAL_MS
+    or once STREAM_FLUSH_BYTES are buffered. The first chunk is sent immediately so
+    time to first token is unaffected. With the "binary" protocol, content frames
+    are a channel byte followed by UTF-8 text, which skips JSON serialization;
+    control frames and the final done frame are always JSON. done_fields, if given,
+    adds fields to the done frame when it is sent.
+
+    Flushes are serialized by a lock, so a periodic flush that is still sending
+    never interleaves with content or the done frame that follow it.
+    """
+
+    def __init__(
+        self,
+        send_client: Callable,
+        send_bytes: Optional[Callable] = None,
+        protocol: str = "json",
+        flush_interval_ms: int = STREAM_FLUSH_INTERVAL_MS,
+        flush_bytes: int = STREAM_FLUSH_BYTES,
+        done_fields: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        if protocol not in STREAM_PROTOCOLS or protocol == "binary" and send_bytes is None:
+            raise ValueError(f"Unsupported stream protocol: {protocol}")
+
+        self.send_client = send_client
+        self.send_bytes = send_bytes
+        self.protocol = protocol
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_bytes = flush_bytes
+        self.done_fields = done_fields
+
+        self.chat_id = None
+        self.pending: List[List[str]] = []
+        self.pending_bytes = 0
+        self.sent_content = False
+        self.flush_task: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        self.frames_sent = 0
+        self.chunks_received = 0
+
+    async def __aenter__(self) -> "StreamCoalescer":
+        self.flush_task = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.flush_task is not None:
+            # Holding the lock, the periodic task is sleeping or waiting for the lock,
+            # never halfway through sending what it took from the buffer
+            async with self.flush_lock:
+                self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+        # Whatever is still buffered is delivered unless the connection failed
+        if exc_info[0] is None:
+            await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _send_content(self, channel: str, content: str):
+        if self.protocol == "binary":
+            await self.send_bytes(CHANNEL_CODES[channel] + content.encode("utf-8"))
+        else:
+            await self.send_client(chat_id=self.chat_id, type=channel, content=content, done=False)
+        self.frames_sent += 1
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            pending, self.pending, self.pending_bytes = self.pending, [], 0
+            for channel, content in pending:
+                await self._send_content(channel, content)
+            self.sent_content = True
+
+    async def send(self, response_data: Dict[str, Any]):
+        """
+        Queue a response chunk from VideoRAG._generate_response.
+
+        Args:
+            response_data (Dict[str, Any]): Chunk with "chat_id", "type", "content" and "done".
+                Chunks of other types are sent as they are, after the buffered content.
+        """
+        channel = response_data.get("type")
+        if channel not in CHANNEL_CODES:
+            await self.flush()
+            await self.send_client(**response_data)
+            return
+
+        self.chat_id = response_data.get("chat_id")
+        self.chunks_received += 1
+        content = response_data.get("content", "")
+        if content:
+            if self.pending and self.pending[-1][0] == channel:
+                self.pending[-1][1] += content
+            else:
+                self.pending.append([channel, content])
+            self.pending_bytes += len(content.encode("utf-8"))
+
+        if response_data.get("done"):
+            await self.flush()
+            extra = self.done_fields() if self.done_fields else {}
+            await self.send_client(chat_id=self.chat_id, type="markdown", content="", done=True, **extra)
+        elif not self.sent_content or self.pending_bytes >= self.flush_bytes:
+            await self.flush()
@@ -1,15 +1,85 @@
 from inference.videorag import VideoRAG
 from preprocessing.ingest_video import ingest_video
-from preprocessing.store_metadata import update_task_status
+from preprocessing.store_metadata import update_task_status, store_pending_video_metadata, delete_video_metadata
+from preprocessing.download_video import download_youtube_video, DownloadCancelled
 from inference.chat_history import ChatHistory
+from inference.executors import database_executor
+from app.utils.progress_bus import progress_bus, TERMINAL_STATUSES
 import asyncio
+import os
+import threading
+import time
 import uuid
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 
 video_rag = VideoRAG()
 thread_pool = ThreadPoolExecutor(max_workers=1)
+# Downloads have their own threads, so they never wait for or delay an ingest
+MAX_CONCURRENT_DOWNLOADS = 2
+download_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS)
+
+# Progress within a stage is persisted at most this often, stage changes always are
+PERSIST_INTERVAL_SEC = 5.0
+
+class IngestProgressReporter:
+    """
+    Reports the progress of one ingest task.
+
+    Every update is published on the progress bus with throughput and ETA.
+    SQLite is only written when the stage changes, or at most every
+    PERSIST_INTERVAL_SEC while a stage reports progress.
+    """
+
+    def __init__(self, video_path: str, task_id: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.video_path = video_path
+        self.video_name = os.path.basename(video_path)
+        self.task_id = task_id
+        self.loop = loop
+        self.started_at = time.monotonic()
+        self.last_status = None
+        self.last_persisted_at = 0.0
+
+    def _make_event(self, progress: int, status: str) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        # Percent per second over the whole task, which smooths out uneven stages
+        throughput = progress / elapsed if elapsed > 0 and progress > 0 else None
+        eta_sec = (100 - progress) / throughput if throughput else None
+        return {
+            "video_name": self.video_name,
+            "task_id": self.task_id,
+            "status": status,
+            "progress": progress,
+            "throughput": round(throughput, 3) if throughput else None,
+            "eta_sec": round(eta_sec, 1) if eta_sec is not None and status not in TERMINAL_STATUSES else None,
+            "elapsed_sec": round(elapsed, 1),
+        }
+
+    def _should_persist(self, status: str) -> bool:
+        now = time.monotonic()
+        if status != self.last_status or now - self.last_persisted_at >= PERSIST_INTERVAL_SEC:
+            self.last_status = status
+            self.last_persisted_at = now
+            return True
+        return False
+
+    def report(self, progress: int, status: str):
+        """Progress callback for ingest_video, called from the ingest thread."""
+        progress_bus.publish_threadsafe(self.loop, self._make_event(progress, status))
+        if self._should_persist(status):
+            update_task_status(video_path=self.video_path, task_id=self.task_id, task_status=status, task_progress=progress)
+
+    async def report_async(self, progress: int, status: str):
+        progress_bus.publish(self._make_event(progress, status))
+        if self._should_persist(status):
+            await database_executor.run(
+                update_task_status,
+                video_path=self.video_path,
+                task_id=self.task_id,
+                task_status=status,
+                task_progress=progress
+            )
 
 class VideoProcessingQueue:
     def __init__(self):
@@ -70,17 +140,14 @@ class VideoProcessingQueue:
         """
         Process a single video file
         """
+        loop = asyncio.get_running_loop()
+        reporter = IngestProgressReporter(video_path, task_id, loop)
+
         try:
             # Update status to indicate processing has started
-            update_task_status(
-                video_path=video_path,
-                task_id=task_id,
-                task_status="Processing",
-                task_progress=0
-            )
+            await reporter.report_async(0, "Processing")
             
             # Ingest video with progress updates
-            loop = asyncio.get_running_loop()
             video_filename = await loop.run_in_executor(
                 thread_pool,
                 ingest_video,
@@ -88,12 +155,7 @@ class VideoProcessingQueue:
                 video_rag.context_extractor.clip_embedder,
                 video_rag.context_extractor.whisper_embedder,
                 sample_interval_sec,
-                lambda progress, status: update_task_status(
-                    video_path=video_path,
-                    task_id=task_id,
-                    task_status=status,
-                    task_progress=progress
-                )
+                reporter.report
             )
 
             # Check if video_filename was returned successfully
@@ -102,24 +164,16 @@ class VideoProcessingQueue:
             
             # Refresh ChromaDB client to ensure it sees newly added embeddings
             video_rag.refresh_chroma_client()
+            video_rag.context_extractor.invalidate_video(video_filename)
+            video_rag.schedule_video_summary(video_filename)
             
             # Update final status
-            update_task_status(
-                video_path=video_path,
-                task_id=task_id,
-                task_status="Processed",
-                task_progress=100
-            )
+            await reporter.report_async(100, "Processed")
             
             return video_filename
         except Exception as e:
             # Update status to failed
-            update_task_status(
-                video_path=video_path,
-                task_id=task_id,
-                task_status="Failed",
-                task_progress=0
-            )
+            await reporter.report_async(0, "Failed")
             raise e
 
 video_processing_queue = VideoProcessingQueue()
@@ -131,6 +185,109 @@ async def process_video(video_path: str, sample_interval_sec: float = 1.0, task_
     """
     await video_processing_queue.add_task(video_path, sample_interval_sec, task_id)
 
+class YouTubeImportJobs:
+    """
+    Background YouTube imports.
+
+    A job downloads the video in chunks on the download pool, registers it as
+    soon as the stream lookup returns so it shows up in the video list, reports
+    download progress like an ingest and then queues the video for ingest.
+    Jobs can be cancelled until their download completes.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def start(self, url: str, output_video_path: str, sample_interval_sec: float = 1.0) -> str:
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "url": url,
+            "status": "Downloading",
+            "video_name": None,
+            "cancel_event": threading.Event(),
+            "probed": asyncio.get_running_loop().create_future(),
+        }
+        job["task"] = asyncio.create_task(self._run(job, output_video_path, sample_interval_sec))
+        self.jobs[job_id] = job
+        return job_id
+
+    async def wait_until_probed(self, job_id: str) -> str:
+        """Wait until the stream lookup of a job returned, and get the filename of the video."""
+        return await asyncio.shield(self.jobs[job_id]["probed"])
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job, returns False if it is unknown or its download already finished."""
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] != "Downloading":
+            return False
+        job["cancel_event"].set()
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {key: job[key] for key in ("job_id", "url", "status", "video_name")}
+            for job in self.jobs.values()
+        ]
+
+    async def _run(self, job: Dict[str, Any], output_video_path: str, sample_interval_sec: float):
+        loop = asyncio.get_running_loop()
+        reporter: Optional[IngestProgressReporter] = None
+
+        def on_probe(description: Dict[str, Any]):
+            nonlocal reporter
+            video_path = os.path.join(output_video_path, description["filename"])
+            job["video_name"] = description["filename"]
+            store_pending_video_metadata(
+                video_path,
+                task_id=job["job_id"],
+                task_status="Downloading",
+                task_progress=0,
+                duration=description["duration"]
+            )
+            reporter = IngestProgressReporter(video_path, job["job_id"], loop)
+            reporter.report(0, "Downloading")
+            loop.call_soon_threadsafe(job["probed"].set_result, description["filename"])
+
+        def on_progress(downloaded: int, total: int):
+            reporter.report(100 * downloaded // total if total else 0, "Downloading")
+
+        try:
+            video_path = await loop.run_in_executor(
+                download_pool,
+                download_youtube_video,
+                job["url"],
+                output_video_path,
+                on_progress,
+                job["cancel_event"],
+                on_probe
+            )
+        except DownloadCancelled as e:
+            job["status"] = "Cancelled"
+            if not job["probed"].done():
+                job["probed"].set_exception(e)
+            elif reporter is not None:
+                await reporter.report_async(0, "Cancelled")
+                await database_executor.run(delete_video_metadata, reporter.video_path)
+            return
+        except Exception as e:
+            print(f"Failed to download {job['url']}: {str(e)}")
+            job["status"] = "Failed"
+            if not job["probed"].done():
+                job["probed"].set_exception(e)
+            elif reporter is not None:
+                await reporter.report_async(0, "Failed")
+            return
+        finally:
+            # Finished jobs are only kept until their outcome was reported
+            loop.call_later(60, self.jobs.pop, job["job_id"], None)
+
+        job["status"] = "Queued"
+        await reporter.report_async(0, "Pending")
+        await process_video(video_path, sample_interval_sec, job["job_id"])
+
+youtube_import_jobs = YouTubeImportJobs()
+
 async def name_chat(chat_id: int, message: str):
     """
     Generate a name for a chat based on the first message
@@ -138,7 +295,7 @@ async def name_chat(chat_id: int, message: str):
     """
     try:
         new_name = await video_rag.ollama_client.get_chat_title(message)
-        video_rag.chat_history.update_chat_name(chat_id, new_name)
+        await database_executor.run(video_rag.chat_history.update_chat_name, chat_id, new_name)
         print(f"DEBUG: Updated chat name to {new_name}")
         return new_name
     except Exception as e:
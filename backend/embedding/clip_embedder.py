@@ -4,7 +4,7 @@ import clip
 from PIL import Image
 from torchvision import transforms as T
 from transformers import BlipProcessor, BlipForConditionalGeneration
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 import time
 
 from preprocessing.extract_frames import sample_frames
@@ -32,7 +32,8 @@ class ClipEmbedder:
     def embed_frames(
         self, 
         images: List[Image.Image],
-        sample_interval_sec: float
+        sample_interval_sec: float,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> List[Dict[str, float]]:
         """
         Embed a list of images using the CLIP model.
@@ -40,6 +41,8 @@ class ClipEmbedder:
         Args:
             images (List[Image.Image]): List of PIL Image objects.
             sample_interval_sec (float): Interval in seconds to sample frames.
+            progress_callback (Optional[Callable[[int, int], None]]): Called with the number
+                of embedded frames and the total after every batch.
 
         Returns:
             List[Dict[str, float]]: List of dictionaries containing start time, end time, and embeddings.
@@ -66,6 +69,9 @@ class ClipEmbedder:
                 all_embeddings.extend(emb.cpu().tolist())
                 all_captions.extend(captions)
 
+                if progress_callback:
+                    progress_callback(end, N)
+
         results = []
 
         for i in range(N):
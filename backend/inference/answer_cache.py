@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Minimum cosine similarity between questions for a cached answer to be reused
+SIMILARITY_THRESHOLD = 0.95
+# Seconds a cached answer stays valid
+ANSWER_TTL_SEC = 3600
+
+def fingerprint_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash the contents of an attached file, so renamed copies share cache entries and edits do not."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AnswerCache:
+    """
+    Bounded, TTL-limited semantic cache of final answers.
+
+    Entries are scoped by the model, thinking flag, system prompt and the
+    fingerprints of attached files, and matched within a scope by the cosine
+    similarity of the question embeddings. Disabled until explicitly enabled.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_sec: float = ANSWER_TTL_SEC, similarity_threshold: float = SIMILARITY_THRESHOLD, enabled: bool = False):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.next_entry_id = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_embedding(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def make_scope(model: str, think: bool, system_prompt: str, fingerprints: Iterable[str] = ()) -> Tuple:
+        system_prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        return (model, bool(think), system_prompt_hash, tuple(sorted(fingerprints)))
+
+    def _purge_expired(self, now: float):
+        expired = [entry_id for entry_id, entry in self.entries.items() if now - entry["created_at"] > self.ttl_sec]
+        for entry_id in expired:
+            del self.entries[entry_id]
+            self.evictions += 1
+
+    def lookup(self, scope: Tuple, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached answer to the most similar question in a scope.
+
+        Args:
+            scope (Tuple): Scope from make_scope.
+            embedding (np.ndarray): Normalized embedding of the question.
+
+        Returns:
+            Optional[Dict[str, Any]]: The entry with "question", "answer", "thinking"
+            and "similarity", or None if no question is similar enough.
+        """
+        with self.lock:
+            self._purge_expired(time.time())
+
+            candidates = [(entry_id, entry) for entry_id, entry in self.entries.items() if entry["scope"] == scope]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            similarities = np.stack([entry["embedding"] for _, entry in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id, entry = candidates[best]
+            self.entries.move_to_end(entry_id)
+            self.hits += 1
+            return {**entry, "similarity": float(similarities[best])}
+
+    def put(self, scope: Tuple, embedding: np.ndarray, question: str, answer: str, thinking: str = ""):
+        with self.lock:
+            self.entries[self.next_entry_id] = {
+                "scope": scope,
+                "embedding": embedding,
+                "question": question,
+                "answer": answer,
+                "thinking": thinking,
+                "created_at": time.time(),
+            }
+            self.next_entry_id += 1
+
+            self._purge_expired(time.time())
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+import fitz
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from inference.token_budget import estimate_tokens, truncate_to_tokens
+
+PDF_INDEX_DIR = "./data/pdf_index"
+# Target size of a chunk, pages are split at paragraph boundaries to stay under it
+PDF_CHUNK_TOKENS = 400
+# Chunks retrieved per question across all attached PDFs
+PDF_TOP_K = 12
+# Indexes kept in memory, the rest are loaded from disk on demand
+PDF_INDEX_CACHE_SIZE = 32
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+def chunk_pdf(file_path: str, chunk_tokens: int = PDF_CHUNK_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Split the text of a PDF into chunks that never span pages.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        chunk_tokens (int): Maximum estimated tokens per chunk.
+
+    Returns:
+        List[Dict[str, Any]]: Chunks in document order, each with its 1-based "page" and "text".
+    """
+    chunks = []
+    with fitz.open(file_path) as doc:
+        for page_number, page in enumerate(doc, start=1):
+            current, current_tokens = [], 0
+            for paragraph in _PARAGRAPH_SPLIT.split(page.get_text()):
+                paragraph = " ".join(paragraph.split())
+                if not paragraph:
+                    continue
+                # A single oversized paragraph is cut into pieces of its own
+                while estimate_tokens(paragraph) > chunk_tokens:
+                    piece = truncate_to_tokens(paragraph, chunk_tokens)
+                    cut = piece.rfind(" ")
+                    piece = piece[:cut] if cut > 0 else piece
+                    chunks.append({"page": page_number, "text": piece})
+                    paragraph = paragraph[len(piece):].strip()
+
+                tokens = estimate_tokens(paragraph) + 1
+                if current and current_tokens + tokens > chunk_tokens:
+                    chunks.append({"page": page_number, "text": "\n".join(current)})
+                    current, current_tokens = [], 0
+                current.append(paragraph)
+                current_tokens += tokens
+
+            if current:
+                chunks.append({"page": page_number, "text": "\n".join(current)})
+    return chunks
+
+class PdfAttachmentIndex:
+    """
+    Chunked, embedded text of attached PDFs, cached per file content hash.
+
+    A PDF is extracted, chunked and embedded once. The index is saved to
+    PDF_INDEX_DIR and kept in a bounded in-memory cache, so follow-up questions,
+    re-uploads and restarts skip extraction. Questions get the chunks most
+    similar to them that fit a token budget, in document order.
+    """
+
+    def __init__(self, embedder, index_dir: str = PDF_INDEX_DIR, cache_size: int = PDF_INDEX_CACHE_SIZE):
+        self.embedder = embedder
+        self.index_dir = index_dir
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.disk_loads = 0
+
+    def _paths(self, content_hash: str) -> Tuple[str, str]:
+        base = os.path.join(self.index_dir, content_hash)
+        return base + ".json", base + ".npy"
+
+    def _remember(self, content_hash: str, index: Dict[str, Any]):
+        with self.lock:
+            self.cache[content_hash] = index
+            self.cache.move_to_end(content_hash)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def get_or_build(self, file_path: str, content_hash: str) -> Dict[str, Any]:
+        """
+        Get the index of a PDF, building it on first use. Blocking, run it in an executor.
+
+        Args:
+            file_path (str): Path to the PDF file.
+            content_hash (str): SHA-256 of the file contents.
+
+        Returns:
+            Dict[str, Any]: The "chunks" of the PDF and their normalized "embeddings".
+        """
+        with self.lock:
+            if content_hash in self.cache:
+                self.cache.move_to_end(content_hash)
+                return self.cache[content_hash]
+
+        chunks_path, embeddings_path = self._paths(content_hash)
+        if os.path.exists(chunks_path) and os.path.exists(embeddings_path):
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            index = {"chunks": chunks, "embeddings": np.load(embeddings_path)}
+            self.disk_loads += 1
+        else:
+            chunks = chunk_pdf(file_path)
+            embeddings = np.asarray(
+                self.embedder.embed_documents([chunk["text"] for chunk in chunks]) if chunks else [],
+                dtype=np.float32
+            )
+            index = {"chunks": chunks, "embeddings": embeddings}
+            self.builds += 1
+
+            # Written under temporary names first, so a crash never leaves half an index
+            os.makedirs(self.index_dir, exist_ok=True)
+            np.save(embeddings_path + ".tmp.npy", embeddings)
+            with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            os.replace(embeddings_path + ".tmp.npy", embeddings_path)
+            os.replace(chunks_path + ".tmp", chunks_path)
+
+        self._remember(content_hash, index)
+        return index
+
+    def build_context(self, documents: List[Tuple[str, Dict[str, Any]]], question: str, token_budget: int, top_k: int = PDF_TOP_K) -> str:
+        """
+        Select the chunks of the attached PDFs that are relevant to a question.
+
+        PDFs that fit the budget as a whole are included completely. Otherwise
+        the top_k chunks most similar to the question are packed, best first,
+        until the budget is spent.
+
+        Args:
+            documents (List[Tuple[str, Dict[str, Any]]]): File paths of the PDFs with their indexes.
+            question (str): The question.
+            token_budget (int): Tokens the PDF context may take.
+            top_k (int): Maximum number of chunks retrieved.
+
+        Returns:
+            str: The context, one section per PDF with its chunks in page order.
+        """
+        candidates = [(doc_index, chunk_index) for doc_index, (_, index) in enumerate(documents) for chunk_index in range(len(index["chunks"]))]
+        chunk_tokens = {
+            (doc_index, chunk_index): estimate_tokens(documents[doc_index][1]["chunks"][chunk_index]["text"]) + 8
+            for doc_index, chunk_index in candidates
+        }
+
+        if sum(chunk_tokens.values()) <= token_budget:
+            selected = set(candidates)
+        else:
+            query_embedding = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+            scores = np.concatenate([index["embeddings"] @ query_embedding for _, index in documents if len(index["chunks"])])
+            selected, used = set(), 0
+            for position in np.argsort(-scores)[:top_k]:
+                candidate = candidates[int(position)]
+                if used + chunk_tokens[candidate] > token_budget:
+                    continue
+                selected.add(candidate)
+                used += chunk_tokens[candidate]
+
+        content = ""
+        for doc_index, (file_path, index) in enumerate(documents):
+            content += "\n\n" + f"=== PDF ({Path(file_path).stem}) ===\n"
+            for chunk_index, chunk in enumerate(index["chunks"]):
+                if (doc_index, chunk_index) in selected:
+                    content += f"[Page {chunk['page']}]\n{chunk['text']}\n"
+            content += "\n\n"
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.cache_size,
+                "builds": self.builds,
+                "disk_loads": self.disk_loads,
+            }
@@ -1,8 +1,11 @@
-import sqlite3
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
 
+from utils.sqlite_pool import SQLitePool
+
 DB_PATH = "./data/chat_history.db"
+# Upper bound for message IDs, used as the cursor of the most recent page
+MAX_MESSAGE_ID = 2 ** 63 - 1
 
 class ChatHistory:
     _instance = None
@@ -14,11 +17,12 @@ class ChatHistory:
 
     def __init__(self):
         self.db_path = DB_PATH
+        self.pool = SQLitePool.get(self.db_path)
         self._init_db()
 
     def _init_db(self):
         """Initialize the SQLite database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS chat_sessions (
@@ -38,134 +42,311 @@ class ChatHistory:
                     FOREIGN KEY (chat_id) REFERENCES chat_sessions(chat_id)
                 )
             """)
-            conn.commit()
-        
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_summaries (
+                    chat_id INTEGER PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    last_message_id INTEGER NOT NULL,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (chat_id) REFERENCES chat_sessions(chat_id)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS answer_cache_opt_outs (
+                    chat_id INTEGER PRIMARY KEY,
+                    FOREIGN KEY (chat_id) REFERENCES chat_sessions(chat_id)
+                )
+            """)
+            # Single-row counter handing out chat IDs before their sessions are created
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_id_sequence (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    next_id INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("""
+                INSERT OR IGNORE INTO chat_id_sequence (id, next_id)
+                SELECT 1, COALESCE(MAX(chat_id), 0) + 1 FROM chat_sessions
+            """)
+            # Message counts are maintained on write, backfilled once for older databases
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(chat_sessions)").fetchall()]
+            if "message_count" not in columns:
+                cursor.execute("ALTER TABLE chat_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+                cursor.execute("""
+                    UPDATE chat_sessions SET message_count = (
+                        SELECT COUNT(*) FROM chat_messages WHERE chat_messages.chat_id = chat_sessions.chat_id
+                    )
+                """)
+            # Per-chat reads walk the index in message order instead of scanning the table
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id_id ON chat_messages (chat_id, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_updated ON chat_sessions (last_updated)")
+
     def create_chat(self, chat_id: int, chat_name: Optional[str] = None) -> None:
         """Create a new chat session and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO chat_sessions (chat_id, chat_name) VALUES (?, ?)", (chat_id, chat_name))
-            conn.commit()
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO chat_sessions (chat_id, chat_name) VALUES (?, ?)", (chat_id, chat_name))
+            conn.execute("UPDATE chat_id_sequence SET next_id = MAX(next_id, ? + 1) WHERE id = 1", (chat_id,))
+
+    def ensure_chat(self, chat_id: int) -> bool:
+        """Create the session of a chat ID if it doesn't exist yet, and return whether it was created."""
+        with self.pool.transaction() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO chat_sessions (chat_id) VALUES (?)", (chat_id,))
+            conn.execute("UPDATE chat_id_sequence SET next_id = MAX(next_id, ? + 1) WHERE id = 1", (chat_id,))
+            return cursor.rowcount == 1
 
     def get_new_chat_id(self) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(chat_id) FROM chat_sessions")
-            max_id = cursor.fetchone()[0]
-        return max_id + 1 if max_id is not None else 1
-
-    def add_message(self, chat_id: int, role: str, content: str):
-        """Add a message to a specific chat session."""
-        print(f"DEBUG: Inserting message into DB - chat_id: {chat_id}, role: {role}, content: {content[:50]}...")
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO chat_messages (chat_id, role, content) VALUES (?, ?, ?)",
-                (chat_id, role, content)
-            )
-            # Update last_updated timestamp
-            cursor.execute(
-                "UPDATE chat_sessions SET last_updated = CURRENT_TIMESTAMP WHERE chat_id = ?",
-                (chat_id,)
+        """Allocate a chat ID. Concurrent callers always get distinct IDs."""
+        with self.pool.transaction() as conn:
+            next_id = conn.execute("SELECT next_id FROM chat_id_sequence WHERE id = 1").fetchone()[0]
+            conn.execute("UPDATE chat_id_sequence SET next_id = ? WHERE id = 1", (next_id + 1,))
+        return next_id
+
+    def add_messages(self, chat_id: int, messages: List[Tuple[str, str]]) -> List[int]:
+        """Add (role, content) messages to a chat session in one transaction and return their IDs."""
+        message_ids = []
+        with self.pool.transaction() as conn:
+            for role, content in messages:
+                cursor = conn.execute(
+                    "INSERT INTO chat_messages (chat_id, role, content) VALUES (?, ?, ?)",
+                    (chat_id, role, content)
+                )
+                message_ids.append(cursor.lastrowid)
+            # Update last_updated timestamp and the message count
+            conn.execute(
+                "UPDATE chat_sessions SET last_updated = CURRENT_TIMESTAMP, message_count = message_count + ? WHERE chat_id = ?",
+                (len(messages), chat_id)
             )
-            conn.commit()
-        print(f"DEBUG: Successfully inserted message with ID: {cursor.lastrowid}")
-    
+        return message_ids
+
+    def add_message(self, chat_id: int, role: str, content: str) -> int:
+        """Add a message to a specific chat session and return its ID."""
+        return self.add_messages(chat_id, [(role, content)])[0]
+
     def get_history(self, chat_id: int) -> List[Dict[str, str]]:
         """Get the chat history for a specific session."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT role, content FROM chat_messages WHERE chat_id = ? ORDER BY timestamp ASC",
-                (chat_id,)
-            )
-            rows = cursor.fetchall()
-            return [{"role": row[0], "content": row[1]} for row in rows]
+        cursor = self.pool.connection().execute(
+            "SELECT role, content FROM chat_messages WHERE chat_id = ? ORDER BY id ASC",
+            (chat_id,)
+        )
+        rows = cursor.fetchall()
+        return [{"role": row[0], "content": row[1]} for row in rows]
 
     def get_messages_for_llm(self, chat_id: int, limit: int = 15) -> List[Dict[str, str]]:
         """Get chat history formatted for LLM input."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT role, content 
-                FROM chat_messages 
-                WHERE chat_id = ? 
-                AND id IN (
-                    SELECT id 
-                    FROM chat_messages 
-                    WHERE chat_id = ? 
-                    AND role != 'thinking'
-                    ORDER BY timestamp DESC 
-                    LIMIT ?
-                )
-                ORDER BY timestamp ASC
+        cursor = self.pool.connection().execute("""
+            SELECT role, content
+            FROM chat_messages
+            WHERE chat_id = ? AND role != 'thinking'
+            ORDER BY id DESC
+            LIMIT ?
+        """,
+            (chat_id, limit)
+        )
+        rows = cursor.fetchall()
+        return [{"role": row[0], "content": row[1]} for row in reversed(rows)]
+
+    def get_messages_after(self, chat_id: int, message_id: int, limit: int = 30) -> List[Dict[str, Any]]:
+        """Get the most recent non-thinking messages newer than a message ID, oldest first."""
+        cursor = self.pool.connection().execute("""
+            SELECT id, role, content
+            FROM chat_messages
+            WHERE chat_id = ? AND id > ? AND role != 'thinking'
+            ORDER BY id DESC
+            LIMIT ?
+        """,
+            (chat_id, message_id, limit)
+        )
+        rows = cursor.fetchall()
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+
+    def get_summary(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Get the rolling conversation summary of a chat session."""
+        cursor = self.pool.connection().execute(
+            "SELECT summary, last_message_id FROM chat_summaries WHERE chat_id = ?",
+            (chat_id,)
+        )
+        row = cursor.fetchone()
+        return {"summary": row[0], "last_message_id": row[1]} if row else None
+
+    def save_summary(self, chat_id: int, summary: str, last_message_id: int):
+        """Store the rolling conversation summary covering messages up to `last_message_id`."""
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                INSERT INTO chat_summaries (chat_id, summary, last_message_id) VALUES (?, ?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    last_message_id = excluded.last_message_id,
+                    updated_at = CURRENT_TIMESTAMP
             """,
-                (chat_id, chat_id, limit)
+                (chat_id, summary, last_message_id)
             )
-            rows = cursor.fetchall()
-            return [{"role": row[0], "content": row[1]} for row in rows]
-    
+
+    def set_answer_cache_opt_out(self, chat_id: int, opt_out: bool):
+        """Exclude a chat from the answer cache, or include it again."""
+        with self.pool.transaction() as conn:
+            if opt_out:
+                conn.execute("INSERT OR IGNORE INTO answer_cache_opt_outs (chat_id) VALUES (?)", (chat_id,))
+            else:
+                conn.execute("DELETE FROM answer_cache_opt_outs WHERE chat_id = ?", (chat_id,))
+
+    def is_answer_cache_opted_out(self, chat_id: int) -> bool:
+        cursor = self.pool.connection().execute("SELECT 1 FROM answer_cache_opt_outs WHERE chat_id = ?", (chat_id,))
+        return cursor.fetchone() is not None
+
     def clear_history(self, chat_id: int):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
-            conn.commit()
-    
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
+            conn.execute("DELETE FROM chat_summaries WHERE chat_id = ?", (chat_id,))
+            conn.execute("UPDATE chat_sessions SET message_count = 0 WHERE chat_id = ?", (chat_id,))
+
     def delete_chat(self, chat_id: int):
         """Delete an entire chat session."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
-            cursor.execute("DELETE FROM chat_sessions WHERE chat_id = ?", (chat_id,))
-            conn.commit()
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
+            conn.execute("DELETE FROM chat_summaries WHERE chat_id = ?", (chat_id,))
+            conn.execute("DELETE FROM answer_cache_opt_outs WHERE chat_id = ?", (chat_id,))
+            conn.execute("DELETE FROM chat_sessions WHERE chat_id = ?", (chat_id,))
 
     def list_chats(self) -> List[Dict[str, Any]]:
         """List all chat sessions with their metadata."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    cs.chat_id,
-                    cs.chat_name,
-                    cs.created_at,
-                    cs.last_updated,
-                FROM chat_sessions cs
-                LEFT JOIN chat_messages cm ON cs.chat_id = cm.chat_id
-                GROUP BY cs.chat_id
-                ORDER BY cs.last_updated DESC
-            """)
+        cursor = self.pool.connection().execute("""
+            SELECT chat_id, chat_name, created_at, last_updated, message_count
+            FROM chat_sessions
+            ORDER BY last_updated DESC, chat_id DESC
+        """)
+        rows = cursor.fetchall()
+        return [{
+            "chat_id": row[0],
+            "chat_name": row[1],
+            "created_at": row[2],
+            "last_updated": row[3],
+            "message_count": row[4]
+        } for row in rows]
+
+    def get_chats_page(self, before_updated: Optional[str] = None, before_id: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Get one page of chat sessions, most recently updated first.
+
+        Args:
+            before_updated (Optional[str]): `last_updated` of the last chat of the previous page.
+            before_id (Optional[int]): `chat_id` of the last chat of the previous page.
+            limit (int): Maximum number of chats to return.
+
+        Returns:
+            Dict[str, Any]: The "chats" and the "next_cursor" to pass back for the
+            following page, which is None on the last page.
+        """
+        if before_updated is not None and before_id is not None:
+            cursor = self.pool.connection().execute("""
+                SELECT chat_id, chat_name, created_at, last_updated, message_count
+                FROM chat_sessions
+                WHERE (last_updated, chat_id) < (?, ?)
+                ORDER BY last_updated DESC, chat_id DESC
+                LIMIT ?
+            """, (before_updated, before_id, limit + 1))
+        else:
+            cursor = self.pool.connection().execute("""
+                SELECT chat_id, chat_name, created_at, last_updated, message_count
+                FROM chat_sessions
+                ORDER BY last_updated DESC, chat_id DESC
+                LIMIT ?
+            """, (limit + 1,))
+
+        rows = cursor.fetchall()
+        chats = [{
+            "chat_id": row[0],
+            "chat_name": row[1],
+            "created_at": row[2],
+            "last_updated": row[3],
+            "message_count": row[4]
+        } for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = {"before_updated": chats[-1]["last_updated"], "before_id": chats[-1]["chat_id"]}
+        return {"chats": chats, "next_cursor": next_cursor}
+
+    def get_messages_page(
+        self,
+        chat_id: int,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        limit: int = 50,
+        include_thinking: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a chat's messages, oldest first.
+
+        Without a cursor the most recent page is returned. Older pages are read
+        with `before_id` and newer ones with `after_id`.
+
+        Args:
+            chat_id (int): The chat session.
+            before_id (Optional[int]): Only return messages older than this message ID.
+            after_id (Optional[int]): Only return messages newer than this message ID.
+            limit (int): Maximum number of messages to return.
+            include_thinking (bool): Whether to return the content of thinking messages.
+                Without it they are returned with empty content, to be fetched with get_message.
+
+        Returns:
+            Dict[str, Any]: The "messages" and "has_more", which tells whether more
+            messages exist beyond the page in the direction of the read.
+        """
+        content_column = "content" if include_thinking else "CASE WHEN role = 'thinking' THEN '' ELSE content END"
+        conn = self.pool.connection()
+
+        if after_id is not None:
+            cursor = conn.execute(f"""
+                SELECT id, role, {content_column}, timestamp
+                FROM chat_messages
+                WHERE chat_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            """, (chat_id, after_id, limit + 1))
+            rows = cursor.fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            cursor = conn.execute(f"""
+                SELECT id, role, {content_column}, timestamp
+                FROM chat_messages
+                WHERE chat_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (chat_id, before_id if before_id is not None else MAX_MESSAGE_ID, limit + 1))
             rows = cursor.fetchall()
-            return [{
-                "chat_id": row[0],
-                "chat_name": row[1],
-                "created_at": row[2],
-                "last_updated": row[3],
-                "message_count": row[4]
-            } for row in rows]
+            has_more = len(rows) > limit
+            rows = list(reversed(rows[:limit]))
+
+        messages = [{"id": row[0], "role": row[1], "content": row[2], "timestamp": row[3]} for row in rows]
+        return {"messages": messages, "has_more": has_more}
+
+    def get_message(self, chat_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single message of a chat session."""
+        cursor = self.pool.connection().execute(
+            "SELECT id, role, content, timestamp FROM chat_messages WHERE chat_id = ? AND id = ?",
+            (chat_id, message_id)
+        )
+        row = cursor.fetchone()
+        return {"id": row[0], "role": row[1], "content": row[2], "timestamp": row[3]} if row else None
 
     def get_chat_name(self, chat_id: int) -> Optional[str]:
         """Get the name of a chat session."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT chat_name FROM chat_sessions WHERE chat_id = ?",
-                (chat_id,)
-            )
-            row = cursor.fetchone()
-            return row[0] if row else None
+        cursor = self.pool.connection().execute(
+            "SELECT chat_name FROM chat_sessions WHERE chat_id = ?",
+            (chat_id,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
 
     def update_chat_name(self, chat_id: int, new_name: str):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        with self.pool.transaction() as conn:
+            conn.execute(
                 "UPDATE chat_sessions SET chat_name = ? WHERE chat_id = ?",
                 (new_name, chat_id)
             )
-            conn.commit()
 
     def get_chats(self) -> List[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT chat_id, chat_name FROM chat_sessions ORDER BY last_updated DESC")
-            rows = cursor.fetchall()
-            return [{"chat_id": row[0], "chat_name": row[1]} for row in rows]
+        cursor = self.pool.connection().execute("SELECT chat_id, chat_name FROM chat_sessions ORDER BY last_updated DESC")
+        rows = cursor.fetchall()
+        return [{"chat_id": row[0], "chat_name": row[1]} for row in rows]
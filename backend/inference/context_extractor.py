@@ -1,6 +1,6 @@
 import os
+import threading
 import chromadb
-import sqlite3
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from sklearn.cluster import MiniBatchKMeans
@@ -9,11 +9,43 @@ from sentence_transformers import CrossEncoder
 
 from embedding.clip_embedder import ClipEmbedder
 from embedding.whisper_embedder import WhisperTextEmbedder
+from inference.interval_index import IntervalIndex
+from inference.retrieval_cache import RetrievalCache
+from preprocessing.store_lexical_index import (
+    create_lexical_index_table,
+    has_lexical_segments,
+    store_lexical_segments,
+    search_lexical_segments,
+)
+from preprocessing.store_embeddings import store_summary_embedding
+from preprocessing.store_metadata import VideoMetadataRepository, create_video_metadata_table
+from utils.tracing import span
 
 CHROMA_DIR = "./data/chroma_db"
 METADATA_DB = "./data/video_metadata.db"
 VIDEO_PATH = os.path.abspath("./data/videos")
 
+# Hybrid retrieval: dense and BM25 candidates are fused with reciprocal-rank fusion
+DENSE_CANDIDATES = 100
+LEXICAL_CANDIDATES = 50
+RERANK_CANDIDATES = 50
+RRF_K = 60
+
+# Upper bounds on segments returned for a time window, sampled evenly across it
+TIME_RANGE_ASR_RESULTS = 60
+TIME_RANGE_FRAME_RESULTS = 45
+
+# Library search: videos kept after pruning on per-video summary vectors, and segment hits per modality
+LIBRARY_CANDIDATE_VIDEOS = 50
+LIBRARY_SEGMENT_HITS = 200
+
+class RetrievalCancelled(Exception):
+    """Raised between retrieval steps once the caller has given up on the result."""
+
+def _check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise RetrievalCancelled()
+
 class ContextExtractor:
     def __init__(self):
         self.chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
@@ -25,11 +57,38 @@ class ContextExtractor:
         self.video_collection_name = "frames"
         self.audio_collection_name = "asr"
 
+        # Coarse per-video vectors used to prune corpus-wide search
+        self.summary_collection_names = {
+            self.video_collection_name: "frame_summaries",
+            self.audio_collection_name: "asr_summaries"
+        }
+        self.summary_embeddings_checked = False
+
         self.cross_encoder = CrossEncoder("BAAI/bge-reranker-base")
 
+        create_lexical_index_table(METADATA_DB)
+        self.lexical_indexed = set()
+
+        create_video_metadata_table(METADATA_DB)
+        self.metadata_repository = VideoMetadataRepository.get(METADATA_DB)
+
+        # Per (video, collection) interval indexes, built lazily from Chroma metadata
+        self.interval_indexes: Dict[Tuple[str, str], IntervalIndex] = {}
+
+        # Formatted context blocks and ranked segment IDs per (video, mode, question, index version)
+        self.retrieval_cache = RetrievalCache()
+
     def refresh_chroma_client(self):
         """Refresh the ChromaDB client to ensure it sees newly added embeddings."""
         self.chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+        self.interval_indexes.clear()
+
+    def invalidate_video(self, video_filename: str):
+        """Drop every index and cached result derived from a video that was deleted or re-ingested."""
+        self.retrieval_cache.bump_version(video_filename)
+        for key in [key for key in self.interval_indexes if key[0] == video_filename]:
+            del self.interval_indexes[key]
+        self.lexical_indexed = {key for key in self.lexical_indexed if key[0] != video_filename}
 
     def _get_query_embedding(self, question: str, collection_name: str) -> List[float]:
         if collection_name == "frames":
@@ -50,11 +109,13 @@ class ContextExtractor:
         n_results = min(len(texts), n_results)
         print("start clustering")
 
-        kmeans = MiniBatchKMeans(n_clusters=n_results, random_state=42, batch_size=64)
-        kmeans.fit(embeddings)
+        with span("kmeans"):
+            kmeans = MiniBatchKMeans(n_clusters=n_results, random_state=42, batch_size=64)
+            kmeans.fit(embeddings)
         print("end clustering")
 
         closest_indices = self._get_closest_to_centroids_cosine(kmeans.cluster_centers_, embeddings)
+        results["ids"] = [results["ids"][i] for i in closest_indices]
         results["metadatas"] = [results["metadatas"][i] for i in closest_indices]
 
         return results
@@ -63,23 +124,26 @@ class ContextExtractor:
         collection = self.chroma_client.get_collection(collection_name)
         where = {"video_filename": video_filename}
 
-        results = collection.get(
-            where=where,
-            include=["metadatas", "embeddings"]
-        )
+        with span("chroma_get"):
+            results = collection.get(
+                where=where,
+                include=["metadatas", "embeddings"]
+            )
         return results
         
     def _get_relevant_context(self, config: Dict[str, Any], question: str, video_filename: str, video_metadata: Dict[str, Any], collection_name: str, n_results: int = 40) -> Dict[str, Any]:
         collection = self.chroma_client.get_collection(collection_name)
-        query_embedding = self._get_query_embedding(question, collection_name)
+        with span("embed_query"):
+            query_embedding = self._get_query_embedding(question, collection_name)
         where = {"video_filename": video_filename}
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            where=where,
-            n_results=n_results,
-            include=["metadatas", "embeddings", "distances"]
-        )
+        with span("chroma_query"):
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                where=where,
+                n_results=n_results,
+                include=["metadatas", "embeddings", "distances"]
+            )
 
         flattened_results = {
             "ids": results["ids"][0] if results["ids"] else [],
@@ -129,7 +193,8 @@ class ContextExtractor:
     def _rerank_with_bge(self, results: Dict[str, Any], question: str, n_results: int = 30) -> Dict[str, Any]:
         texts = [metadata["text"] for metadata in results["metadatas"]]
         pairs = [(text, question) for text in texts]
-        scores = self.cross_encoder.predict(pairs)
+        with span("rerank"):
+            scores = self.cross_encoder.predict(pairs)
         sorted_indices = np.argsort(scores)[::-1]
         sorted_indices = sorted_indices[:n_results]
 
@@ -152,43 +217,258 @@ class ContextExtractor:
     
     def _timestamp_context(self, config: Dict[str, Any], question: str, video_name: str, video_metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         asr_results, frame_results = self._summary_context(config, question, video_name, video_metadata)
-        asr_results["metadatas"] = sorted(asr_results["metadatas"], key=lambda x: x["ts_start"])
-        frame_results["metadatas"] = sorted(frame_results["metadatas"], key=lambda x: x["ts_start"])
+        for results in (asr_results, frame_results):
+            order = sorted(range(len(results["metadatas"])), key=lambda i: results["metadatas"][i]["ts_start"])
+            results["ids"] = [results["ids"][i] for i in order]
+            results["metadatas"] = [results["metadatas"][i] for i in order]
         return asr_results, frame_results
             
-    def _query_context(self, config: Dict[str, Any], question: str, video_name: str, video_metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-        frame_results = self._get_relevant_context(config, question, video_name, video_metadata, self.video_collection_name, n_results=100)
-        # frame_results = self._mmr(frame_results, question, self.video_collection_name, n_results=50)
-        frame_results = self._rerank_with_bge(frame_results, question, n_results=45)
+    def _ensure_lexical_index(self, video_filename: str, collection_name: str, modality: str):
+        """Backfill the lexical index for videos ingested before it existed."""
+        if (video_filename, modality) in self.lexical_indexed:
+            return
+        
+        if not has_lexical_segments(video_filename, modality, METADATA_DB):
+            collection = self.chroma_client.get_collection(collection_name)
+            results = collection.get(where={"video_filename": video_filename}, include=["metadatas"])
+
+            # Restore storage order so segment IDs line up with the Chroma IDs
+            order = sorted(range(len(results["ids"])), key=lambda i: int(results["ids"][i].rsplit("_", 1)[1]))
+            segments = [{
+                "start": results["metadatas"][i]["ts_start"],
+                "end": results["metadatas"][i]["ts_end"],
+                "text": results["metadatas"][i]["text"]
+            } for i in order]
+            store_lexical_segments(video_filename, modality, segments, METADATA_DB)
+
+        self.lexical_indexed.add((video_filename, modality))
+
+    def _fuse_with_lexical(self, dense_results: Dict[str, Any], lexical_hits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge dense and lexical candidates ordered by reciprocal-rank fusion."""
+        candidates = {}
+        scores = {}
+
+        for rank, segment_id in enumerate(dense_results["ids"]):
+            candidates[segment_id] = (
+                dense_results["metadatas"][rank],
+                dense_results["embeddings"][rank] if len(dense_results["embeddings"]) > 0 else None,
+                dense_results["distances"][rank] if dense_results["distances"] else None
+            )
+            scores[segment_id] = 1.0 / (RRF_K + rank + 1)
+
+        for rank, hit in enumerate(lexical_hits):
+            if hit["id"] not in candidates:
+                candidates[hit["id"]] = (hit["metadata"], None, None)
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        fused_ids = sorted(scores, key=scores.get, reverse=True)
 
-        asr_results = self._get_relevant_context(config, question, video_name, video_metadata, self.audio_collection_name, n_results=100)
-        # asr_results = self._mmr(asr_results, question, self.audio_collection_name, n_results=50)
-        asr_results = self._rerank_with_bge(asr_results, question, n_results=15)
+        return {
+            "ids": fused_ids,
+            "metadatas": [candidates[i][0] for i in fused_ids],
+            "embeddings": [candidates[i][1] for i in fused_ids],
+            "distances": [candidates[i][2] for i in fused_ids]
+        }
 
-        return asr_results, frame_results
+    def _get_hybrid_context(self, config: Dict[str, Any], question: str, video_filename: str, video_metadata: Dict[str, Any], collection_name: str, n_results: int, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        modality = "frame" if collection_name == self.video_collection_name else "asr"
+        self._ensure_lexical_index(video_filename, collection_name, modality)
 
-    def get_video_metadata(self, video_name: str) -> Dict[str, Any]:
-        with sqlite3.connect(METADATA_DB) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM video_metadata WHERE video_path = ?", (os.path.join(VIDEO_PATH, video_name),))
+        dense_results = self._get_relevant_context(config, question, video_filename, video_metadata, collection_name, n_results=DENSE_CANDIDATES)
+        _check_cancelled(cancel_event)
+        with span("lexical_search"):
+            lexical_hits = search_lexical_segments(question, video_filename, modality, limit=LEXICAL_CANDIDATES, db_path=METADATA_DB)
 
-            row = cursor.fetchone()
-            if row is None:
-                return {}
-            
-            metadata = {
-                "video_id": int(row[0]),
-                "video_path": row[1],
-                "audio_path": row[2],
-                "duration": row[3],
-                "width": row[4],
-                "height": row[5],
-                "codec": row[6],
-                "fps": row[7],
-                "thumbnail_path": row[8]
-            }
+        # The rerank is the most expensive step, skip it if the result is no longer wanted
+        _check_cancelled(cancel_event)
+        if not lexical_hits:
+            return self._rerank_with_bge(dense_results, question, n_results=n_results)
+
+        fused_results = self._fuse_with_lexical(dense_results, lexical_hits)
+
+        # Segments containing every query term are high-confidence when the terms are selective
+        # (names, numbers, jargon). They are kept as-is and the rerank only fills the remaining slots.
+        exact_hits = search_lexical_segments(question, video_filename, modality, limit=n_results + 1, match_all=True, db_path=METADATA_DB)
+        if not exact_hits or len(exact_hits) > n_results:
+            fused_results = self._select_results(fused_results, range(min(RERANK_CANDIDATES, len(fused_results["ids"]))))
+            return self._rerank_with_bge(fused_results, question, n_results=n_results)
+
+        exact_ids = {hit["id"] for hit in exact_hits}
+        pinned = [i for i, segment_id in enumerate(fused_results["ids"]) if segment_id in exact_ids]
+        remaining = [i for i, segment_id in enumerate(fused_results["ids"]) if segment_id not in exact_ids]
+        n_remaining = n_results - len(pinned)
+        pinned_results = self._select_results(fused_results, pinned)
+
+        if n_remaining <= 0 or not remaining:
+            return pinned_results
+
+        remaining_results = self._select_results(fused_results, remaining[:2 * n_remaining])
+        remaining_results = self._rerank_with_bge(remaining_results, question, n_results=n_remaining)
+
+        return {
+            key: list(pinned_results[key]) + list(remaining_results[key])
+            for key in ("ids", "metadatas", "embeddings", "distances")
+        }
+
+    def _select_results(self, results: Dict[str, Any], indices) -> Dict[str, Any]:
+        indices = list(indices)
+        return {
+            "ids": [results["ids"][i] for i in indices],
+            "metadatas": [results["metadatas"][i] for i in indices],
+            "embeddings": [results["embeddings"][i] for i in indices],
+            "distances": [results["distances"][i] for i in indices]
+        }
             
-            return metadata
+    def _query_context(self, config: Dict[str, Any], question: str, video_name: str, video_metadata: Dict[str, Any], cancel_event: Optional[threading.Event] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        frame_results = self._get_hybrid_context(config, question, video_name, video_metadata, self.video_collection_name, n_results=45, cancel_event=cancel_event)
+        _check_cancelled(cancel_event)
+        asr_results = self._get_hybrid_context(config, question, video_name, video_metadata, self.audio_collection_name, n_results=15, cancel_event=cancel_event)
+
+        return asr_results, frame_results
+
+    def _get_interval_index(self, video_filename: str, collection_name: str) -> IntervalIndex:
+        key = (video_filename, collection_name)
+        if key not in self.interval_indexes:
+            collection = self.chroma_client.get_collection(collection_name)
+            results = collection.get(where={"video_filename": video_filename}, include=["metadatas"])
+            self.interval_indexes[key] = IntervalIndex(results["metadatas"], results["ids"])
+        return self.interval_indexes[key]
+
+    def _sample_evenly(self, index: IntervalIndex, positions: List[int], n_results: int) -> Dict[str, Any]:
+        if len(positions) > n_results:
+            positions = [positions[i] for i in np.linspace(0, len(positions) - 1, n_results).round().astype(int)]
+        return {
+            "ids": [index.ids[i] for i in positions],
+            "metadatas": [index.metadatas[i] for i in positions]
+        }
+
+    def get_time_range_context(self, video_name: str, start: float, end: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Get the ASR and frame segments overlapping a time range, without embedding or reranking.
+
+        Args:
+            video_name (str): Filename of the video.
+            start (float): Start of the range in seconds.
+            end (float): End of the range in seconds.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, Any]]: ASR and frame results ordered by start time.
+        """
+        asr_index = self._get_interval_index(video_name, self.audio_collection_name)
+        frame_index = self._get_interval_index(video_name, self.video_collection_name)
+
+        asr_results = self._sample_evenly(asr_index, asr_index.overlapping_positions(start, end), TIME_RANGE_ASR_RESULTS)
+        frame_results = self._sample_evenly(frame_index, frame_index.overlapping_positions(start, end), TIME_RANGE_FRAME_RESULTS)
+        return asr_results, frame_results
+
+    def _time_range_context(self, config: Dict[str, Any], question: str, video_name: str, video_metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return self.get_time_range_context(video_name, float(config["start"]), float(config["end"]))
+
+    def _ensure_summary_embeddings(self):
+        """Backfill per-video summary vectors for videos ingested before they existed."""
+        if self.summary_embeddings_checked:
+            return
+
+        video_filenames = [os.path.basename(video_path) for video_path in self.metadata_repository.list_video_paths()]
+
+        for collection_name, summary_collection_name in self.summary_collection_names.items():
+            collection = self.chroma_client.get_or_create_collection(collection_name)
+            summary_collection = self.chroma_client.get_or_create_collection(summary_collection_name)
+            existing = set(summary_collection.get(ids=[f"{name}_summary" for name in video_filenames])["ids"]) if video_filenames else set()
+
+            for video_filename in video_filenames:
+                if f"{video_filename}_summary" in existing:
+                    continue
+                results = collection.get(where={"video_filename": video_filename}, include=["embeddings"])
+                store_summary_embedding(summary_collection, video_filename, [{"emb": emb} for emb in results["embeddings"]])
+
+        self.summary_embeddings_checked = True
+
+    def _get_candidate_videos(self, collection_name: str, query_embedding: List[float]) -> Optional[List[str]]:
+        summary_collection = self.chroma_client.get_or_create_collection(self.summary_collection_names[collection_name])
+        count = summary_collection.count()
+        if count == 0:
+            return None
+
+        results = summary_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(LIBRARY_CANDIDATE_VIDEOS, count),
+            include=["metadatas"]
+        )
+        return [metadata["video_filename"] for metadata in results["metadatas"][0]]
+
+    def search_library(self, question: str, n_videos: int = 10, n_timestamps: int = 3) -> List[Dict[str, Any]]:
+        """
+        Search every ingested video for a question.
+
+        Each modality prunes the library to the closest videos by their summary vector,
+        then runs one ANN query over the segments of those videos. Hits are aggregated
+        per video with reciprocal-rank fusion across both modalities.
+
+        Args:
+            question (str): The search question.
+            n_videos (int): Maximum number of videos to return.
+            n_timestamps (int): Number of best matching segments to return per video.
+
+        Returns:
+            List[Dict[str, Any]]: Ranked videos with their score and best timestamps.
+        """
+        self._ensure_summary_embeddings()
+
+        scores: Dict[str, float] = {}
+        hits: Dict[str, List[Tuple[float, Dict[str, Any]]]] = {}
+
+        for collection_name in self.summary_collection_names:
+            query_embedding = self._get_query_embedding(question, collection_name)
+            candidates = self._get_candidate_videos(collection_name, query_embedding)
+            if candidates == []:
+                continue
+
+            collection = self.chroma_client.get_or_create_collection(collection_name)
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                where={"video_filename": {"$in": candidates}} if candidates else None,
+                n_results=LIBRARY_SEGMENT_HITS,
+                include=["metadatas"]
+            )
+
+            for rank, metadata in enumerate(results["metadatas"][0] if results["metadatas"] else []):
+                video_filename = metadata["video_filename"]
+                score = 1.0 / (RRF_K + rank + 1)
+                scores[video_filename] = scores.get(video_filename, 0.0) + score
+                hits.setdefault(video_filename, []).append((score, {
+                    "modality": metadata["modality"],
+                    "ts_start": metadata["ts_start"],
+                    "ts_end": metadata["ts_end"],
+                    "text": metadata["text"]
+                }))
+
+        ranked_videos = sorted(scores, key=scores.get, reverse=True)[:n_videos]
+
+        return [{
+            "video_name": video_filename,
+            "score": scores[video_filename],
+            "best_timestamps": [hit for _, hit in sorted(hits[video_filename], key=lambda x: x[0], reverse=True)[:n_timestamps]]
+        } for video_filename in ranked_videos]
+
+    def get_video_metadata(self, video_name: str) -> Dict[str, Any]:
+        row = self.metadata_repository.get_by_path(os.path.join(VIDEO_PATH, video_name))
+        if row is None:
+            return {}
+
+        metadata = {
+            "video_id": int(row["id"]),
+            "video_path": row["video_path"],
+            "audio_path": row["audio_path"],
+            "duration": row["duration"],
+            "width": row["width"],
+            "height": row["height"],
+            "codec": row["codec"],
+            "fps": row["fps"],
+            "thumbnail_path": row["thumbnail_path"]
+        }
+        
+        return metadata
         
     def get_video_metadata_context(self, video_name: str) -> str:
         metadata = self.get_video_metadata(video_name)
@@ -203,6 +483,76 @@ class ContextExtractor:
 
         return "\n".join(context_parts)
 
+    def get_video_context(self, config: Dict[str, Any], question: str, video_name: str, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Retrieve and format the context block of a single video, served from the retrieval cache when possible.
+
+        Args:
+            config (Dict[str, Any]): The context mode configuration.
+            question (str): The (refined) user question.
+            video_name (str): Filename of the video.
+            cancel_event (Optional[threading.Event]): Once set, query retrieval stops at its
+                next step with RetrievalCancelled, freeing the executor worker.
+
+        Returns:
+            Dict[str, Any]: The formatted context, the metadata header, and the ranked
+            segment IDs and metadatas for both modalities. Cached entries are shared and must not be mutated.
+        """
+        cache_key = self.retrieval_cache.make_key(video_name, config, question)
+        cached = self.retrieval_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        _check_cancelled(cancel_event)
+        context_parts = []
+        video_metadata = self.get_video_metadata(video_name)
+        
+        # Initialize results with empty defaults
+        asr_results = {"ids": [], "metadatas": []}
+        frame_results = {"ids": [], "metadatas": []}
+        
+        if config["mode"] == "summary":
+            asr_results, frame_results = self._summary_context(config, question, video_name, video_metadata)
+        elif config["mode"] == "timestamps":
+            asr_results, frame_results = self._timestamp_context(config, question, video_name, video_metadata)
+        elif config["mode"] == "query":
+            asr_results, frame_results = self._query_context(config, question, video_name, video_metadata, cancel_event)
+        elif config["mode"] == "time_range":
+            asr_results, frame_results = self._time_range_context(config, question, video_name, video_metadata)
+
+        # Add video metadata if available
+        if video_metadata:
+            context_parts.append("\n" + self.get_video_metadata_context(video_name))
+
+        # Add relevant ASR context
+        if asr_results and asr_results["metadatas"]:
+            context_parts.append("\nRelevant Speech:")
+            for metadata in asr_results["metadatas"]:
+                start_minute = int(metadata['ts_start'] // 60)
+                start_second = int(metadata['ts_start'] % 60)
+                end_minute = int(metadata['ts_end'] // 60)
+                end_second = int(metadata['ts_end'] % 60)
+                context_parts.append(f"At {start_minute}:{start_second:02d} - {end_minute}:{end_second:02d}: {metadata['text']}")
+
+        # Add relevant frame context
+        if frame_results and frame_results["metadatas"]:
+            context_parts.append("\nRelevant Visual Scenes:")
+            for metadata in frame_results["metadatas"]:
+                start_minute = int(metadata['ts_start'] // 60)
+                start_second = int(metadata['ts_start'] % 60)
+                context_parts.append(f"At {start_minute}:{start_second:02d}: {metadata['text']}")
+
+        video_context = {
+            "context": "\n".join(context_parts),
+            "metadata_context": self.get_video_metadata_context(video_name) if video_metadata else "",
+            "asr_ids": list(asr_results.get("ids", [])),
+            "frame_ids": list(frame_results.get("ids", [])),
+            "asr_metadatas": list(asr_results["metadatas"]),
+            "frame_metadatas": list(frame_results["metadatas"])
+        }
+        self.retrieval_cache.put(cache_key, video_context)
+        return video_context
+
     def format_context(
         self, 
         config: Dict[str, Any],
@@ -212,43 +562,5 @@ class ContextExtractor:
         if config["mode"] == "ignore":
             return ""
         
-        context_parts = []
-
-        for video_name in video_names:
-            video_metadata = self.get_video_metadata(video_name)
-            
-            # Initialize results with empty defaults
-            asr_results = {"metadatas": []}
-            frame_results = {"metadatas": []}
-            
-            if config["mode"] == "summary":
-                asr_results, frame_results = self._summary_context(config, question, video_name, video_metadata)
-            elif config["mode"] == "timestamps":
-                asr_results, frame_results = self._timestamp_context(config, question, video_name, video_metadata)
-            elif config["mode"] == "query":
-                asr_results, frame_results = self._query_context(config, question, video_name, video_metadata)
-
-            # Add video metadata if available
-            if video_metadata:
-                context_parts.append("\n" + self.get_video_metadata_context(video_name))
-
-            # Add relevant ASR context
-            if asr_results and asr_results["metadatas"]:
-                context_parts.append("\nRelevant Speech:")
-                for metadata in asr_results["metadatas"]:
-                    start_minute = int(metadata['ts_start'] // 60)
-                    start_second = int(metadata['ts_start'] % 60)
-                    end_minute = int(metadata['ts_end'] // 60)
-                    end_second = int(metadata['ts_end'] % 60)
-                    context_parts.append(f"At {start_minute}:{start_second:02d} - {end_minute}:{end_second:02d}: {metadata['text']}")
-
-            # Add relevant frame context
-            if frame_results and frame_results["metadatas"]:
-                context_parts.append("\nRelevant Visual Scenes:")
-                for metadata in frame_results["metadatas"]:
-                    start_minute = int(metadata['ts_start'] // 60)
-                    start_second = int(metadata['ts_start'] % 60)
-                    context_parts.append(f"At {start_minute}:{start_second:02d}: {metadata['text']}")
-
-        context = "\n".join(context_parts)
-        return context
\ No newline at end of file
+        video_contexts = [self.get_video_context(config, question, video_name)["context"] for video_name in video_names]
+        return "\n".join(video_context for video_context in video_contexts if video_context)
@@ -0,0 +1,49 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+# Chroma queries, KMeans and cross-encoder inference
+RETRIEVAL_WORKERS = 4
+# sqlite3 reads and writes for chat history and video metadata
+DATABASE_WORKERS = 4
+
+class BlockingExecutor:
+    """A bounded thread pool that lets the event loop await blocking work."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.pending = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking callable in the pool and await its result.
+
+        Args:
+            fn (Callable): The blocking function to run.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            # Carry the context over, so spans recorded in the thread join the request's trace
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.executor, partial(context.run, fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "pending": self.pending,
+        }
+
+retrieval_executor = BlockingExecutor("retrieval", RETRIEVAL_WORKERS)
+database_executor = BlockingExecutor("database", DATABASE_WORKERS)
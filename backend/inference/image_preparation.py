@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+from PIL import Image, ImageOps
+
+IMAGE_CACHE_DIR = "./data/image_cache"
+# Longest side for models that do not report their vision encoder resolution
+DEFAULT_IMAGE_SIDE = 1024
+# Tiling encoders such as LLaVA 1.6 combine several crops of their native size,
+# so images are never shrunk below this
+MIN_IMAGE_SIDE = 672
+# JPEG quality of prepared images
+IMAGE_JPEG_QUALITY = 85
+# Prepared image paths remembered in memory
+IMAGE_CACHE_SIZE = 256
+
+class ImagePreparer:
+    """
+    Downscales image attachments to the resolution a vision model works at.
+
+    Ollama reads and base64-encodes every image on every request, and vision
+    prefill grows with the pixel count, so full-resolution photos cost much
+    more than the model can make use of. Images are resized to fit the model's
+    encoder resolution, re-encoded as JPEG and cached on disk by content hash
+    and target size. Models that share a resolution share the prepared image.
+    Images that are already small enough JPEGs or PNGs are used as they are.
+    """
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, cache_size: int = IMAGE_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.prepared = 0
+        self.reused = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def target_side(image_size: int) -> int:
+        return max(image_size, MIN_IMAGE_SIDE)
+
+    def prepare(self, file_path: str, content_hash: str, image_size: int) -> str:
+        """
+        Get the path of an image prepared for a model. Blocking, run it in an executor.
+
+        Args:
+            file_path (str): Path to the original image.
+            content_hash (str): SHA-256 of the original image.
+            image_size (int): Native image resolution of the model, see OllamaClient.get_image_size.
+
+        Returns:
+            str: Path to the prepared image, or the original path if it needs no preparation.
+        """
+        max_side = self.target_side(image_size)
+        key = f"{content_hash}_{max_side}"
+
+        with self.lock:
+            if key in self.cache and os.path.exists(self.cache[key]):
+                self.cache.move_to_end(key)
+                self.reused += 1
+                return self.cache[key]
+
+        prepared_path = os.path.join(self.cache_dir, key + ".jpg")
+        if os.path.exists(prepared_path):
+            self.reused += 1
+        else:
+            with Image.open(file_path) as image:
+                if image.format in ("JPEG", "PNG") and max(image.size) <= max_side:
+                    return file_path
+
+                # Apply the EXIF rotation before the metadata is dropped by re-encoding
+                image = ImageOps.exif_transpose(image)
+                if image.mode in ("RGBA", "LA", "P"):
+                    image = image.convert("RGBA")
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+                else:
+                    image = image.convert("RGB")
+                image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+                os.makedirs(self.cache_dir, exist_ok=True)
+                image.save(prepared_path + ".tmp", format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+                os.replace(prepared_path + ".tmp", prepared_path)
+
+            self.prepared += 1
+            self.bytes_saved += max(0, os.path.getsize(file_path) - os.path.getsize(prepared_path))
+
+        with self.lock:
+            self.cache[key] = prepared_path
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return prepared_path
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.cache),
+                "prepared": self.prepared,
+                "reused": self.reused,
+                "bytes_saved": self.bytes_saved,
+            }
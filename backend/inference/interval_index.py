@@ -0,0 +1,41 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional
+
+class IntervalIndex:
+    """
+    Sorted-array index over the [ts_start, ts_end] spans of one video modality.
+
+    Segments are sorted by start time and the longest span is remembered, so every
+    segment overlapping [start, end] must begin within [start - max_span, end].
+    Two binary searches bound that slice, which makes a lookup O(log n + k) for
+    the short, bounded spans produced by ASR grouping and frame sampling.
+    """
+
+    def __init__(self, metadatas: List[Dict[str, Any]], ids: Optional[List[str]] = None):
+        ids = ids if ids is not None else [None] * len(metadatas)
+        order = sorted(range(len(metadatas)), key=lambda i: (metadatas[i]["ts_start"], metadatas[i]["ts_end"]))
+        self.metadatas = [metadatas[i] for i in order]
+        self.ids = [ids[i] for i in order]
+        self.starts = [metadata["ts_start"] for metadata in self.metadatas]
+        self.max_span = max((metadata["ts_end"] - metadata["ts_start"] for metadata in self.metadatas), default=0.0)
+
+    def __len__(self) -> int:
+        return len(self.metadatas)
+
+    def overlapping_positions(self, start: float, end: float) -> List[int]:
+        """
+        Get the positions of all segments overlapping a time range.
+
+        Args:
+            start (float): Start of the range in seconds.
+            end (float): End of the range in seconds (inclusive).
+
+        Returns:
+            List[int]: Positions into `metadatas` and `ids`, ordered by start time.
+        """
+        lo = bisect_left(self.starts, start - self.max_span)
+        hi = bisect_right(self.starts, end)
+        return [i for i in range(lo, hi) if self.metadatas[i]["ts_end"] >= start]
+
+    def overlapping(self, start: float, end: float) -> List[Dict[str, Any]]:
+        return [self.metadatas[i] for i in self.overlapping_positions(start, end)]
@@ -1,14 +1,206 @@
 from ollama import AsyncClient
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+import asyncio
 import re
+import time
+
+from inference.token_budget import DEFAULT_NUM_CTX
+from inference.image_preparation import DEFAULT_IMAGE_SIDE
+from utils.tracing import (
+    span,
+    current_trace,
+    STAGE_SECONDS,
+    TIME_TO_FIRST_TOKEN_SECONDS,
+    GENERATION_TOKENS_PER_SECOND,
+    PROMPT_TOKENS_PER_SECOND,
+)
+
+# How long Ollama keeps a model in memory after its last request
+DEFAULT_KEEP_ALIVE = "30m"
+# Upper bound for generations sent to the local Ollama instance at once
+MAX_CONCURRENT_GENERATIONS = 2
 
 class OllamaClient:
-    def __init__(self, host: str = "http://localhost:11434"):
+    def __init__(self, host: str = "http://localhost:11434", max_concurrent_generations: int = MAX_CONCURRENT_GENERATIONS):
         self.client = AsyncClient(host=host)
         self.planner_llm = "qwen3:0.6b"
-    
-    async def chat(self, *args, **kwargs):
-        return await self.client.chat(*args, **kwargs)
+        self.context_windows: Dict[str, int] = {}
+        self.image_sizes: Dict[str, int] = {}
+
+        # Per-model keep_alive overrides, so alternating models are not swapped out between requests
+        self.keep_alive: Dict[str, Any] = {}
+        self.preloading: Dict[str, asyncio.Task] = {}
+
+        # Generations wait here instead of piling up inside Ollama
+        self.max_concurrent_generations = max_concurrent_generations
+        self.generation_semaphore = asyncio.Semaphore(max_concurrent_generations)
+        self.active_generations = 0
+        self.queued_generations = 0
+        self.max_queued_generations = 0
+
+    def get_keep_alive(self, model: str) -> Any:
+        return self.keep_alive.get(model, DEFAULT_KEEP_ALIVE)
+
+    def set_keep_alive(self, model: str, keep_alive: Any):
+        """Set how long a model stays loaded, e.g. "10m", a number of seconds, or -1 to keep it loaded."""
+        self.keep_alive[model] = keep_alive
+
+    @asynccontextmanager
+    async def _generation_slot(self):
+        self.queued_generations += 1
+        self.max_queued_generations = max(self.max_queued_generations, self.queued_generations)
+        try:
+            with span("generation_queue"):
+                await self.generation_semaphore.acquire()
+        finally:
+            self.queued_generations -= 1
+
+        self.active_generations += 1
+        try:
+            yield
+        finally:
+            self.active_generations -= 1
+            self.generation_semaphore.release()
+
+    async def _request_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # Requests must agree on num_ctx, otherwise Ollama reloads the model to resize its context
+        model = kwargs["model"]
+        options = dict(kwargs.get("options") or {})
+        options.setdefault("num_ctx", await self.get_num_ctx(model))
+        return {**kwargs, "options": options, "keep_alive": kwargs.get("keep_alive", self.get_keep_alive(model))}
+
+    async def chat(self, **kwargs):
+        """Send a non-streaming chat request through the concurrency limiter."""
+        kwargs = await self._request_kwargs(kwargs)
+        async with self._generation_slot():
+            with span("ollama_chat"):
+                return await self.client.chat(**kwargs)
+
+    def _record_first_token(self, model: str, started: float):
+        now = time.perf_counter()
+        trace = current_trace()
+        # Measured from the question when traced, which is what the user waits for
+        time_to_first_token = trace.elapsed() if trace is not None else now - started
+        TIME_TO_FIRST_TOKEN_SECONDS.observe(time_to_first_token, model=model)
+        if trace is not None:
+            trace.add_span("first_token", started, now)
+            trace.set("ttft_ms", round(time_to_first_token * 1000, 1))
+
+    def _record_generation(self, model: str, started: float, chunk: Any):
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - started, stage="generation")
+
+        # Durations in the final chunk are in nanoseconds
+        stats = {}
+        if chunk.get("eval_count") and chunk.get("eval_duration"):
+            stats["tokens_per_sec"] = chunk["eval_count"] / (chunk["eval_duration"] / 1e9)
+            stats["completion_tokens"] = chunk["eval_count"]
+            GENERATION_TOKENS_PER_SECOND.observe(stats["tokens_per_sec"], model=model)
+        if chunk.get("prompt_eval_count") and chunk.get("prompt_eval_duration"):
+            stats["prompt_tokens_per_sec"] = chunk["prompt_eval_count"] / (chunk["prompt_eval_duration"] / 1e9)
+            stats["prompt_tokens"] = chunk["prompt_eval_count"]
+            PROMPT_TOKENS_PER_SECOND.observe(stats["prompt_tokens_per_sec"], model=model)
+        if chunk.get("load_duration"):
+            stats["load_ms"] = chunk["load_duration"] / 1e6
+
+        trace = current_trace()
+        if trace is not None:
+            trace.add_span("generation", started, now)
+            trace.set("model", model)
+            for key, value in stats.items():
+                trace.set(key, round(value, 1) if isinstance(value, float) else value)
+
+    async def _stream_chat(self, **kwargs) -> AsyncIterator[Any]:
+        kwargs = await self._request_kwargs(kwargs)
+        model = kwargs["model"]
+        # The slot is held until the stream is consumed or closed
+        async with self._generation_slot():
+            started = time.perf_counter()
+            response = await self.client.chat(stream=True, **kwargs)
+            first_token = True
+            try:
+                async for chunk in response:
+                    message = chunk.get("message", {})
+                    if first_token and (message.get("content") or message.get("thinking")):
+                        first_token = False
+                        self._record_first_token(model, started)
+                    if chunk.get("done"):
+                        self._record_generation(model, started, chunk)
+                    yield chunk
+            finally:
+                await response.aclose()
+
+    @staticmethod
+    def _normalize_model_name(model: str) -> str:
+        return model if ":" in model else f"{model}:latest"
+
+    async def is_loaded(self, model: str) -> bool:
+        """Check whether a model is resident in Ollama's memory."""
+        try:
+            running = await self.client.ps()
+        except Exception as e:
+            print(f"Could not list the running models: {e}")
+            # Without an answer, do not report a load that may not happen
+            return True
+
+        name = self._normalize_model_name(model)
+        return any(self._normalize_model_name(running_model.model) == name for running_model in running.models)
+
+    async def _load(self, model: str):
+        # An empty prompt makes Ollama load the model without generating
+        await self.client.generate(
+            model=model,
+            prompt="",
+            keep_alive=self.get_keep_alive(model),
+            options={"num_ctx": await self.get_num_ctx(model)},
+        )
+        print(f"Loaded model {model}")
+
+    async def ensure_loaded(self, model: str, on_load: Optional[Callable[[], Awaitable[Any]]] = None) -> bool:
+        """
+        Load a model unless it is already resident.
+
+        Concurrent calls for the same model share a single load.
+
+        Args:
+            model (str): Name of the model.
+            on_load (Optional[Callable[[], Awaitable[Any]]]): Called before waiting on an actual load.
+
+        Returns:
+            bool: Whether the model had to be loaded.
+        """
+        if await self.is_loaded(model):
+            return False
+
+        if on_load is not None:
+            await on_load()
+
+        task = self.preloading.get(model)
+        if task is None:
+            task = asyncio.create_task(self._load(model))
+            self.preloading[model] = task
+            task.add_done_callback(lambda _: self.preloading.pop(model, None))
+
+        await asyncio.shield(task)
+        return True
+
+    async def warm_up(self, models: Iterable[str]):
+        """Preload models one after another, logging failures instead of raising."""
+        for model in dict.fromkeys(model for model in models if model):
+            try:
+                await self.ensure_loaded(model)
+            except Exception as e:
+                print(f"Failed to preload model {model}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent_generations": self.max_concurrent_generations,
+            "active_generations": self.active_generations,
+            "queued_generations": self.queued_generations,
+            "max_queued_generations": self.max_queued_generations,
+            "loading_models": list(self.preloading),
+        }
     
     def _strip_thinking_tags(self, content: str) -> str:
         return re.sub(r'<think>(.*?)</think>', "", content, flags=re.DOTALL).strip()
@@ -17,8 +209,54 @@ class OllamaClient:
         match = re.search(r'\{.*?\}', content, flags=re.DOTALL)
         return match.group(0) if match else ""
     
+    async def get_num_ctx(self, model: str) -> int:
+        """
+        Get the context window to request for a model.
+
+        Uses the smaller of the model's trained context length, any num_ctx set in
+        its Modelfile, and DEFAULT_NUM_CTX, so prompts can be budgeted against it.
+        """
+        if model in self.context_windows:
+            return self.context_windows[model]
+
+        num_ctx = DEFAULT_NUM_CTX
+        try:
+            model_info = await self.client.show(model)
+            for key, value in (model_info.modelinfo or {}).items():
+                if key.endswith(".context_length"):
+                    num_ctx = min(num_ctx, int(value))
+            match = re.search(r"num_ctx\s+(\d+)", model_info.parameters or "")
+            if match:
+                num_ctx = min(num_ctx, int(match.group(1)))
+        except Exception as e:
+            print(f"Could not read the context window of {model}: {e}")
+
+        self.context_windows[model] = num_ctx
+        return num_ctx
+
+    async def get_image_size(self, model: str) -> int:
+        """
+        Get the native image resolution of a model's vision encoder.
+
+        Falls back to DEFAULT_IMAGE_SIDE when the model does not report one.
+        """
+        if model in self.image_sizes:
+            return self.image_sizes[model]
+
+        image_size = DEFAULT_IMAGE_SIDE
+        try:
+            model_info = await self.client.show(model)
+            for key, value in (model_info.modelinfo or {}).items():
+                if key.endswith(".vision.image_size"):
+                    image_size = int(value)
+        except Exception as e:
+            print(f"Could not read the image size of {model}: {e}")
+
+        self.image_sizes[model] = image_size
+        return image_size
+
     async def plan(self, messages: List[Dict[str, Any]], **kwargs):
-        response = await self.client.chat(
+        response = await self.chat(
             messages=messages,
             model=self.planner_llm,
             stream=False,
@@ -27,13 +265,12 @@ class OllamaClient:
         return self._fetch_json_from_content(response.message.content)
     
     async def answer(self, messages: List[Dict[str, Any]], **kwargs):
-        response = await self.client.chat(
+        return self._stream_chat(
             messages=messages,
             think=kwargs.get("think", False),
-            model=kwargs.get("model", self.planner_llm),
-            stream=True,
+            model=kwargs.get("model") or self.planner_llm,
+            options=kwargs.get("options"),
         )
-        return response
     
     async def get_chat_title(self, message: str):
         system_prompt = {
@@ -41,7 +278,7 @@ class OllamaClient:
             "content": "You are a helpful assistant. You are given a message. You need to give a title for the chat based on the message, please keep it short and concise. The title should be preferably around 5 words or less. The title should be a summary of the message itself but not its answer."
         }
         messages = [system_prompt, {"role": "user", "content": message}]
-        response = await self.client.chat(
+        response = await self.chat(
             messages=messages,
             model=self.planner_llm,
             stream=False,
@@ -79,10 +316,49 @@ class OllamaClient:
         Remember: Your goal is to create a summary that someone could read and understand the ENTIRE conversation without missing any important information.
         """
 
-        messages.insert(0, {"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": summary_prompt})
+        messages = [
+            {"role": "system", "content": system_prompt},
+            *messages,
+            {"role": "user", "content": summary_prompt}
+        ]
+
+        response = await self.chat(
+            messages=messages,
+            model=self.planner_llm,
+            stream=False,
+            think=False,
+            **kwargs
+        )
+        return response.message.content
+
+    async def fold_summary(self, previous_summary: str, new_messages: List[Dict[str, Any]], **kwargs) -> str:
+        """Fold new messages into an existing conversation summary."""
+        if not previous_summary:
+            return await self.get_summary(new_messages, **kwargs)
+
+        system_prompt = """You are an expert conversation analyst and summarizer. You maintain a running summary of a conversation that captures ALL important information."""
+
+        transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in new_messages)
+        fold_prompt = f"""
+        Here is the summary of the conversation so far:
+        {previous_summary}
+
+        Here are the new messages since that summary:
+        {transcript}
+
+        Update the summary so it also covers the new messages:
+        - Keep every topic, decision, detail and unresolved item from the previous summary unless the new messages resolve or correct it
+        - Add the topics, questions, answers and specific details from the new messages in chronological order
+        - Update the **Recent Focus** to reflect the latest exchanges
+        - Output only the updated summary
+        """
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": fold_prompt}
+        ]
 
-        response = await self.client.chat(
+        response = await self.chat(
             messages=messages,
             model=self.planner_llm,
             stream=False,
@@ -108,7 +384,7 @@ class OllamaClient:
             {"role": "user", "content": question}
         ]
 
-        response = await self.client.chat(
+        response = await self.chat(
             messages=messages,
             model=self.planner_llm,
             stream=False,
@@ -141,7 +417,7 @@ class OllamaClient:
             {"role": "user", "content": f"Context: {context}\n\nQuestion: {question}"}
         ]
 
-        response = await self.client.chat(
+        response = await self.chat(
             messages=messages,
             model=self.planner_llm,
             stream=False,
@@ -0,0 +1,90 @@
+import numpy as np
+from typing import Any, Dict, List
+
+# Labeled example questions for each context mode
+MODE_EXEMPLARS: Dict[str, List[str]] = {
+    "summary": [
+        "Summarize the video",
+        "Summarize the videos",
+        "Give me an overview",
+        "What is this video about?",
+        "What topics are covered?",
+        "What are the main points?",
+        "Give me a short recap",
+        "TL;DR",
+        "What is the main message of the video?",
+        "Compare what these videos are about",
+    ],
+    "timestamps": [
+        "List the key moments with timestamps",
+        "Give me a timeline of the video",
+        "Break the video down into chapters",
+        "What happens in the video, step by step, with times?",
+        "Create timestamps for each section",
+        "Outline the video chronologically",
+        "When does each topic start?",
+        "Make a table of contents with timecodes",
+    ],
+    "query": [
+        "Why did they mention blockchain?",
+        "How does the demo work?",
+        "When do they discuss future plans?",
+        "What did the speaker say about the budget?",
+        "Who is the person in the red shirt?",
+        "What color is the car?",
+        "Does he explain how to install it?",
+        "What was the final score?",
+        "Which tools are used in the tutorial?",
+        "What is the name of the company they mention?",
+    ],
+}
+
+# A route is trusted only if its score is high enough and clearly ahead of the runner-up
+MIN_SIMILARITY = 0.35
+MIN_MARGIN = 0.05
+
+class ModeRouter:
+    """
+    Picks the context mode of a question by similarity to labeled exemplars.
+
+    Each mode is scored by the mean similarity of its top-k closest exemplars.
+    Low-confidence questions return no mode, and the caller falls back to the LLM planner.
+    """
+
+    def __init__(self, embedder, top_k: int = 3):
+        self.embedder = embedder
+        self.top_k = top_k
+        self.modes = list(MODE_EXEMPLARS)
+        self.exemplar_embeddings = {
+            mode: np.array(embedder.embed_documents(exemplars), dtype=np.float32)
+            for mode, exemplars in MODE_EXEMPLARS.items()
+        }
+
+    def route(self, question: str) -> Dict[str, Any]:
+        """
+        Route a question to a context mode.
+
+        Args:
+            question (str): The user question.
+
+        Returns:
+            Dict[str, Any]: The chosen "mode" (None when not confident), the
+            "confidence" margin over the runner-up and the per-mode "scores".
+        """
+        query_embedding = np.array(self.embedder.embed_query(question), dtype=np.float32)
+
+        scores = {}
+        for mode, embeddings in self.exemplar_embeddings.items():
+            similarities = np.sort(embeddings @ query_embedding)[::-1]
+            scores[mode] = float(similarities[:self.top_k].mean())
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best, runner_up = ranked[0], ranked[1]
+        confidence = scores[best] - scores[runner_up]
+        confident = scores[best] >= MIN_SIMILARITY and confidence >= MIN_MARGIN
+
+        return {
+            "mode": best if confident else None,
+            "confidence": confidence,
+            "scores": scores,
+        }
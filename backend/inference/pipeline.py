@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from utils.tracing import span
+
+class StagePipeline:
+    """
+    A small DAG executor for the stages of a request.
+
+    Each stage is started as a task as soon as it is added and awaits the results
+    of its dependencies, so independent stages run concurrently. Stages whose
+    results turn out to be unneeded can be cancelled, and leaving the pipeline
+    context cancels everything still pending.
+
+    Cancelling a stage only cancels its task. Blocking work it already started
+    in an executor keeps running unless it checks the stage's cancel_event
+    between its steps, as retrieval does.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.cancel_events: Dict[str, threading.Event] = {}
+        self.cancelled = set()
+
+    async def __aenter__(self) -> "StagePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.cancel_pending()
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], deps: Iterable[str] = ()) -> asyncio.Task:
+        """
+        Add a stage to the pipeline.
+
+        Args:
+            name (str): Unique name of the stage.
+            fn (Callable[..., Awaitable[Any]]): Coroutine function called with the
+                results of the dependencies, in the order they are listed.
+            deps (Iterable[str]): Names of stages that must finish first.
+
+        Returns:
+            asyncio.Task: The task running the stage.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Stage already exists: {name}")
+
+        dep_tasks = [self.tasks[dep] for dep in deps]
+        self.cancel_events[name] = threading.Event()
+
+        async def run_stage():
+            dep_results = [await task for task in dep_tasks]
+            # Only the stage's own work is timed, not the wait for its dependencies
+            with span(name):
+                return await fn(*dep_results)
+
+        self.tasks[name] = asyncio.create_task(run_stage(), name=name)
+        return self.tasks[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.tasks and name not in self.cancelled
+
+    async def result(self, name: str) -> Any:
+        return await self.tasks[name]
+
+    def cancel_event(self, name: str) -> threading.Event:
+        """The event set when a stage is cancelled, for blocking work to check from its thread."""
+        return self.cancel_events[name]
+
+    def cancel(self, *names: str):
+        for name in names:
+            task = self.tasks.get(name)
+            if task is not None:
+                self.cancelled.add(name)
+                self.cancel_events[name].set()
+                if not task.done():
+                    task.cancel()
+
+    async def cancel_pending(self):
+        pending = [name for name, task in self.tasks.items() if not task.done()]
+        for name in pending:
+            self.cancel_events[name].set()
+            self.tasks[name].cancel()
+        # Let cancelled stages unwind, and retrieve exceptions of unneeded stages
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
@@ -0,0 +1,75 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Modes whose retrieval does not depend on the question
+QUESTION_INDEPENDENT_MODES = {"summary", "timestamps", "time_range"}
+
+class RetrievalCache:
+    """
+    Bounded LRU cache of per-video retrieval results.
+
+    Keys combine the video, the context mode, the normalized question and a
+    per-video index version. Bumping the version on re-ingest or delete makes
+    every older entry for that video unreachable, and LRU eviction drops them.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        return re.sub(r"\s+", " ", re.sub(r"[^\w\s:.-]", " ", question.lower())).strip(" .")
+
+    def get_version(self, video_name: str) -> int:
+        with self.lock:
+            return self.versions.get(video_name, 0)
+
+    def bump_version(self, video_name: str):
+        with self.lock:
+            self.versions[video_name] = self.versions.get(video_name, 0) + 1
+
+    def make_key(self, video_name: str, config: Dict[str, Any], question: str) -> Tuple:
+        mode = config["mode"]
+        mode_key = (mode, config.get("start"), config.get("end")) if mode == "time_range" else (mode,)
+        normalized_question = "" if mode in QUESTION_INDEPENDENT_MODES else self.normalize_question(question)
+        return (video_name, mode_key, normalized_question, self.get_version(video_name))
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key: Tuple, value: Any):
+        with self.lock:
+            # Entries computed against an index version that has since been bumped are useless
+            if key[-1] != self.versions.get(key[0], 0):
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,82 @@
+import re
+from typing import Optional, Tuple
+
+# Window around a single point in time, e.g. "what happens at 12:30"
+POINT_WINDOW_SEC = 30.0
+
+_TIMECODE = r"(\d{1,2}(?::\d{2}){1,2})"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_RANGE_SEP = r"\s*(?:-|–|—|to|and|until|till)\s*"
+# Units written after a number, where the bare "h", "m" and "s" forms are unambiguous
+_UNIT = r"(h|hr|hrs|hours?|m|min|mins|minutes?|s|sec|secs|seconds?)\b"
+# Units written before a number must be whole words, so "steps 3 to 5" is not read as seconds
+_UNIT_WORD = r"\b(hr|hrs|hours?|min|mins|minutes?|sec|secs|seconds?)\b"
+
+def _timecode_to_seconds(timecode: str) -> float:
+    seconds = 0.0
+    for part in timecode.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def _unit_to_seconds(value: str, unit: str) -> float:
+    unit = unit.lower()
+    if unit.startswith("h"):
+        return float(value) * 3600
+    if unit.startswith("m"):
+        return float(value) * 60
+    return float(value)
+
+def parse_time_range(question: str) -> Optional[Tuple[float, float]]:
+    """
+    Detect a time-anchored question and extract the range it refers to.
+
+    Handles timecode ranges ("from 10:00 to 12:30"), unit ranges ("minutes 10-20",
+    "between 30 and 90 seconds"), leading spans ("the first 5 minutes") and single
+    points ("around 12:30", "at 90 seconds"), which are widened by POINT_WINDOW_SEC.
+
+    Args:
+        question (str): The user question.
+
+    Returns:
+        Optional[Tuple[float, float]]: (start, end) in seconds, or None if the
+        question is not anchored to a time.
+    """
+    text = question.lower()
+
+    match = re.search(_TIMECODE + _RANGE_SEP + _TIMECODE, text)
+    if match:
+        start, end = _timecode_to_seconds(match.group(1)), _timecode_to_seconds(match.group(2))
+        return (min(start, end), max(start, end))
+
+    # "minutes 10-20" / "minute 10 to 20"
+    match = re.search(_UNIT_WORD + r"\s+" + _NUMBER + _RANGE_SEP + _NUMBER + r"\b", text)
+    if match:
+        start, end = _unit_to_seconds(match.group(2), match.group(1)), _unit_to_seconds(match.group(3), match.group(1))
+        return (min(start, end), max(start, end))
+
+    # "10-20 minutes" / "between 30 and 90 seconds"
+    match = re.search(r"\b" + _NUMBER + _RANGE_SEP + _NUMBER + r"\s*" + _UNIT, text)
+    if match:
+        start, end = _unit_to_seconds(match.group(1), match.group(3)), _unit_to_seconds(match.group(2), match.group(3))
+        return (min(start, end), max(start, end))
+
+    # "the first 5 minutes"
+    match = re.search(r"\bfirst\s+" + _NUMBER + r"\s*" + _UNIT, text)
+    if match:
+        return (0.0, _unit_to_seconds(match.group(1), match.group(2)))
+
+    match = re.search(_TIMECODE, text)
+    if match:
+        point = _timecode_to_seconds(match.group(1))
+        return (max(0.0, point - POINT_WINDOW_SEC), point + POINT_WINDOW_SEC)
+
+    # "at 90 seconds" / "around minute 12"
+    match = re.search(r"\b(?:at|around|near|about)\s+(?:the\s+)?(?:" + _NUMBER + r"\s*" + _UNIT + r"|" + _UNIT_WORD + r"\s+" + _NUMBER + r"\b)", text)
+    if match:
+        if match.group(1):
+            point = _unit_to_seconds(match.group(1), match.group(2))
+        else:
+            point = _unit_to_seconds(match.group(4), match.group(3))
+        return (max(0.0, point - POINT_WINDOW_SEC), point + POINT_WINDOW_SEC)
+
+    return None
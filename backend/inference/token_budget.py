@@ -0,0 +1,216 @@
+import math
+import re
+from typing import Any, Dict, List
+
+# Context window requested from Ollama when the model allows it
+DEFAULT_NUM_CTX = 8192
+# Tokens kept free for the model's answer
+RESPONSE_RESERVE_TOKENS = 1024
+# Role markers and separators added by chat templates
+MESSAGE_OVERHEAD_TOKENS = 4
+# Share of the prompt budget that chat history may take
+HISTORY_BUDGET_RATIO = 0.4
+# Gap in seconds under which adjacent speech segments are merged
+MERGE_GAP_SEC = 1.0
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate the number of tokens in a text.
+
+    Counts word and punctuation pieces, and falls back to ~4 characters per
+    token for long words, which BPE tokenizers split further. Errs on the high side.
+    """
+    if not text:
+        return 0
+    pieces = _TOKEN_PATTERN.findall(text)
+    return max(math.ceil(len(text) / 4), sum(1 + len(piece) // 6 for piece in pieces))
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to roughly `max_tokens` tokens, keeping its beginning."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # Binary search on the character length since the estimate is monotonic in it
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+def trim_history(messages: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Keep the most recent messages that fit in `max_tokens`.
+
+    If the newest message alone exceeds the budget it is truncated rather than
+    dropped, so a follow-up keeps at least the beginning of what it refers to.
+    """
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        tokens = estimate_message_tokens([message])
+        if used + tokens > max_tokens:
+            if not kept and max_tokens > MESSAGE_OVERHEAD_TOKENS:
+                content = truncate_to_tokens(message.get("content", ""), max_tokens - MESSAGE_OVERHEAD_TOKENS)
+                kept.append({**message, "content": content})
+            break
+        kept.append(message)
+        used += tokens
+    return list(reversed(kept))
+
+def fit_messages(messages: List[Dict[str, Any]], num_ctx: int, reserve: int = RESPONSE_RESERVE_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Make sure a prompt fits in the model context window.
+
+    Drops the oldest messages between the system prompt and the final user message
+    first, then truncates the longest remaining message. Prints what it removed so
+    an oversized prompt is never cut silently by the model runner.
+
+    Args:
+        messages (List[Dict[str, Any]]): The chat messages to send.
+        num_ctx (int): The context window of the model.
+        reserve (int): Tokens kept free for the answer.
+
+    Returns:
+        List[Dict[str, Any]]: A copy of the messages that fits in the window.
+    """
+    max_tokens = num_ctx - reserve
+    messages = list(messages)
+    total = estimate_message_tokens(messages)
+    if total <= max_tokens:
+        return messages
+
+    print(f"Prompt of ~{total} tokens exceeds the {max_tokens} token budget, trimming")
+
+    first = 1 if messages and messages[0]["role"] == "system" else 0
+    while total > max_tokens and len(messages) - first > 1:
+        total -= estimate_message_tokens([messages.pop(first)])
+
+    while total > max_tokens:
+        longest = max(range(len(messages)), key=lambda i: estimate_tokens(messages[i].get("content", "")))
+        content = messages[longest].get("content", "")
+        allowed = max(0, estimate_tokens(content) - (total - max_tokens))
+        messages[longest] = {**messages[longest], "content": truncate_to_tokens(content, allowed)}
+        new_total = estimate_message_tokens(messages)
+        if new_total >= total:
+            break
+        total = new_total
+
+    return messages
+
+def _format_timestamp(seconds: float) -> str:
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+class ContextBuilder:
+    """
+    Packs retrieved segments into a context block under a token budget.
+
+    Segments arrive ranked by value within each modality. They are interleaved in
+    proportion to their rank, so both modalities keep their share, and added until
+    the budget is spent. Duplicate captions are skipped, and the selection is then
+    emitted in time order with adjacent speech segments merged into one line.
+    """
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+
+    def _speech_line(self, segment: Dict[str, Any]) -> str:
+        return f"At {_format_timestamp(segment['ts_start'])} - {_format_timestamp(segment['ts_end'])}: {segment['text']}"
+
+    def _scene_line(self, scene: Dict[str, Any]) -> str:
+        if int(scene["ts_end"]) > int(scene["ts_start"]):
+            return f"At {_format_timestamp(scene['ts_start'])} - {_format_timestamp(scene['ts_end'])}: {scene['text']}"
+        return f"At {_format_timestamp(scene['ts_start'])}: {scene['text']}"
+
+    def _prioritize(self, asr_metadatas: List[Dict[str, Any]], frame_metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ranked = [(("asr", metadata), (rank + 1) / len(asr_metadatas)) for rank, metadata in enumerate(asr_metadatas)]
+        ranked += [(("frame", metadata), (rank + 1) / len(frame_metadatas)) for rank, metadata in enumerate(frame_metadatas)]
+        # Stable sort keeps speech ahead of scenes at equal relative rank
+        return [item for item, _ in sorted(ranked, key=lambda x: x[1])]
+
+    def _build_video(self, video_context: Dict[str, Any], token_budget: int) -> str:
+        header = video_context.get("metadata_context", "")
+        used = estimate_tokens(header)
+        if used > token_budget:
+            header, used = "", 0
+
+        speech: List[Dict[str, Any]] = []
+        scenes: Dict[str, Dict[str, Any]] = {}
+        section_tokens = {"asr": estimate_tokens("Relevant Speech:"), "frame": estimate_tokens("Relevant Visual Scenes:")}
+
+        for modality, metadata in self._prioritize(video_context["asr_metadatas"], video_context["frame_metadatas"]):
+            if modality == "frame":
+                caption = re.sub(r"\W+", " ", metadata["text"].lower()).strip()
+                if caption in scenes:
+                    # Widen the range of the identical caption instead of repeating it
+                    scene = scenes[caption]
+                    scene["ts_start"] = min(scene["ts_start"], metadata["ts_start"])
+                    scene["ts_end"] = max(scene["ts_end"], metadata["ts_end"])
+                    continue
+                line = self._scene_line(metadata)
+            else:
+                line = self._speech_line(metadata)
+
+            tokens = estimate_tokens(line) + 1
+            if modality == "asr" and not speech or modality == "frame" and not scenes:
+                tokens += section_tokens[modality]
+            if used + tokens > token_budget:
+                continue
+
+            used += tokens
+            if modality == "frame":
+                scenes[caption] = {"ts_start": metadata["ts_start"], "ts_end": metadata["ts_end"], "text": metadata["text"]}
+            else:
+                speech.append(metadata)
+
+        context_parts = []
+        if header:
+            context_parts.append("\n" + header)
+
+        if speech:
+            context_parts.append("\nRelevant Speech:")
+            merged: List[Dict[str, Any]] = []
+            for segment in sorted(speech, key=lambda x: x["ts_start"]):
+                if merged and segment["ts_start"] <= merged[-1]["ts_end"] + MERGE_GAP_SEC:
+                    merged[-1]["ts_end"] = max(merged[-1]["ts_end"], segment["ts_end"])
+                    merged[-1]["text"] += " " + segment["text"]
+                else:
+                    merged.append({"ts_start": segment["ts_start"], "ts_end": segment["ts_end"], "text": segment["text"]})
+            context_parts.extend(self._speech_line(segment) for segment in merged)
+
+        if scenes:
+            context_parts.append("\nRelevant Visual Scenes:")
+            context_parts.extend(self._scene_line(scene) for scene in sorted(scenes.values(), key=lambda x: x["ts_start"]))
+
+        return "\n".join(context_parts)
+
+    def build(self, video_contexts: List[Dict[str, Any]]) -> str:
+        """
+        Build the context block for one or more videos.
+
+        Args:
+            video_contexts (List[Dict[str, Any]]): Entries from ContextExtractor.get_video_context.
+
+        Returns:
+            str: The packed context. Budget left unused by one video carries over to the next.
+        """
+        context_parts = []
+        remaining = self.token_budget
+
+        for i, video_context in enumerate(video_contexts):
+            share = remaining // (len(video_contexts) - i)
+            context = self._build_video(video_context, share)
+            remaining -= estimate_tokens(context)
+            if context:
+                context_parts.append(context)
+
+        return "\n".join(context_parts)
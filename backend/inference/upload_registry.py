@@ -0,0 +1,135 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Seconds a question waits for its attachments before giving up
+ATTACHMENT_READY_TIMEOUT_SEC = 30.0
+
+class AttachmentNotReadyError(Exception):
+    """Raised when an attachment failed to upload or did not arrive in time."""
+
+class UploadRegistry:
+    """
+    Tracks the lifecycle of chat attachments: uploading, ready or failed.
+
+    Questions await the readiness of their attachments instead of polling the
+    file system, and are resumed the moment the last upload completes. Files
+    already on disk from an earlier session count as ready. When an upload
+    completes, the preprocessor registered for its extension is started right
+    away, so the work is usually done by the time a question needs it.
+
+    Lives on the event loop, like the rest of VideoRAG's request state.
+    """
+
+    def __init__(self, file_dir: str, ready_timeout_sec: float = ATTACHMENT_READY_TIMEOUT_SEC):
+        self.file_dir = file_dir
+        self.ready_timeout_sec = ready_timeout_sec
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.preprocessors: Dict[str, Callable[[str, str], Awaitable[Any]]] = {}
+
+    def register_preprocessor(self, extension: str, preprocess: Callable[[str, str], Awaitable[Any]]):
+        """
+        Run a coroutine on every completed upload with the given extension.
+
+        Args:
+            extension (str): Lower-case file extension including the dot, e.g. ".pdf".
+            preprocess (Callable[[str, str], Awaitable[Any]]): Called with the file path
+                and the SHA-256 of its contents. Its result is available from preprocessed().
+        """
+        self.preprocessors[extension] = preprocess
+
+    def _entry(self, filename: str) -> Dict[str, Any]:
+        entry = self.entries.get(filename)
+        if entry is None:
+            entry = {
+                "status": "waiting",
+                "ready": asyncio.get_running_loop().create_future(),
+                "content_hash": None,
+                "preprocess_task": None,
+            }
+            self.entries[filename] = entry
+        return entry
+
+    def begin(self, filename: str):
+        """Mark an attachment as uploading, replacing a previous upload of the same name."""
+        entry = self._entry(filename)
+        if entry["ready"].done():
+            # Questions asked from now on wait for the new contents
+            entry["ready"] = asyncio.get_running_loop().create_future()
+        if entry["preprocess_task"] is not None:
+            entry["preprocess_task"].cancel()
+            entry["preprocess_task"] = None
+        entry["status"] = "uploading"
+
+    def complete(self, filename: str, content_hash: str):
+        entry = self._entry(filename)
+        entry["status"] = "ready"
+        entry["content_hash"] = content_hash
+        if not entry["ready"].done():
+            entry["ready"].set_result(content_hash)
+
+        preprocess = self.preprocessors.get(os.path.splitext(filename)[1].lower())
+        if preprocess is not None:
+            entry["preprocess_task"] = asyncio.create_task(preprocess(self.path(filename), content_hash))
+
+    def fail(self, filename: str, error: str):
+        entry = self._entry(filename)
+        entry["status"] = "failed"
+        if not entry["ready"].done():
+            entry["ready"].set_exception(AttachmentNotReadyError(f"Upload of {filename} failed: {error}"))
+            # Nobody may be waiting, which is fine
+            entry["ready"].exception()
+
+    def is_ready(self, filename: str) -> bool:
+        entry = self.entries.get(filename)
+        if entry is None:
+            return os.path.exists(self.path(filename))
+        return entry["status"] == "ready"
+
+    def path(self, filename: str) -> str:
+        return os.path.abspath(os.path.join(self.file_dir, filename))
+
+    def content_hash(self, filename: str) -> Optional[str]:
+        entry = self.entries.get(filename)
+        return entry["content_hash"] if entry is not None else None
+
+    async def preprocessed(self, filename: str) -> Optional[Any]:
+        """Await the preprocessing result of a ready attachment, None if it has no preprocessor."""
+        entry = self.entries.get(filename)
+        if entry is None or entry["preprocess_task"] is None:
+            return None
+        return await asyncio.shield(entry["preprocess_task"])
+
+    async def wait_ready(self, filenames: List[str], timeout_sec: Optional[float] = None) -> List[str]:
+        """
+        Wait until all attachments are uploaded.
+
+        Args:
+            filenames (List[str]): Sanitized attachment filenames.
+            timeout_sec (Optional[float]): Defaults to the registry's ready timeout.
+
+        Raises:
+            AttachmentNotReadyError: If an upload failed, or an attachment is not
+                ready within the timeout.
+
+        Returns:
+            List[str]: Absolute paths of the attachments, in the given order.
+        """
+        # Attachments from before a restart are only known by their file
+        waiting = [filename for filename in filenames if not self.is_ready(filename)]
+
+        if waiting:
+            futures = [asyncio.shield(self._entry(filename)["ready"]) for filename in waiting]
+            try:
+                await asyncio.wait_for(asyncio.gather(*futures), timeout_sec or self.ready_timeout_sec)
+            except asyncio.TimeoutError:
+                missing = [filename for filename in waiting if self.entries[filename]["status"] != "ready"]
+                raise AttachmentNotReadyError(f"Attachments not uploaded in time: {', '.join(missing)}")
+
+        return [self.path(filename) for filename in filenames]
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for entry in self.entries.values():
+            statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+        return statuses
@@ -2,21 +2,79 @@ import os
 import torch
 import json
 import jsonschema
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from string import Template
 from fastapi import UploadFile
 import asyncio
-from pathlib import Path
-import fitz  
+import threading
+import weakref
 
 from inference.llm_client import OllamaClient
 from inference.context_extractor import ContextExtractor
 from inference.chat_history import ChatHistory
+from inference.executors import retrieval_executor, database_executor
+from inference.time_anchors import parse_time_range
+from inference.mode_router import ModeRouter
+from inference.pipeline import StagePipeline
+from inference.retrieval_cache import RetrievalCache
+from inference.answer_cache import AnswerCache, fingerprint_file
+from inference.upload_registry import UploadRegistry
+from inference.attachment_index import PdfAttachmentIndex
+from inference.image_preparation import ImagePreparer
+from inference.token_budget import (
+    ContextBuilder,
+    estimate_tokens,
+    estimate_message_tokens,
+    trim_history,
+    fit_messages,
+    RESPONSE_RESERVE_TOKENS,
+    HISTORY_BUDGET_RATIO,
+)
+from preprocessing.store_video_summaries import (
+    create_video_summary_table,
+    store_video_summary,
+    get_video_summary as get_stored_video_summary,
+)
 from utils.sanitize_filename import sanitize_filename
+from utils.streaming_upload import save_upload
+from utils.tracing import span
 
 PROMPT_DIR = "./inference/prompts"
 FILE_DIR = "./data/files"
 
+# Upper bound for concurrent per-video summary generations
+MAX_CONCURRENT_SUMMARIES = 4
+# Tokens taken by the system prompt of OllamaClient.get_video_summary
+VIDEO_SUMMARY_PROMPT_TOKENS = 512
+# Question used to generate the persisted timeline summary of a video
+VIDEO_SUMMARY_QUESTION = "Summarize the whole video as a timeline."
+# System prompt of questions answered without video context
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant that can answer questions."
+# Characters per chunk when replaying a cached answer
+REPLAY_CHUNK_CHARS = 32
+
+# JSON schema the planner output must satisfy
+ROUTER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "mode": {
+            "type": "string",
+            "enum": ["query", "summary", "timestamps", "time_range"]
+        },
+        "start": {"type": "number", "minimum": 0},
+        "end": {"type": "number", "minimum": 0}
+    },
+    "required": ["mode"],
+    "if": {"properties": {"mode": {"const": "time_range"}}},
+    "then": {"required": ["start", "end"]}
+}
+# Subset of ROUTER_SCHEMA passed to Ollama to constrain decoding
+PLANNER_FORMAT = {
+    "type": "object",
+    "properties": ROUTER_SCHEMA["properties"],
+    "required": ["mode"]
+}
+
 class VideoRAG:
     _instance = None
 
@@ -26,13 +84,33 @@ class VideoRAG:
             cls._instance._initialized = False
         return cls._instance
     
-    def __init__(self):
+    def __init__(self, max_concurrent_summaries: int = MAX_CONCURRENT_SUMMARIES):
         if self._initialized:
             return 
         
         self.ollama_client = OllamaClient()
         self.context_extractor = ContextExtractor()
         self.chat_history = ChatHistory()
+        self.mode_router = ModeRouter(self.context_extractor.whisper_embedder)
+        create_video_summary_table()
+
+        # Cap the number of concurrent per-video LLM summaries
+        self.summary_semaphore = asyncio.Semaphore(max_concurrent_summaries)
+
+        # Rolling conversation summaries are updated in the background, one fold per chat at a time.
+        # A lock lives only as long as an update holds or awaits it
+        self.summary_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.background_tasks = set()
+
+        # In-flight generations of persisted per-video summaries
+        self.video_summary_tasks: Dict[str, asyncio.Task] = {}
+
+        # Opt-in cache of final answers to opening questions without video context
+        self.answer_cache = AnswerCache()
+        self.pdf_index = PdfAttachmentIndex(self.context_extractor.whisper_embedder)
+        self.image_preparer = ImagePreparer()
+        self.upload_registry = UploadRegistry(FILE_DIR)
+        self.upload_registry.register_preprocessor(".pdf", self._preprocess_pdf)
 
         # Load text prompts
         self.planning_text = self._load_text_prompts("planning.txt")
@@ -40,6 +118,7 @@ class VideoRAG:
             "timestamps": self._load_text_prompts("timestamps.txt"),
             "summary": self._load_text_prompts("summary.txt"),
             "query": self._load_text_prompts("query.txt"),
+            "time_range": self._load_text_prompts("time_range.txt"),
             "ignore": self._load_text_prompts("ignore.txt")
         }
 
@@ -53,7 +132,7 @@ class VideoRAG:
         """Refresh the ChromaDB client to ensure it sees newly added embeddings."""
         self.context_extractor.refresh_chroma_client()
         
-    async def _plan(self, plan_messages: List[Dict[str, Any]], max_retries: int = 10, **kwargs):
+    async def _plan(self, plan_messages: List[Dict[str, Any]], max_retries: int = 3, **kwargs):
         config = {
             "mode": "summary"
         }
@@ -61,7 +140,7 @@ class VideoRAG:
         
         while retry_count < max_retries:
             try:
-                planner_output = await self.ollama_client.plan(plan_messages)
+                planner_output = await self.ollama_client.plan(plan_messages, format=PLANNER_FORMAT, think=False)
                 print(f"Planner output: \n{planner_output}")
 
                 # Route and validate the planner output
@@ -77,198 +156,478 @@ class VideoRAG:
         return config
         
     def _route_and_validate(self, raw_json: str) -> Dict[str, Any]:
-        router_schema = {
-            "type": "object",
-            "properties": {
-                "mode": {
-                    "type": "string",
-                    "enum": ["query", "summary"]
-                }
-            },
-            "required": ["mode"]
-        }
-
         try:
             config = json.loads(raw_json)
         except json.JSONDecodeError as e:
             raise ValueError(f"Router output is not valid JSON: {e}")
         
-        jsonschema.validate(config, router_schema)
+        jsonschema.validate(config, ROUTER_SCHEMA)
         return config
     
-    async def _ask_multi_video(self, messages: List[Dict[str, Any]], config: Dict[str, Any], refined_question: str, video_names: List[str], video_metadatas: List[str], send_client: Callable = lambda **kwargs: None):
-        video_summaries = []
-
-        for i, video_name in enumerate(video_names):    
-            await send_client(status="retrieving_context", video_index=(i + 1), video_name=video_name)
-            context = self.context_extractor.format_context(config, refined_question, [video_name])
-            await send_client(status="summarizing_context", video_index=(i + 1), video_name=video_name)
-            video_summary = await self.ollama_client.get_video_summary(context, refined_question)
-
-            video_summary_message = f"=== Video {i + 1} ===\n"
-            video_summary_message += f"Video name: {video_name}\n"
-            video_summary_message += f"Video summary: \n{video_summary}\n\n"
-            video_summaries.append({"role": "assistant", "content": video_summary_message})
+    async def _retrieve_video_context(self, config: Dict[str, Any], question: str, video_index: Optional[int], video_name: str, send_client: Callable = lambda **kwargs: None, cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        await send_client(status="retrieving_context", video_index=video_index, video_name=video_name)
+        return await retrieval_executor.run(self.context_extractor.get_video_context, config, question, video_name, cancel_event)
+
+    async def _generate_video_summary(self, video_name: str) -> str:
+        # Stored summaries must match the segments they were generated from
+        version = self.context_extractor.retrieval_cache.get_version(video_name)
+        video_context = await retrieval_executor.run(self.context_extractor.get_video_context, { "mode": "timestamps" }, "", video_name)
+
+        # Pack the context into the planner model's window
+        num_ctx = await self.ollama_client.get_num_ctx(self.ollama_client.planner_llm)
+        token_budget = num_ctx - RESPONSE_RESERVE_TOKENS - VIDEO_SUMMARY_PROMPT_TOKENS - estimate_tokens(VIDEO_SUMMARY_QUESTION)
+        context = ContextBuilder(token_budget).build([video_context])
+
+        async with self.summary_semaphore:
+            summary = await self.ollama_client.get_video_summary(context, VIDEO_SUMMARY_QUESTION, options={"num_ctx": num_ctx})
+
+        if version == self.context_extractor.retrieval_cache.get_version(video_name):
+            await database_executor.run(store_video_summary, video_name, summary)
+        return summary
+
+    async def get_video_summary(self, video_name: str, video_index: Optional[int] = None, send_client: Optional[Callable] = None) -> str:
+        """
+        Get the persisted timeline summary of a video, generating it on first use.
+
+        Concurrent requests for the same video share a single generation. Background
+        callers pass no send_client, so no status is reported.
+        """
+        summary = await database_executor.run(get_stored_video_summary, video_name)
+        if summary:
+            return summary
+
+        if send_client is not None:
+            await send_client(status="summarizing_context", video_index=video_index, video_name=video_name)
+
+        task = self.video_summary_tasks.get(video_name)
+        if task is None:
+            task = asyncio.create_task(self._generate_video_summary(video_name))
+            self.video_summary_tasks[video_name] = task
+            task.add_done_callback(lambda _: self.video_summary_tasks.pop(video_name, None))
+
+        # A cancelled request must not abort a generation other requests may be waiting on
+        return await asyncio.shield(task)
+
+    def schedule_video_summary(self, video_name: str):
+        """Generate the summary of a freshly ingested video in the background."""
+        async def generate():
+            try:
+                await self.get_video_summary(video_name)
+                print(f"Stored summary of video {video_name}")
+            except Exception as e:
+                print(f"Failed to summarize video {video_name}: {e}")
+
+        task = asyncio.create_task(generate())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _ask_multi_video(self, messages: List[Dict[str, Any]], config: Dict[str, Any], refined_question: str, video_names: List[str], video_summaries: List[str], video_contexts: List[Optional[Dict[str, Any]]], model: str):
+        system_message = {"role": "system", "content": self.prompts[config["mode"]]}
+        question_message = {"role": "user", "content": refined_question}
+        video_headers = [
+            f"=== Video {i + 1} ===\nVideo name: {video_name}\nVideo summary: \n{video_summary}\n\n"
+            for i, (video_name, video_summary) in enumerate(zip(video_names, video_summaries))
+        ]
+
+        # Question-specific context shares whatever the summaries and history leave of the window
+        num_ctx = await self.ollama_client.get_num_ctx(model or self.ollama_client.planner_llm)
+        prompt_budget = num_ctx - RESPONSE_RESERVE_TOKENS - estimate_message_tokens([system_message, question_message, *[{"content": header} for header in video_headers]])
+        history = trim_history(messages, int(prompt_budget * HISTORY_BUDGET_RATIO))
+        context_budget = (prompt_budget - estimate_message_tokens(history)) // max(1, sum(1 for video_context in video_contexts if video_context))
+
+        video_summary_messages = []
+
+        for video_header, video_context in zip(video_headers, video_contexts):
+            video_summary_message = video_header
+            if video_context:
+                video_summary_message += f"Relevant context: \n{ContextBuilder(context_budget).build([video_context])}\n\n"
+            video_summary_messages.append({"role": "assistant", "content": video_summary_message})
             print(f"Video summary message: \n{video_summary_message}\n\n")
 
         # output_prompt = Template(self.prompts[config["mode"]]).substitute(context="")
 
         messages = [
-            {"role": "system", "content": self.prompts[config["mode"]]},
-            *messages,
-            *video_summaries,
-            {"role": "user", "content": refined_question}
+            system_message,
+            *history,
+            *video_summary_messages,
+            question_message
         ]
 
         return messages
     
-    async def _ask_single_video(self, messages: List[Dict[str, Any]], config: Dict[str, Any], refined_question: str, video_names: List[str], send_client: Callable = lambda **kwargs: None):
-        await send_client(status="retrieving_context", video_name=video_names[0])
-        # Get formatted context from ContextExtractor
-        context = self.context_extractor.format_context(config, refined_question, video_names)
+    async def _ask_single_video(self, messages: List[Dict[str, Any]], config: Dict[str, Any], refined_question: str, video_contexts: List[Dict[str, Any]], model: str):
+        # Split the answer model's window between history and video context
+        system_message = {"role": "system", "content": self.prompts[config["mode"]]}
+        question_message = {"role": "user", "content": refined_question}
+        context_prefix = "Here is the relevant context of the videos: \n"
+        num_ctx = await self.ollama_client.get_num_ctx(model or self.ollama_client.planner_llm)
+        prompt_budget = num_ctx - RESPONSE_RESERVE_TOKENS - estimate_message_tokens([system_message, question_message, {"content": context_prefix}])
+        history = trim_history(messages, int(prompt_budget * HISTORY_BUDGET_RATIO))
+        context = ContextBuilder(prompt_budget - estimate_message_tokens(history)).build(video_contexts)
         
         messages = [
-            {"role": "system", "content": self.prompts[config["mode"]]},
-            *messages,
-            {"role": "assistant", "content": f"Here is the relevant context of the videos: \n{context}"},
-            {"role": "user", "content": refined_question}
+            system_message,
+            *history,
+            {"role": "assistant", "content": f"{context_prefix}{context}"},
+            question_message
         ]
 
         return messages
+
+    async def _safe_video_summary(self, pipeline: StagePipeline, video_name: str) -> str:
+        try:
+            return await pipeline.result(f"video_summary:{video_name}")
+        except Exception as e:
+            print(f"Failed to get summary of video {video_name}: {e}")
+            return ""
+
+    async def _select_mode(self, question: str, video_mode: str, get_video_metadatas: Callable[[], Awaitable[List[str]]], send_client: Callable = lambda **kwargs: None) -> Dict[str, Any]:
+        time_range = parse_time_range(question) if video_mode in ("", "time_range") else None
+        if time_range:
+            # Time-anchored questions are answered from the interval index, no planner needed
+            return { "mode": "time_range", "start": time_range[0], "end": time_range[1] }
+        if video_mode == "time_range":
+            return { "mode": "summary" }
+        if video_mode:
+            return { "mode": video_mode }
+
+        # Route locally first and only ask the planner LLM when the router is unsure
+        route = await retrieval_executor.run(self.mode_router.route, question)
+        print(f"Router output: {route}")
+        if route["mode"]:
+            return { "mode": route["mode"] }
+
+        # Use string replacement instead of .format() to avoid conflicts with JSON braces
+        plan_prompt = Template(self.planning_text).substitute(
+            question=question,
+            video_metadatas=repr(await get_video_metadatas())
+        )
+        plan_messages = [
+            {"role": "system", "content": "You are a helpful assistant that can answer questions in json format."},
+            {"role": "user", "content": plan_prompt}
+        ]
+        print(f"Plan messages: \n{plan_prompt}")
+        await send_client(status="selecting_mode")
+        return await self._plan(plan_messages)
     
-    async def _generate_response(self, messages: List[Dict[str, Any]], chat_id: int, model: str, think: bool, send_client: Callable = lambda **kwargs: None):        
-        await send_client(status="loading_model", model=model)
+    async def _prepare_answer_cache(self, chat_id: int, previous_messages: List[Dict[str, Any]], model: str, think: bool, system_prompt: str, question: str, fingerprints: List[str] = []) -> Optional[Dict[str, Any]]:
+        """Get the answer cache scope and question embedding, or None if the answer must not be cached."""
+        # Answers to follow-ups depend on the conversation, so only opening questions are cached
+        if not self.answer_cache.enabled or previous_messages:
+            return None
+        if await database_executor.run(self.chat_history.is_answer_cache_opted_out, chat_id):
+            return None
+
+        embedding = await retrieval_executor.run(self.context_extractor.whisper_embedder.embed_query, question)
+        return {
+            "scope": AnswerCache.make_scope(model or self.ollama_client.planner_llm, think, system_prompt, fingerprints),
+            "embedding": AnswerCache.normalize_embedding(embedding),
+            "question": question,
+        }
+
+    async def _replay_answer(self, cached: Dict[str, Any], chat_id: int):
+        # Replay in small chunks so the client renders a cached answer like a generated one
+        for response_type, text in (("thinking", cached["thinking"]), ("markdown", cached["answer"])):
+            for i in range(0, len(text), REPLAY_CHUNK_CHARS):
+                yield {"chat_id": chat_id, "type": response_type, "content": text[i:i + REPLAY_CHUNK_CHARS], "done": False}
+                await asyncio.sleep(0)
+        yield {"chat_id": chat_id, "type": "markdown", "content": "", "done": True}
+
+    async def _generate_response(self, messages: List[Dict[str, Any]], chat_id: int, model: str, think: bool, send_client: Callable = lambda **kwargs: None, answer_cache_request: Optional[Dict[str, Any]] = None):        
+        cached = self.answer_cache.lookup(answer_cache_request["scope"], answer_cache_request["embedding"]) if answer_cache_request else None
 
-        # Get streaming response from LLM
         full_response = ""
         full_thinking = ""
-        async for chunk in await self.ollama_client.answer(messages, think=think, stream=True, model=model): # type: ignore
-            content = chunk.get("message", {}).get("content", "")
-            think_content = chunk.get("message", {}).get("thinking", "")
-            done = chunk.get("done", False)
-            
-            if think_content:
-                response_data = {"chat_id": chat_id, "type": "thinking", "content": think_content, "done": done}
-                full_thinking += think_content
-            else:
-                response_data = {"chat_id": chat_id, "type": "markdown", "content": content, "done": done}
-                full_response += content
 
-            yield response_data
+        try:
+            if cached:
+                print(f"Answer cache hit ({cached['similarity']:.3f}) for: {cached['question']}")
+                full_response = cached["answer"]
+                full_thinking = cached["thinking"]
+                async for response_data in self._replay_answer(cached, chat_id):
+                    yield response_data
+            else:
+                # Never let the prompt overflow the context window silently
+                num_ctx = await self.ollama_client.get_num_ctx(model or self.ollama_client.planner_llm)
+                messages = fit_messages(messages, num_ctx)
+
+                # Only report loading when the model is not already resident
+                with span("model_load"):
+                    await self.ollama_client.ensure_loaded(
+                        model or self.ollama_client.planner_llm,
+                        on_load=lambda: send_client(status="loading_model", model=model)
+                    )
+
+                # Get streaming response from LLM
+                stream = await self.ollama_client.answer(messages, think=think, stream=True, model=model, options={"num_ctx": num_ctx})
+                try:
+                    async for chunk in stream: # type: ignore
+                        content = chunk.get("message", {}).get("content", "")
+                        think_content = chunk.get("message", {}).get("thinking", "")
+                        done = chunk.get("done", False)
+                        
+                        if think_content:
+                            response_data = {"chat_id": chat_id, "type": "thinking", "content": think_content, "done": done}
+                            full_thinking += think_content
+                        else:
+                            response_data = {"chat_id": chat_id, "type": "markdown", "content": content, "done": done}
+                            full_response += content
+
+                        yield response_data
+                finally:
+                    # Closing the stream early closes the connection, which stops the generation in Ollama
+                    await stream.aclose()
+
+                if answer_cache_request and full_response:
+                    self.answer_cache.put(answer_cache_request["scope"], answer_cache_request["embedding"], answer_cache_request["question"], full_response, full_thinking)
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client stopped listening. Keep what was generated so far
+            print(f"Answer of chat {chat_id} cancelled after {len(full_response)} characters")
+            await self._store_answer(chat_id, full_thinking, full_response)
+            raise
 
         # Store complete messages only after streaming is finished
-        if full_thinking:
-            self.chat_history.add_message(chat_id, "thinking", full_thinking)
+        await self._store_answer(chat_id, full_thinking, full_response)
+
+    async def _store_answer(self, chat_id: int, full_thinking: str, full_response: str):
+        # Thinking and answer are written in one transaction
+        messages = [(role, content) for role, content in (("thinking", full_thinking), ("assistant", full_response)) if content]
+        if messages:
+            await database_executor.run(self.chat_history.add_messages, chat_id, messages)
         if full_response:
-            self.chat_history.add_message(chat_id, "assistant", full_response)
+            self._schedule_summary_update(chat_id)
+
+    def _schedule_summary_update(self, chat_id: int):
+        task = asyncio.create_task(self.update_conversation_summary(chat_id))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def update_conversation_summary(self, chat_id: int):
+        """Fold the messages added since the last update into the chat's rolling summary."""
+        lock = self.summary_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            try:
+                stored = await database_executor.run(self.chat_history.get_summary, chat_id)
+                previous_summary = stored["summary"] if stored else ""
+                last_message_id = stored["last_message_id"] if stored else 0
+
+                new_messages = await database_executor.run(self.chat_history.get_messages_after, chat_id, last_message_id)
+                if not new_messages:
+                    return
+
+                summary = await self.ollama_client.fold_summary(
+                    previous_summary,
+                    [{"role": message["role"], "content": message["content"]} for message in new_messages]
+                )
+                await database_executor.run(self.chat_history.save_summary, chat_id, summary, new_messages[-1]["id"])
+                print(f"Updated summary of chat {chat_id} up to message {new_messages[-1]['id']}")
+            except Exception as e:
+                print(f"Failed to update summary of chat {chat_id}: {e}")
     
     async def ask(self, question: str, video_names: List[str], chat_id: int, model: str, think: bool, video_mode: str, send_client: Callable = lambda **kwargs: None):
-        # Use planner LLM with loaded prompt
         multi_video = len(video_names) > 1
-        summary = ""
-        refined_question = question[:]
+        use_videos = bool(video_names) and video_mode != "ignore"
         print(f"Video names: {video_names}")
 
-        # Get chat history and add new question
-        previous_messages = self.chat_history.get_messages_for_llm(chat_id)
-        messages = previous_messages
-        print(f"Previous messages: \n{previous_messages}")
-
-        # Add summary to messages if there are previous messages and video names
-        if previous_messages and video_names and video_mode != "ignore":
-            await send_client(status="summarizing_history", message_count=len(previous_messages))
-            summary = await self.ollama_client.get_summary(previous_messages)
-            print(f"Summary: \n{summary}")
-            messages.append({"role": "assistant", "content": summary})
-
-        if video_names and video_mode != "ignore":
-            # Use string replacement instead of .format() to avoid conflicts with JSON braces
-            video_metadatas = [self.context_extractor.get_video_metadata_context(video_name) for video_name in video_names]
-            plan_prompt = Template(self.planning_text).substitute(
-                question=question,
-                video_metadatas=repr(video_metadatas)
-            )
-            plan_messages = [
-                {"role": "system", "content": "You are a helpful assistant that can answer questions in json format."},
-                {"role": "user", "content": plan_prompt}
-            ]
-            print(f"Plan messages: \n{plan_prompt}")
-            if video_mode:
-                config = { "mode": video_mode }
-            else:
-                await send_client(status="selecting_mode")
-                config = await self._plan(plan_messages)
+        answer_cache_request = None
+
+        # Independent stages start immediately and run concurrently
+        async with StagePipeline() as pipeline:
+            pipeline.add("history", lambda: database_executor.run(self.chat_history.get_messages_for_llm, chat_id))
+
+            if use_videos:
+                pipeline.add("summary", lambda: database_executor.run(self.chat_history.get_summary, chat_id))
+                pipeline.add("metadatas", lambda: asyncio.gather(*[
+                    database_executor.run(self.context_extractor.get_video_metadata_context, video_name)
+                    for video_name in video_names
+                ]))
+                pipeline.add("plan", lambda: self._select_mode(question, video_mode, lambda: pipeline.result("metadatas"), send_client))
+
+                # Stored video summaries do not depend on the question
+                if multi_video:
+                    for i, video_name in enumerate(video_names):
+                        pipeline.add(
+                            f"video_summary:{video_name}",
+                            lambda i=i, video_name=video_name: self.get_video_summary(video_name, i + 1, send_client)
+                        )
+
+                # Speculatively retrieve for the raw question while planning and refinement run.
+                # Cancelling the stage also stops its retrieval in the executor, between steps
+                query_config = { "mode": "query" }
+                if video_mode in ("", "query") and parse_time_range(question) is None:
+                    for i, video_name in enumerate(video_names):
+                        stage = f"speculative:{video_name}"
+                        pipeline.add(
+                            stage,
+                            lambda i=i, video_name=video_name, stage=stage: self._retrieve_video_context(
+                                query_config, question, (i + 1) if multi_video else None, video_name, send_client, pipeline.cancel_event(stage)
+                            )
+                        )
+
+            previous_messages = await pipeline.result("history")
+            messages = previous_messages
+            print(f"Previous messages: \n{previous_messages}")
+
+            if use_videos:
+                summary = ""
+                refined_question = question
+
+                # Add the rolling summary to messages if there are previous messages
+                stored_summary = await pipeline.result("summary")
+                if previous_messages and stored_summary:
+                    summary = stored_summary["summary"]
+                    print(f"Summary: \n{summary}")
+                    messages = [*previous_messages, {"role": "assistant", "content": summary}]
+                elif previous_messages:
+                    # Chats from before rolling summaries get one in the background for later turns
+                    self._schedule_summary_update(chat_id)
+
+                config = await pipeline.result("plan")
                 print(f"Config: {config}")
 
-            if config["mode"] == "query":
-                await send_client(status="refining_query")
-                refined_question = await self.ollama_client.refine_question(question, summary)
-
-            if multi_video:
-                messages = await self._ask_multi_video(messages, config, refined_question, video_names, video_metadatas, send_client)
+                # Refinement only adds information when there is a conversation to draw from,
+                # otherwise the raw question is the search query and the speculative retrieval stands
+                if config["mode"] == "query" and summary:
+                    await send_client(status="refining_query")
+                    with span("refine"):
+                        refined_question = await self.ollama_client.refine_question(question, summary)
+
+                # Multi-video questions are answered from the stored summaries, so retrieval
+                # is only layered on top when the question targets specific content
+                needs_retrieval = not multi_video or config["mode"] in ("query", "time_range")
+                video_summaries = [await self._safe_video_summary(pipeline, video_name) for video_name in video_names] if multi_video else []
+
+                for i, video_name in enumerate(video_names):
+                    speculative_stage = f"speculative:{video_name}"
+                    reuse = (
+                        config["mode"] == "query"
+                        and pipeline.has(speculative_stage)
+                        and RetrievalCache.normalize_question(refined_question) == RetrievalCache.normalize_question(question)
+                    )
+                    if reuse:
+                        pipeline.add(f"retrieve:{video_name}", lambda stage=speculative_stage: pipeline.result(stage))
+                        continue
+
+                    pipeline.cancel(speculative_stage)
+                    # Fall back to retrieval for videos whose summary could not be generated
+                    if needs_retrieval or not video_summaries[i]:
+                        pipeline.add(
+                            f"retrieve:{video_name}",
+                            lambda i=i, video_name=video_name: self._retrieve_video_context(config, refined_question, (i + 1) if multi_video else None, video_name, send_client)
+                        )
+
+                video_contexts = [
+                    await pipeline.result(f"retrieve:{video_name}") if pipeline.has(f"retrieve:{video_name}") else None
+                    for video_name in video_names
+                ]
+
+                if multi_video:
+                    messages = await self._ask_multi_video(messages, config, refined_question, video_names, video_summaries, video_contexts, model)
+                else:
+                    messages = await self._ask_single_video(messages, config, refined_question, video_contexts, model)
             else:
-                messages = await self._ask_single_video(messages, config, refined_question, video_names, send_client)
-        else:
-            messages = [
-                {"role": "system", "content": "You are a helpful assistant that can answer questions."},
-                *messages,
-                {"role": "user", "content": refined_question}
-            ]
+                answer_cache_request = await self._prepare_answer_cache(chat_id, previous_messages, model, think, DEFAULT_SYSTEM_PROMPT, question)
+                messages = [
+                    {"role": "system", "content": DEFAULT_SYSTEM_PROMPT},
+                    *messages,
+                    {"role": "user", "content": question}
+                ]
 
-        self.chat_history.add_message(chat_id, "user", question)
-        return self._generate_response(messages, chat_id, model, think, send_client=send_client)
+        await database_executor.run(self.chat_history.add_message, chat_id, "user", question)
+        return self._generate_response(messages, chat_id, model, think, send_client=send_client, answer_cache_request=answer_cache_request)
 
     async def ask_with_files(self, question: str, files: List[str], chat_id: int, model: str, think: bool, send_client: Callable = lambda **kwargs: None):
         # Get chat history and add new question
-        previous_messages = self.chat_history.get_messages_for_llm(chat_id, 10)
+        with span("history"):
+            previous_messages = await database_executor.run(self.chat_history.get_messages_for_llm, chat_id, 10)
 
         files = [sanitize_filename(file) for file in files]
 
-        # Wait for all files to be saved
-        while not all(os.path.exists(os.path.join(FILE_DIR, file)) for file in files):
-            await asyncio.sleep(0.25)
+        # Resumes as soon as the last attachment is uploaded, or raises after a timeout
+        if not all(self.upload_registry.is_ready(file) for file in files):
+            await send_client(status="waiting_for_files", file_count=len(files))
+        with span("wait_for_files"):
+            file_paths = await self.upload_registry.wait_ready(files)
 
         # Get file contents, now just assume they are images
-        file_paths = [os.path.abspath(os.path.join(FILE_DIR, file)) for file in files]
-        pdf_file_paths = [file_path for file_path in file_paths if file_path.lower().endswith(".pdf")]
+        pdf_files = [file for file in files if file.lower().endswith(".pdf")]
+        pdf_file_paths = [self.upload_registry.path(file) for file in pdf_files]
         image_file_paths = [file_path for file_path in file_paths if file_path not in pdf_file_paths]
 
         await send_client(status="processing_pdfs", file_count=len(pdf_file_paths))
 
-        content = ""
-
-        for file_path in pdf_file_paths:
-            content += "\n\n" + f"=== PDF ({Path(file_path).stem}) ===\n"
-            with fitz.open(file_path) as doc:
-                for page in doc:
-                    content += page.get_text()
-            content += "\n\n"
+        # Indexing started when the upload completed, files from before a restart are indexed now
+        pdf_documents = []
+        with span("pdf_index"):
+            for file, file_path in zip(pdf_files, pdf_file_paths):
+                index = await self.upload_registry.preprocessed(file)
+                if index is None:
+                    content_hash = await self._attachment_hash(file)
+                    index = await retrieval_executor.run(self.pdf_index.get_or_build, file_path, content_hash)
+                pdf_documents.append((file_path, index))
+
+        # Images are sent at the resolution the model works at, prepared once per model resolution
+        if image_file_paths:
+            image_size = await self.ollama_client.get_image_size(model or self.ollama_client.planner_llm)
+            image_files = [file for file in files if file not in pdf_files]
+            with span("prepare_images"):
+                image_file_paths = [
+                    await retrieval_executor.run(self.image_preparer.prepare, file_path, await self._attachment_hash(file), image_size)
+                    for file, file_path in zip(image_files, image_file_paths)
+                ]
+
+        # Only the chunks relevant to the question are sent, under the budget left by history
+        system_message = {"role": "system", "content": DEFAULT_SYSTEM_PROMPT}
+        question_content = f"=== Question ===\n" + question
+        num_ctx = await self.ollama_client.get_num_ctx(model or self.ollama_client.planner_llm)
+        prompt_budget = num_ctx - RESPONSE_RESERVE_TOKENS - estimate_message_tokens([system_message, {"content": question_content}])
+        history = trim_history(previous_messages, int(prompt_budget * HISTORY_BUDGET_RATIO))
+        pdf_budget = prompt_budget - estimate_message_tokens(history)
 
-        content += f"=== Question ===\n" + question
+        content = ""
+        if pdf_documents:
+            with span("pdf_context"):
+                content = await retrieval_executor.run(self.pdf_index.build_context, pdf_documents, question, pdf_budget)
+        content += question_content
 
         print(f"Content: {content}")
 
         # Add images to the messages
         messages = [
-            {"role": "system", "content": "You are a helpful assistant that can answer questions."},
-            *previous_messages,
+            system_message,
+            *history,
             {"role": "user", "content": content, "images": image_file_paths}
         ]
 
-        self.chat_history.add_message(chat_id, "user", question)
-        return self._generate_response(messages, chat_id, model, think, send_client=send_client)
+        answer_cache_request = None
+        if self.answer_cache.enabled and not previous_messages:
+            fingerprints = [await self._attachment_hash(file) for file in files]
+            answer_cache_request = await self._prepare_answer_cache(chat_id, previous_messages, model, think, DEFAULT_SYSTEM_PROMPT, question, fingerprints)
 
-    async def save_file(self, file: UploadFile):
-        # Ensure the directory exists
-        os.makedirs(FILE_DIR, exist_ok=True)
-        
+        await database_executor.run(self.chat_history.add_message, chat_id, "user", question)
+        return self._generate_response(messages, chat_id, model, think, send_client=send_client, answer_cache_request=answer_cache_request)
+
+    async def _attachment_hash(self, file: str) -> str:
+        """SHA-256 of an attachment, hashed on upload or read again for files from before a restart."""
+        return self.upload_registry.content_hash(file) or await retrieval_executor.run(fingerprint_file, self.upload_registry.path(file))
+
+    async def _preprocess_pdf(self, file_path: str, content_hash: str) -> Dict[str, Any]:
+        return await retrieval_executor.run(self.pdf_index.get_or_build, file_path, content_hash)
+
+    async def save_file(self, file: UploadFile) -> str:
+        """Stream an attachment to FILE_DIR and return the SHA-256 of its contents."""
         # Quick sanitize: replace invalid chars with underscore
         safe_filename = sanitize_filename(file.filename)
         file_path = os.path.join(FILE_DIR, safe_filename)
         
-        if not os.path.exists(file_path):
-            with open(file_path, "wb") as f:
-                f.write(await file.read())
+        self.upload_registry.begin(safe_filename)
+        try:
+            content_hash, _ = await save_upload(file, file_path)
+        except BaseException as e:
+            self.upload_registry.fail(safe_filename, str(e) or type(e).__name__)
+            raise
+        self.upload_registry.complete(safe_filename, content_hash)
+        return content_hash
 
 if __name__ == "__main__":
     videorag = VideoRAG()
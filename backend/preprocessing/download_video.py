@@ -1,6 +1,13 @@
 import os
+import threading
 from pytubefix import YouTube
-from typing import Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.sanitize_filename import sanitize_filename
+from utils.streaming_upload import PARTIAL_SUFFIX
+
+class DownloadCancelled(Exception):
+    """Raised inside a download when its cancel event is set."""
 
 def is_youtube_video_downloadable(url: str) -> bool:
     """
@@ -19,32 +26,73 @@ def is_youtube_video_downloadable(url: str) -> bool:
         print(f"Error checking video: {e}")
         return False
 
+def _describe_stream(yt: YouTube, video_stream) -> Dict[str, Any]:
+    return {
+        "title": yt.title,
+        "duration": yt.length,
+        "filesize": video_stream.filesize,
+        "filename": sanitize_filename(video_stream.default_filename),
+    }
+
 def download_youtube_video(
     url: str, 
-    output_video_path: str = "./data/videos"
+    output_video_path: str = "./data/videos",
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_probe: Optional[Callable[[Dict[str, Any]], None]] = None
 ) -> str:
     """
     Download a YouTube video using pytube.
 
+    The video is streamed in chunks to a partial file, which is renamed to its
+    sanitized final name once complete, so a half-downloaded file is never ingested.
+
     Args:
         url (str): URL of the YouTube video.
         output_video_path (str): Path to save the downloaded video.
+        progress_callback (Optional[Callable[[int, int], None]]): Called with the
+            downloaded and total number of bytes after every chunk.
+        cancel_event (Optional[threading.Event]): Aborts the download when set.
+        on_probe (Optional[Callable[[Dict[str, Any]], None]]): Called with the
+            "title", "duration" in seconds, "filesize" in bytes and sanitized "filename"
+            of the video before the download starts.
     
     Raises:
         ValueError: If no video stream is found for the specified resolution.
+        DownloadCancelled: If cancel_event was set during the download.
 
     Returns:
         str: Path to the downloaded video file.
     """
-    yt = YouTube(url)
+    def on_progress(stream, chunk: bytes, bytes_remaining: int):
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled(url)
+        if progress_callback:
+            progress_callback(stream.filesize - bytes_remaining, stream.filesize)
+
+    yt = YouTube(url, on_progress_callback=on_progress)
 
     video_stream = yt.streams.filter(file_extension='mp4').first()  
 
     if not video_stream:
         raise ValueError(f"No video stream found.")
 
+    description = _describe_stream(yt, video_stream)
+    filename = description["filename"]
+    if on_probe:
+        on_probe(description)
+
     os.makedirs(output_video_path, exist_ok=True)
+    output_video_file = os.path.join(output_video_path, filename)
+    partial_file = output_video_file + PARTIAL_SUFFIX
+
+    try:
+        video_stream.download(output_video_path, filename=filename + PARTIAL_SUFFIX)
+    except BaseException:
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+        raise
 
-    output_video_file = video_stream.download(output_video_path)
+    os.replace(partial_file, output_video_file)
 
     return output_video_file
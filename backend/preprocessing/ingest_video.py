@@ -12,6 +12,7 @@ from preprocessing.store_embeddings import (
     get_chroma_collection,
     store_frame_embeddings,
     store_audio_embeddings,
+    store_summary_embedding,
     delete_all_embeddings
 )
 
@@ -19,6 +20,14 @@ from preprocessing.store_metadata import (
     store_video_metadata,
     delete_video_metadata
 )
+from preprocessing.store_lexical_index import (
+    store_lexical_segments,
+    delete_lexical_segments
+)
+from preprocessing.store_video_summaries import (
+    create_video_summary_table,
+    delete_video_summary
+)
 
 def extract_audio(video_path: str, audio_dir: str = "./data/audio") -> str:
     """
@@ -71,6 +80,8 @@ def ingest_video(
         # Get/create the Chroma collections
         frame_collection = get_chroma_collection("frames", client)
         audio_collection = get_chroma_collection("asr", client)
+        frame_summary_collection = get_chroma_collection("frame_summaries", client)
+        audio_summary_collection = get_chroma_collection("asr_summaries", client)
 
         # Extract filename for use as identifier
         video_filename = os.path.basename(video_path)
@@ -81,12 +92,19 @@ def ingest_video(
         
         frames = sample_frames(video_path, sample_interval_sec)
         audio_path = extract_audio(video_path)
+
+        # Probe the video and save its thumbnail, uploads only register the file
+        store_video_metadata(video_path, audio_path)
         
         # Generate CLIP embeddings
         if progress_callback:
             progress_callback(15, "Processing frames")
         
-        clip_embeddings = clip_embedder.embed_frames(frames, sample_interval_sec)
+        frame_progress = None
+        if progress_callback:
+            frame_progress = lambda done, total: progress_callback(15 + 35 * done // total, "Processing frames")
+
+        clip_embeddings = clip_embedder.embed_frames(frames, sample_interval_sec, frame_progress)
         
         # Generate Whisper embeddings
         if progress_callback:
@@ -99,12 +117,19 @@ def ingest_video(
         if progress_callback:
             progress_callback(80, "Storing embeddings")
 
-        # Store video metadata (still returns video_id for database compatibility)
-        store_video_metadata(video_path, audio_path)
+        # A summary of a previous ingest no longer matches the stored segments
+        create_video_summary_table()
+        delete_video_summary(video_filename)
 
         # Store frame embeddings using filename
         store_frame_embeddings(frame_collection, video_filename, clip_embeddings)
         store_audio_embeddings(audio_collection, video_filename, audio_embeddings)
+        store_summary_embedding(frame_summary_collection, video_filename, clip_embeddings)
+        store_summary_embedding(audio_summary_collection, video_filename, audio_embeddings)
+
+        # Index transcript and caption text for lexical retrieval
+        store_lexical_segments(video_filename, "frame", clip_embeddings)
+        store_lexical_segments(video_filename, "asr", audio_embeddings)
         
         return video_filename
             
@@ -125,5 +150,7 @@ def delete_video_files(video_path: str):
         os.remove(audio_path)
         os.remove(thumbnail_path)
         delete_all_embeddings(video_filename)
+        delete_lexical_segments(video_filename)
+        delete_video_summary(video_filename)
     except Exception as e:
         raise e
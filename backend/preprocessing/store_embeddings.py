@@ -1,4 +1,5 @@
 import chromadb
+import numpy as np
 from typing import List, Dict, Any
 
 def get_chroma_collection(
@@ -87,6 +88,37 @@ def store_audio_embeddings(
         metadatas=metadatas,
     )
 
+def store_summary_embedding(
+    collection: chromadb.Collection,
+    video_filename: str,
+    segments: List[Dict[str, Any]],
+) -> None:
+    """
+    Store a coarse per-video vector, the normalized mean of its segment embeddings.
+
+    These vectors let corpus-wide search prune the library to a few candidate
+    videos before querying individual segments.
+
+    Args:
+        collection (chromadb.Collection): The ChromaDB summary collection.
+        video_filename (str): Filename of the video (e.g., "trump_zelensky.mp4").
+        segments (List[Dict[str, Any]]): Segments with an "emb" embedding each.
+    """
+    if not segments:
+        return
+
+    mean_embedding = np.mean(np.array([seg["emb"] for seg in segments], dtype=np.float32), axis=0)
+    mean_embedding /= max(float(np.linalg.norm(mean_embedding)), 1e-12)
+
+    collection.upsert(
+        ids=[f"{video_filename}_summary"],
+        embeddings=[mean_embedding.tolist()],
+        metadatas=[{
+            "video_filename": video_filename,
+            "segment_count": len(segments)
+        }],
+    )
+
 def delete_all_embeddings(video_filename: str):
     client = chromadb.PersistentClient(path="./data/chroma_db")
 
@@ -0,0 +1,174 @@
+import re
+import sqlite3
+from typing import List, Dict, Any
+
+# Common words that carry no lexical signal and would match almost every segment
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does",
+    "for", "from", "he", "her", "him", "his", "how", "i", "in", "is", "it", "its", "me",
+    "my", "of", "on", "or", "she", "that", "the", "their", "them", "they", "this", "to",
+    "video", "was", "we", "were", "what", "when", "where", "which", "who", "why", "with",
+    "you", "your",
+    # Question verbs that rarely appear in the matching transcript
+    "describe", "discuss", "explain", "mention", "mentioned", "say", "said", "talk",
+}
+
+def create_lexical_index_table(db_path: str = "./data/video_metadata.db"):
+    """Create the FTS5 table over ASR segments and frame captions if it doesn't exist."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS segment_fts USING fts5(
+            text,
+            segment_id UNINDEXED,
+            video_filename UNINDEXED,
+            modality UNINDEXED,
+            ts_start UNINDEXED,
+            ts_end UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    ''')
+
+    conn.commit()
+    conn.close()
+
+def store_lexical_segments(
+    video_filename: str,
+    modality: str,
+    segments: List[Dict[str, Any]],
+    db_path: str = "./data/video_metadata.db"
+) -> None:
+    """
+    Index the text of ASR segments or frame captions for a video.
+
+    Segment IDs follow the same scheme as the Chroma vector IDs so lexical and
+    dense hits can be fused by ID.
+
+    Args:
+        video_filename (str): Filename of the video (e.g., "trump_zelensky.mp4").
+        modality (str): Either "asr" or "frame".
+        segments (List[Dict[str, Any]]): List of {start, end, text} segments in storage order.
+        db_path (str): Path to the SQLite database file.
+    """
+    create_lexical_index_table(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute(
+        'DELETE FROM segment_fts WHERE video_filename = ? AND modality = ?',
+        (video_filename, modality)
+    )
+    cursor.executemany('''
+        INSERT INTO segment_fts (text, segment_id, video_filename, modality, ts_start, ts_end)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            seg["text"],
+            f"{video_filename}_{modality}_{i}",
+            video_filename,
+            modality,
+            seg["start"],
+            seg["start"] if modality == "frame" else seg["end"],
+        )
+        for i, seg in enumerate(segments)
+    ])
+
+    conn.commit()
+    conn.close()
+
+def has_lexical_segments(video_filename: str, modality: str, db_path: str = "./data/video_metadata.db") -> bool:
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute(
+        'SELECT 1 FROM segment_fts WHERE video_filename = ? AND modality = ? LIMIT 1',
+        (video_filename, modality)
+    )
+    exists = cursor.fetchone() is not None
+
+    conn.close()
+    return exists
+
+def delete_lexical_segments(video_filename: str, db_path: str = "./data/video_metadata.db"):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('DELETE FROM segment_fts WHERE video_filename = ?', (video_filename,))
+
+    conn.commit()
+    conn.close()
+
+def build_fts_query(question: str, match_all: bool = False) -> str:
+    """
+    Turn a free-form question into an FTS5 MATCH expression.
+
+    Args:
+        question (str): The user question.
+        match_all (bool): Require every term to match instead of any term.
+
+    Returns:
+        str: The MATCH expression, or an empty string if no useful terms remain.
+    """
+    terms = []
+    for token in re.findall(r"\w+", question.lower()):
+        if token in STOPWORDS or token in terms:
+            continue
+        terms.append(token)
+
+    operator = " AND " if match_all else " OR "
+    return operator.join(f'"{term}"' for term in terms)
+
+def search_lexical_segments(
+    question: str,
+    video_filename: str,
+    modality: str,
+    limit: int = 50,
+    match_all: bool = False,
+    db_path: str = "./data/video_metadata.db"
+) -> List[Dict[str, Any]]:
+    """
+    Rank the segments of a video against a question with BM25.
+
+    Args:
+        question (str): The user question.
+        video_filename (str): Filename of the video to search.
+        modality (str): Either "asr" or "frame".
+        limit (int): Maximum number of hits to return.
+        match_all (bool): Only return segments containing every query term.
+        db_path (str): Path to the SQLite database file.
+
+    Returns:
+        List[Dict[str, Any]]: Hits ordered best first, each with the segment ID,
+        a BM25 score (higher is better) and Chroma-compatible metadata.
+    """
+    fts_query = build_fts_query(question, match_all)
+    if not fts_query:
+        return []
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT segment_id, text, ts_start, ts_end, bm25(segment_fts) AS score
+        FROM segment_fts
+        WHERE segment_fts MATCH ? AND video_filename = ? AND modality = ?
+        ORDER BY score
+        LIMIT ?
+    ''', (fts_query, video_filename, modality, limit))
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [{
+        "id": row[0],
+        "score": -row[4],
+        "metadata": {
+            "video_filename": video_filename,
+            "modality": modality,
+            "ts_start": row[2],
+            "ts_end": row[3],
+            "text": row[1],
+        }
+    } for row in rows]
@@ -1,9 +1,205 @@
 import os
-import sqlite3
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 import ffmpeg
 import hashlib
 
+from utils.sqlite_pool import SQLitePool
+
+# Read-through cache entries kept per database
+METADATA_CACHE_SIZE = 1024
+
+_METADATA_COLUMNS = (
+    "video_id, video_path, audio_path, duration, width, height, codec, fps, "
+    "thumbnail_path, task_id, task_status, task_progress, created_at, content_hash"
+)
+
+def _row_to_metadata(row: tuple) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "video_path": row[1],
+        "audio_path": row[2],
+        "duration": row[3],
+        "width": row[4],
+        "height": row[5],
+        "codec": row[6],
+        "fps": row[7],
+        "thumbnail_path": row[8],
+        "task_id": row[9],
+        "task_status": row[10],
+        "task_progress": row[11],
+        "created_at": row[12],
+        "content_hash": row[13]
+    }
+
+class VideoMetadataRepository:
+    """
+    Access layer for the video_metadata table.
+
+    Reads go through pooled per-thread connections and a bounded in-process
+    read-through cache keyed by video path. Every write through the repository
+    invalidates the entries it touches, so cached metadata is never stale.
+    """
+
+    _repositories: Dict[str, "VideoMetadataRepository"] = {}
+    _repositories_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str = "./data/video_metadata.db") -> "VideoMetadataRepository":
+        """Get the shared repository of a database file."""
+        with cls._repositories_lock:
+            if db_path not in cls._repositories:
+                cls._repositories[db_path] = cls(db_path)
+            return cls._repositories[db_path]
+
+    def __init__(self, db_path: str, cache_size: int = METADATA_CACHE_SIZE):
+        self.pool = SQLitePool.get(db_path)
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, video_path: Optional[str] = None):
+        with self.cache_lock:
+            if video_path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(video_path, None)
+
+    def get_by_path(self, video_path: str) -> Optional[Dict[str, Any]]:
+        with self.cache_lock:
+            if video_path in self.cache:
+                self.cache.move_to_end(video_path)
+                self.hits += 1
+                return self.cache[video_path]
+            self.misses += 1
+
+        cursor = self.pool.connection().execute(
+            f"SELECT {_METADATA_COLUMNS} FROM video_metadata WHERE video_path = ?",
+            (video_path,)
+        )
+        row = cursor.fetchone()
+        metadata = _row_to_metadata(row) if row else None
+
+        # Misses are cached too, a write to the path invalidates them
+        with self.cache_lock:
+            self.cache[video_path] = metadata
+            self.cache.move_to_end(video_path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return metadata
+
+    def get_by_content_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        cursor = self.pool.connection().execute(
+            f"SELECT {_METADATA_COLUMNS} FROM video_metadata WHERE content_hash = ? ORDER BY video_id LIMIT 1",
+            (content_hash,)
+        )
+        row = cursor.fetchone()
+        return _row_to_metadata(row) if row else None
+
+    def list(self, status: Optional[str] = None, before_id: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        List videos, most recently added first, in one indexed query.
+
+        Args:
+            status (Optional[str]): Only list videos whose task_status matches.
+            before_id (Optional[int]): Only list videos with a smaller video_id, the
+                cursor for the next page.
+            limit (int): Maximum number of videos to return.
+
+        Returns:
+            List[Dict[str, Any]]: Metadata of the listed videos.
+        """
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("task_status = ?")
+            params.append(status)
+        if before_id is not None:
+            conditions.append("video_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cursor = self.pool.connection().execute(
+            f"SELECT {_METADATA_COLUMNS} FROM video_metadata {where} ORDER BY video_id DESC LIMIT ?",
+            (*params, limit)
+        )
+        return [_row_to_metadata(row) for row in cursor.fetchall()]
+
+    def list_video_paths(self) -> List[str]:
+        cursor = self.pool.connection().execute("SELECT video_path FROM video_metadata")
+        return [row[0] for row in cursor.fetchall()]
+
+    def upsert(self, metadata: Dict[str, Any], task_id: Optional[str], task_status: Optional[str], task_progress: Optional[int]) -> int:
+        # Updating in place keeps the video_id and created_at of re-ingested videos
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO video_metadata (
+                    video_path, audio_path, duration, width, height, codec, fps, 
+                    thumbnail_path, task_id, task_status, task_progress, content_hash
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_path) DO UPDATE SET
+                    audio_path = excluded.audio_path,
+                    duration = excluded.duration,
+                    width = excluded.width,
+                    height = excluded.height,
+                    codec = excluded.codec,
+                    fps = excluded.fps,
+                    thumbnail_path = excluded.thumbnail_path,
+                    task_id = COALESCE(excluded.task_id, task_id),
+                    task_status = COALESCE(excluded.task_status, task_status),
+                    task_progress = COALESCE(excluded.task_progress, task_progress),
+                    content_hash = COALESCE(excluded.content_hash, content_hash)
+            ''', (
+                metadata.get("video_path"),
+                metadata.get("audio_path"),
+                metadata.get("duration"),
+                metadata.get("width"),
+                metadata.get("height"),
+                metadata.get("codec"),
+                metadata.get("fps"),
+                metadata.get("thumbnail_path"),
+                task_id,
+                task_status,
+                task_progress,
+                metadata.get("content_hash")
+            ))
+            row = conn.execute("SELECT video_id FROM video_metadata WHERE video_path = ?", (metadata.get("video_path"),)).fetchone()
+        self.invalidate(metadata.get("video_path"))
+        return row[0]
+
+    def update_task_status(self, video_path: str, task_id: Optional[str], task_status: Optional[str], task_progress: Optional[int]):
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                UPDATE video_metadata 
+                SET task_id = ?, task_status = ?, task_progress = ?
+                WHERE video_path = ?
+            ''', (task_id, task_status, task_progress, video_path))
+        self.invalidate(video_path)
+
+    def delete(self, video_path: str) -> Optional[tuple]:
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                'SELECT video_id, video_path, audio_path, thumbnail_path FROM video_metadata WHERE video_path = ?',
+                (video_path,)
+            ).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM video_metadata WHERE video_path = ?', (video_path,))
+        self.invalidate(video_path)
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
 def video_exists(video_path: str, db_path: str = "./data/video_metadata.db") -> bool:
     """
     Check if a video exists in the SQLite database.
@@ -15,14 +211,7 @@ def video_exists(video_path: str, db_path: str = "./data/video_metadata.db") ->
     Returns:
         bool: True if the video exists, False otherwise.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT 1 FROM video_metadata WHERE video_path = ?', (video_path,))
-    exists = cursor.fetchone() is not None
-
-    conn.close()
-    return exists
+    return VideoMetadataRepository.get(db_path).get_by_path(video_path) is not None
 
 def _save_video_thumbnail(video_path: str, thumbnail_dir: str = "./data/thumbnails") -> str:
     """
@@ -68,30 +257,35 @@ def _extract_video_metadata(video_path: str, audio_path: str) -> Dict[str, Any]:
     return metadata
 
 def create_video_metadata_table(db_path: str = "./data/video_metadata.db"):
-    """Create the video metadata table if it doesn't exist."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS video_metadata (
-            video_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_path TEXT UNIQUE,
-            audio_path TEXT,
-            duration REAL,
-            width INTEGER,
-            height INTEGER,
-            codec TEXT,
-            fps REAL,
-            thumbnail_path TEXT,
-            task_id TEXT,
-            task_status TEXT,
-            task_progress INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    """Create the video metadata table and its indexes if they don't exist."""
+    with SQLitePool.get(db_path).transaction() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS video_metadata (
+                video_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_path TEXT UNIQUE,
+                audio_path TEXT,
+                duration REAL,
+                width INTEGER,
+                height INTEGER,
+                codec TEXT,
+                fps REAL,
+                thumbnail_path TEXT,
+                task_id TEXT,
+                task_status TEXT,
+                task_progress INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT
+            )
+        ''')
+        # Content hashes are recorded on upload, older databases get the column empty
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(video_metadata)").fetchall()]
+        if "content_hash" not in columns:
+            conn.execute("ALTER TABLE video_metadata ADD COLUMN content_hash TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_video_metadata_content_hash ON video_metadata (content_hash)")
+        # Listing filtered by status walks this index in video_id order
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_video_metadata_status ON video_metadata (task_status, video_id)")
+
+    VideoMetadataRepository.get(db_path).invalidate()
 
 def store_video_metadata(
     video_path: str, 
@@ -104,6 +298,8 @@ def store_video_metadata(
     """
     Store video metadata in the SQLite database.
 
+    Task fields left as None keep their stored values when the video already exists.
+
     Args:
         video_path (str): Path to the video file.
         audio_path (str): Path to the audio file.
@@ -112,36 +308,36 @@ def store_video_metadata(
         task_progress (int, optional): Progress percentage of the task.
         db_path (str): Path to the SQLite database file.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     metadata = _extract_video_metadata(video_path, audio_path)
+    return VideoMetadataRepository.get(db_path).upsert(metadata, task_id, task_status, task_progress)
+
+def store_pending_video_metadata(
+    video_path: str,
+    task_id: Optional[str] = None,
+    task_status: Optional[str] = None,
+    task_progress: Optional[int] = None,
+    duration: Optional[float] = None,
+    content_hash: Optional[str] = None,
+    db_path: str = "./data/video_metadata.db"
+) -> int:
+    """
+    Register a video before its metadata is extracted, such as a running download
+    or an upload waiting for ingest.
 
-    cursor.execute('''
-        INSERT OR REPLACE INTO video_metadata (
-            video_path, audio_path, duration, width, height, codec, fps, 
-            thumbnail_path, task_id, task_status, task_progress
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        metadata.get("video_path"),
-        metadata.get("audio_path"),
-        metadata.get("duration"),
-        metadata.get("width"),
-        metadata.get("height"),
-        metadata.get("codec"),
-        metadata.get("fps"),
-        metadata.get("thumbnail_path"),
-        task_id,
-        task_status,
-        task_progress
-    ))
-
-    video_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    if video_id is None:
-        raise ValueError("Failed to insert video metadata - no row ID returned")
-    return video_id
+    Only the known fields are stored. The rest are filled in by store_video_metadata
+    once the ingest worker picks up the video.
+
+    Args:
+        video_path (str): Path the video file will be saved to.
+        task_id (str, optional): ID of the processing task.
+        task_status (str, optional): Current status of the task.
+        task_progress (int, optional): Progress percentage of the task.
+        duration (float, optional): Duration in seconds, if known in advance.
+        content_hash (str, optional): SHA-256 of the file contents, used to detect duplicate uploads.
+        db_path (str): Path to the SQLite database file.
+    """
+    metadata = {"video_path": video_path, "audio_path": "", "duration": duration, "content_hash": content_hash}
+    return VideoMetadataRepository.get(db_path).upsert(metadata, task_id, task_status, task_progress)
 
 def update_task_status(
     video_path: str,
@@ -160,17 +356,20 @@ def update_task_status(
         task_progress (int, optional): Progress percentage of the task.
         db_path (str): Path to the SQLite database file.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    VideoMetadataRepository.get(db_path).update_task_status(video_path, task_id, task_status, task_progress)
 
-    cursor.execute('''
-        UPDATE video_metadata 
-        SET task_id = ?, task_status = ?, task_progress = ?
-        WHERE video_path = ?
-    ''', (task_id, task_status, task_progress, video_path))
+def find_video_by_content_hash(content_hash: str, db_path: str = "./data/video_metadata.db") -> Optional[Dict[str, Any]]:
+    """
+    Find a stored video with the given file contents.
+
+    Args:
+        content_hash (str): SHA-256 of the file contents.
+        db_path (str): Path to the SQLite database file.
 
-    conn.commit()
-    conn.close()
+    Returns:
+        Optional[Dict[str, Any]]: Metadata of the oldest matching video, None if there is none.
+    """
+    return VideoMetadataRepository.get(db_path).get_by_content_hash(content_hash)
 
 def get_video_metadata(video_path: str, db_path: str = "./data/video_metadata.db") -> Optional[Dict[str, Any]]:
     """
@@ -183,50 +382,30 @@ def get_video_metadata(video_path: str, db_path: str = "./data/video_metadata.db
     Returns:
         Optional[Dict[str, Any]]: Video metadata if found, None otherwise.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    return VideoMetadataRepository.get(db_path).get_by_path(video_path)
 
-    cursor.execute('''
-        SELECT * FROM video_metadata WHERE video_path = ?
-    ''', (video_path,))
-
-    row = cursor.fetchone()
-    conn.close()
+def list_video_metadata(
+    status: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = 100,
+    db_path: str = "./data/video_metadata.db"
+) -> List[Dict[str, Any]]:
+    """
+    List video metadata, most recently added first.
 
-    if row is None:
-        return None
+    Args:
+        status (str, optional): Only list videos with this task status.
+        before_id (int, optional): Only list videos older than this video ID.
+        limit (int): Maximum number of videos to return.
+        db_path (str): Path to the SQLite database file.
 
-    return {
-        "id": row[0],
-        "video_path": row[1],
-        "audio_path": row[2],
-        "duration": row[3],
-        "width": row[4],
-        "height": row[5],
-        "codec": row[6],
-        "fps": row[7],
-        "thumbnail_path": row[8],
-        "task_id": row[9],
-        "task_status": row[10],
-        "task_progress": row[11],
-        "created_at": row[12]
-    }
+    Returns:
+        List[Dict[str, Any]]: Metadata of the listed videos.
+    """
+    return VideoMetadataRepository.get(db_path).list(status, before_id, limit)
 
 def delete_video_metadata(video_path: str, db_path: str = "./data/video_metadata.db"):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT video_id, video_path, audio_path, thumbnail_path FROM video_metadata WHERE video_path = ?', (video_path,))
-    row = cursor.fetchone()
+    row = VideoMetadataRepository.get(db_path).delete(video_path)
     if row is None:
         raise ValueError("Video not found in database")
-    
-    video_id, video_path, audio_path, thumbnail_path = row
-    
-    cursor.execute('DELETE FROM video_metadata WHERE video_path = ?', (video_path,))
-    conn.commit()
-    conn.close()
-
     return row 
-
-    
\ No newline at end of file
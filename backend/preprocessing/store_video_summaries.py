@@ -0,0 +1,67 @@
+import sqlite3
+from typing import Optional
+
+def create_video_summary_table(db_path: str = "./data/video_metadata.db"):
+    """Create the table of persisted per-video summaries if it doesn't exist."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_summaries (
+            video_filename TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.commit()
+    conn.close()
+
+def store_video_summary(video_filename: str, summary: str, db_path: str = "./data/video_metadata.db"):
+    """
+    Store the timeline summary of a video.
+
+    Args:
+        video_filename (str): Filename of the video (e.g., "trump_zelensky.mp4").
+        summary (str): The timestamp-based summary of the whole video.
+        db_path (str): Path to the SQLite database file.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute(
+        'INSERT OR REPLACE INTO video_summaries (video_filename, summary) VALUES (?, ?)',
+        (video_filename, summary)
+    )
+
+    conn.commit()
+    conn.close()
+
+def get_video_summary(video_filename: str, db_path: str = "./data/video_metadata.db") -> Optional[str]:
+    """
+    Get the stored timeline summary of a video.
+
+    Args:
+        video_filename (str): Filename of the video.
+        db_path (str): Path to the SQLite database file.
+
+    Returns:
+        Optional[str]: The summary if one was generated since the last ingest, None otherwise.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT summary FROM video_summaries WHERE video_filename = ?', (video_filename,))
+    row = cursor.fetchone()
+
+    conn.close()
+    return row[0] if row else None
+
+def delete_video_summary(video_filename: str, db_path: str = "./data/video_metadata.db"):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('DELETE FROM video_summaries WHERE video_filename = ?', (video_filename,))
+
+    conn.commit()
+    conn.close()
@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from inference import answer_cache
+from inference.answer_cache import AnswerCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "time", clock)
+    return clock
+
+def embedding(*values: float):
+    return AnswerCache.normalize_embedding(list(values))
+
+SCOPE = AnswerCache.make_scope("llama3", False, "system prompt")
+
+def test_similar_questions_in_the_same_scope_hit(clock):
+    cache = AnswerCache(enabled=True)
+    cache.put(SCOPE, embedding(1, 0, 0), "What is X?", "X is Y.", "because")
+
+    hit = cache.lookup(SCOPE, embedding(1, 0.05, 0))
+    assert hit["answer"] == "X is Y."
+    assert hit["thinking"] == "because"
+    assert hit["similarity"] >= cache.similarity_threshold
+
+def test_questions_below_the_threshold_miss(clock):
+    cache = AnswerCache(similarity_threshold=0.95, enabled=True)
+    cache.put(SCOPE, embedding(1, 0, 0), "What is X?", "X is Y.")
+
+    # Cosine similarity of about 0.89
+    assert cache.lookup(SCOPE, embedding(1, 0.5, 0)) is None
+    assert cache.stats()["misses"] == 1
+
+def test_scope_separates_models_prompts_and_files(clock):
+    cache = AnswerCache(enabled=True)
+    cache.put(SCOPE, embedding(1, 0), "q", "a")
+
+    for scope in (
+        AnswerCache.make_scope("other-model", False, "system prompt"),
+        AnswerCache.make_scope("llama3", True, "system prompt"),
+        AnswerCache.make_scope("llama3", False, "other prompt"),
+        AnswerCache.make_scope("llama3", False, "system prompt", ["file-hash"]),
+    ):
+        assert cache.lookup(scope, embedding(1, 0)) is None
+    assert AnswerCache.make_scope("m", False, "p", ["b", "a"]) == AnswerCache.make_scope("m", False, "p", ["a", "b"])
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = AnswerCache(ttl_sec=60, enabled=True)
+    cache.put(SCOPE, embedding(1, 0), "q", "a")
+
+    clock.now += 60
+    assert cache.lookup(SCOPE, embedding(1, 0)) is not None
+    clock.now += 1
+    assert cache.lookup(SCOPE, embedding(1, 0)) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["evictions"] == 1
+
+def test_oldest_entries_are_evicted_beyond_max_entries(clock):
+    cache = AnswerCache(max_entries=2, enabled=True)
+    for i, vector in enumerate(([1, 0, 0], [0, 1, 0], [0, 0, 1])):
+        cache.put(SCOPE, embedding(*vector), f"q{i}", f"a{i}")
+
+    assert cache.lookup(SCOPE, embedding(1, 0, 0)) is None
+    assert cache.lookup(SCOPE, embedding(0, 0, 1))["answer"] == "a2"
+    assert cache.stats()["entries"] == 2
+
+def test_fingerprint_depends_on_contents_only(tmp_path):
+    first, second, third = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+    first.write_bytes(b"same")
+    second.write_bytes(b"same")
+    third.write_bytes(b"different")
+
+    assert answer_cache.fingerprint_file(str(first)) == answer_cache.fingerprint_file(str(second))
+    assert answer_cache.fingerprint_file(str(first)) != answer_cache.fingerprint_file(str(third))
@@ -0,0 +1,44 @@
+import random
+
+from inference.interval_index import IntervalIndex
+
+def segment(start: float, end: float) -> dict:
+    return {"ts_start": start, "ts_end": end}
+
+def test_overlapping_returns_segments_by_start_time():
+    metadatas = [segment(20, 30), segment(0, 10), segment(10, 20), segment(30, 40)]
+    index = IntervalIndex(metadatas, ids=["c", "a", "b", "d"])
+
+    assert index.overlapping(12, 25) == [segment(10, 20), segment(20, 30)]
+    assert [index.ids[i] for i in index.overlapping_positions(12, 25)] == ["b", "c"]
+
+def test_bounds_are_inclusive():
+    index = IntervalIndex([segment(0, 10), segment(10, 20)])
+    assert index.overlapping(10, 10) == [segment(0, 10), segment(10, 20)]
+    assert index.overlapping(20.5, 30) == []
+
+def test_long_segments_starting_before_the_range_are_found():
+    index = IntervalIndex([segment(0, 100), segment(50, 55), segment(90, 95)])
+    assert index.overlapping(60, 70) == [segment(0, 100)]
+
+def test_empty_index():
+    index = IntervalIndex([])
+    assert len(index) == 0
+    assert index.overlapping(0, 100) == []
+
+def test_matches_a_linear_scan():
+    rng = random.Random(7)
+    metadatas = []
+    for _ in range(500):
+        start = rng.uniform(0, 1000)
+        metadatas.append(segment(start, start + rng.uniform(0, 15)))
+    index = IntervalIndex(metadatas)
+
+    for _ in range(100):
+        start = rng.uniform(-20, 1000)
+        end = start + rng.uniform(0, 60)
+        expected = sorted(
+            (metadata for metadata in metadatas if metadata["ts_start"] <= end and metadata["ts_end"] >= start),
+            key=lambda metadata: (metadata["ts_start"], metadata["ts_end"])
+        )
+        assert index.overlapping(start, end) == expected
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+from inference.executors import BlockingExecutor
+from inference.pipeline import StagePipeline
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_stages_receive_dependency_results_in_order():
+    async def scenario():
+        async with StagePipeline() as pipeline:
+            pipeline.add("a", lambda: asyncio.sleep(0.01, result=1))
+            pipeline.add("b", lambda: asyncio.sleep(0, result=2))
+            pipeline.add("sum", lambda a, b: asyncio.sleep(0, result=(a, b)), deps=("a", "b"))
+            return await pipeline.result("sum")
+
+    assert run(scenario()) == (1, 2)
+
+def test_independent_stages_run_concurrently():
+    async def scenario():
+        started = time.perf_counter()
+        async with StagePipeline() as pipeline:
+            for name in ("a", "b", "c"):
+                pipeline.add(name, lambda: asyncio.sleep(0.05))
+            await asyncio.gather(*(pipeline.result(name) for name in ("a", "b", "c")))
+        return time.perf_counter() - started
+
+    assert run(scenario()) < 0.12
+
+def test_duplicate_stage_names_are_rejected():
+    async def scenario():
+        async with StagePipeline() as pipeline:
+            pipeline.add("a", lambda: asyncio.sleep(0))
+            try:
+                pipeline.add("a", lambda: asyncio.sleep(0))
+            except ValueError:
+                return True
+        return False
+
+    assert run(scenario())
+
+def test_cancel_marks_the_stage_and_sets_its_event():
+    async def scenario():
+        async with StagePipeline() as pipeline:
+            task = pipeline.add("slow", lambda: asyncio.sleep(10))
+            await asyncio.sleep(0)
+            pipeline.cancel("slow")
+            await asyncio.gather(task, return_exceptions=True)
+            return task.cancelled(), pipeline.has("slow"), pipeline.cancel_event("slow").is_set()
+
+    assert run(scenario()) == (True, False, True)
+
+def test_leaving_the_pipeline_cancels_pending_stages():
+    async def scenario():
+        async with StagePipeline() as pipeline:
+            slow = pipeline.add("slow", lambda: asyncio.sleep(10))
+            done = pipeline.add("done", lambda: asyncio.sleep(0, result="ok"))
+            await done
+        return slow.cancelled(), pipeline.cancel_event("slow").is_set(), pipeline.cancel_event("done").is_set()
+
+    assert run(scenario()) == (True, True, False)
+
+def test_cancelled_stage_stops_its_blocking_work():
+    executor = BlockingExecutor("test", 1)
+    steps_done = []
+
+    def blocking_work(cancel_event: threading.Event):
+        for step in range(20):
+            if cancel_event.is_set():
+                return
+            time.sleep(0.01)
+            steps_done.append(step)
+
+    async def scenario():
+        async with StagePipeline() as pipeline:
+            pipeline.add("work", lambda: executor.run(blocking_work, pipeline.cancel_event("work")))
+            await asyncio.sleep(0.03)
+            pipeline.cancel("work")
+        # The worker is free again well before the work would have finished
+        await asyncio.wait_for(executor.run(lambda: None), 0.1)
+
+    run(scenario())
+    assert len(steps_done) < 10
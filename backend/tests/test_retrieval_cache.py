@@ -0,0 +1,52 @@
+from inference.retrieval_cache import RetrievalCache
+
+def test_questions_are_normalized_into_one_key():
+    cache = RetrievalCache()
+    config = {"mode": "query"}
+    assert cache.make_key("a.mp4", config, "What is  the RESULT?") == cache.make_key("a.mp4", config, "what is the result")
+    assert cache.make_key("a.mp4", config, "what is the result") != cache.make_key("a.mp4", config, "what is the cause")
+
+def test_question_independent_modes_ignore_the_question():
+    cache = RetrievalCache()
+    assert cache.make_key("a.mp4", {"mode": "summary"}, "one") == cache.make_key("a.mp4", {"mode": "summary"}, "two")
+    assert cache.make_key("a.mp4", {"mode": "time_range", "start": 0, "end": 60}, "one") \
+        != cache.make_key("a.mp4", {"mode": "time_range", "start": 60, "end": 120}, "one")
+
+def test_get_and_put_count_hits_and_misses():
+    cache = RetrievalCache()
+    key = cache.make_key("a.mp4", {"mode": "query"}, "question")
+
+    assert cache.get(key) is None
+    cache.put(key, {"context": "x"})
+    assert cache.get(key) == {"context": "x"}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_bumping_the_version_invalidates_a_video():
+    cache = RetrievalCache()
+    old_key = cache.make_key("a.mp4", {"mode": "query"}, "question")
+    other_key = cache.make_key("b.mp4", {"mode": "query"}, "question")
+    cache.put(old_key, "old")
+    cache.put(other_key, "other")
+
+    cache.bump_version("a.mp4")
+    assert cache.get(cache.make_key("a.mp4", {"mode": "query"}, "question")) is None
+    assert cache.get(other_key) == "other"
+
+    # A result computed before the bump is not stored
+    cache.put(old_key, "stale")
+    assert cache.get(old_key) == "old"
+    assert cache.stats()["entries"] == 2
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RetrievalCache(max_entries=2)
+    keys = [cache.make_key("a.mp4", {"mode": "query"}, f"question {i}") for i in range(3)]
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    cache.get(keys[0])
+    cache.put(keys[2], 2)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+
+status_updates = pytest.importorskip("app.utils.status_updates")
+
+class SlowWebSocket:
+    """Records frames and whether two sends ever overlapped."""
+
+    def __init__(self):
+        self.frames = []
+        self.sending = False
+        self.overlapped = False
+
+    async def _send(self, frame):
+        if self.sending:
+            self.overlapped = True
+        self.sending = True
+        await asyncio.sleep(0.001)
+        self.frames.append(frame)
+        self.sending = False
+
+    async def send_text(self, text: str):
+        await self._send(json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        await self._send(data)
+
+def test_concurrent_stages_never_interleave_frames():
+    websocket = SlowWebSocket()
+
+    async def scenario():
+        send_lock = asyncio.Lock()
+        send_client = status_updates.getWebSocketMessageSender(websocket, send_lock)
+        send_bytes = status_updates.getWebSocketBytesSender(websocket, send_lock)
+        await asyncio.gather(
+            *(send_client(status="retrieving_context", video_index=i) for i in range(10)),
+            *(send_bytes(b"m" + str(i).encode()) for i in range(10)),
+        )
+
+    asyncio.run(scenario())
+    assert not websocket.overlapped
+    assert len(websocket.frames) == 20
+
+def test_message_sender_serializes_without_a_shared_lock():
+    websocket = SlowWebSocket()
+
+    async def scenario():
+        send_client = status_updates.getWebSocketMessageSender(websocket)
+        await asyncio.gather(*(send_client(status="summarizing_context", video_index=i) for i in range(10)))
+
+    asyncio.run(scenario())
+    assert not websocket.overlapped
+    assert sorted(frame["video_index"] for frame in websocket.frames) == list(range(10))
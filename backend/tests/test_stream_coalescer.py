@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from app.utils.stream_coalescer import StreamCoalescer
+
+class RecordingClient:
+    """Records frames, yielding to the event loop on every send like a real websocket."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.frames = []
+
+    async def send_client(self, **frame):
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def send_bytes(self, data: bytes):
+        await asyncio.sleep(self.delay)
+        self.frames.append(data)
+
+def chunk(channel: str, content: str, done: bool = False):
+    return {"chat_id": 1, "type": channel, "content": content, "done": done}
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_first_chunk_is_sent_immediately_and_rest_is_coalesced():
+    async def scenario():
+        client = RecordingClient()
+        async with StreamCoalescer(client.send_client, flush_interval_ms=10_000) as stream:
+            await stream.send(chunk("markdown", "Hel"))
+            assert len(client.frames) == 1
+            for piece in ("lo", ", ", "world"):
+                await stream.send(chunk("markdown", piece))
+            await stream.send(chunk("markdown", "", done=True))
+        return client.frames, stream
+
+    frames, stream = run(scenario())
+    assert [frame["content"] for frame in frames] == ["Hel", "lo, world", ""]
+    assert frames[-1]["done"] is True
+    assert stream.chunks_received == 5
+
+def test_channels_keep_their_order():
+    async def scenario():
+        client = RecordingClient()
+        async with StreamCoalescer(client.send_client, flush_interval_ms=10_000) as stream:
+            for channel, content in [("thinking", "a"), ("thinking", "b"), ("markdown", "c"), ("thinking", "d"), ("markdown", "e")]:
+                await stream.send(chunk(channel, content))
+            await stream.send(chunk("markdown", "", done=True))
+        return client.frames
+
+    frames = run(scenario())
+    assert [(frame["type"], frame["content"]) for frame in frames] == [
+        ("thinking", "a"), ("thinking", "b"), ("markdown", "c"), ("thinking", "d"), ("markdown", "e"), ("markdown", ""),
+    ]
+
+def test_done_frame_is_last_while_periodic_flush_is_sending():
+    async def scenario():
+        # Sends are slower than the flush interval, so periodic flushes overlap with send()
+        client = RecordingClient(delay=0.005)
+        async with StreamCoalescer(client.send_client, flush_interval_ms=1, flush_bytes=8) as stream:
+            for i in range(60):
+                channel = "thinking" if i % 7 < 3 else "markdown"
+                await stream.send(chunk(channel, f"{i},"))
+                await asyncio.sleep(0.001)
+            await stream.send(chunk("markdown", "end", done=True))
+        return client.frames
+
+    frames = run(scenario())
+    assert frames[-1]["done"] is True
+    assert all(not frame["done"] for frame in frames[:-1])
+
+    thinking = "".join(frame["content"] for frame in frames if frame["type"] == "thinking")
+    markdown = "".join(frame["content"] for frame in frames if frame["type"] == "markdown")
+    assert thinking == "".join(f"{i}," for i in range(60) if i % 7 < 3)
+    assert markdown == "".join(f"{i}," for i in range(60) if i % 7 >= 3) + "end"
+
+def test_done_waits_for_a_flush_in_progress():
+    async def scenario():
+        client = RecordingClient(delay=0.02)
+        async with StreamCoalescer(client.send_client, flush_interval_ms=5) as stream:
+            await stream.send(chunk("markdown", "first"))
+            await stream.send(chunk("thinking", "a"))
+            await stream.send(chunk("markdown", "b"))
+            # The periodic task takes "a" and "b" and is still sending "a"
+            await asyncio.sleep(0.01)
+            await stream.send(chunk("markdown", "c", done=True))
+        return client.frames
+
+    frames = run(scenario())
+    assert [(frame["content"], frame["done"]) for frame in frames] == [
+        ("first", False), ("a", False), ("b", False), ("c", False), ("", True),
+    ]
+
+def test_exit_delivers_content_taken_by_a_flush_in_progress():
+    async def scenario():
+        client = RecordingClient(delay=0.02)
+        async with StreamCoalescer(client.send_client, flush_interval_ms=1) as stream:
+            await stream.send(chunk("markdown", "first"))
+            await stream.send(chunk("thinking", "a"))
+            await stream.send(chunk("markdown", "b"))
+            # Let the periodic task take the buffer and start sending it
+            await asyncio.sleep(0.03)
+        return client.frames
+
+    frames = run(scenario())
+    assert [frame["content"] for frame in frames] == ["first", "a", "b"]
+
+def test_control_frames_follow_buffered_content():
+    async def scenario():
+        client = RecordingClient()
+        async with StreamCoalescer(client.send_client, flush_interval_ms=10_000) as stream:
+            await stream.send(chunk("markdown", "one"))
+            await stream.send(chunk("markdown", "two"))
+            await stream.send({"chat_id": 1, "type": "status", "status": "thinking", "done": False})
+        return client.frames
+
+    frames = run(scenario())
+    assert [frame["type"] for frame in frames] == ["markdown", "markdown", "status"]
+    assert frames[1]["content"] == "two"
+
+def test_done_fields_are_added_to_the_done_frame():
+    async def scenario():
+        client = RecordingClient()
+        async with StreamCoalescer(client.send_client, done_fields=lambda: {"trace": {"total_ms": 1.0}}) as stream:
+            await stream.send(chunk("markdown", "answer", done=True))
+        return client.frames
+
+    frames = run(scenario())
+    assert frames[-1] == {"chat_id": 1, "type": "markdown", "content": "", "done": True, "trace": {"total_ms": 1.0}}
+
+def test_binary_protocol_prefixes_the_channel():
+    async def scenario():
+        client = RecordingClient()
+        async with StreamCoalescer(client.send_client, client.send_bytes, protocol="binary") as stream:
+            await stream.send(chunk("thinking", "hmm"))
+            await stream.send(chunk("markdown", "ok", done=True))
+        return client.frames
+
+    frames = run(scenario())
+    assert frames[:2] == [b"thmm", b"mok"]
+    assert frames[2]["done"] is True
+
+def test_binary_protocol_requires_send_bytes():
+    with pytest.raises(ValueError):
+        StreamCoalescer(lambda **kwargs: None, protocol="binary")
@@ -0,0 +1,35 @@
+import pytest
+
+from inference.time_anchors import POINT_WINDOW_SEC, parse_time_range
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is said from 10:00 to 12:30?", (600.0, 750.0)),
+    ("Summarize 1:02:00 - 1:05:00", (3720.0, 3900.0)),
+    ("What happens in minutes 10-20?", (600.0, 1200.0)),
+    ("Explain minute 3 to 5", (180.0, 300.0)),
+    ("What is shown between 30 and 90 seconds?", (30.0, 90.0)),
+    ("Describe 10-20 min", (600.0, 1200.0)),
+    ("Describe 10-20m", (600.0, 1200.0)),
+    ("What is in 30 to 45s?", (30.0, 45.0)),
+    ("Summarize the first 5 minutes", (0.0, 300.0)),
+    ("Summarize the first 2h", (0.0, 7200.0)),
+    ("What happens at 12:30?", (750.0 - POINT_WINDOW_SEC, 750.0 + POINT_WINDOW_SEC)),
+    ("What happens at 90 seconds?", (90.0 - POINT_WINDOW_SEC, 90.0 + POINT_WINDOW_SEC)),
+    ("What is on screen around minute 12?", (720.0 - POINT_WINDOW_SEC, 720.0 + POINT_WINDOW_SEC)),
+    ("What is said at 10s?", (0.0, 10.0 + POINT_WINDOW_SEC)),
+])
+def test_time_anchored_questions(question, expected):
+    assert parse_time_range(question) == expected
+
+@pytest.mark.parametrize("question", [
+    "Compare versions 2 and 3",
+    "What happens in steps 3 to 5?",
+    "Explain chapters 1-4",
+    "Go from 3 to 5 in the proof",
+    "What do items 2 until 6 have in common?",
+    "Which of the 3 steps is hardest?",
+    "Compare the 2 to 3 sets of results",
+    "What is the video about?",
+])
+def test_ordinary_questions_are_not_time_anchored(question):
+    assert parse_time_range(question) is None
@@ -0,0 +1,74 @@
+from inference.token_budget import (
+    MESSAGE_OVERHEAD_TOKENS,
+    estimate_message_tokens,
+    estimate_tokens,
+    fit_messages,
+    trim_history,
+    truncate_to_tokens,
+)
+
+def message(role: str, words: int, word: str = "word") -> dict:
+    return {"role": role, "content": " ".join([word] * words)}
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello, world") == 3
+    # Long words count for more than one token
+    assert estimate_tokens("a" * 40) >= 10
+
+def test_truncate_to_tokens_keeps_the_beginning_within_budget():
+    text = " ".join(f"w{i}" for i in range(200))
+    truncated = truncate_to_tokens(text, 50)
+    assert text.startswith(truncated)
+    assert 45 <= estimate_tokens(truncated) <= 50
+    assert truncate_to_tokens(text, 0) == ""
+    assert truncate_to_tokens("short", 50) == "short"
+
+def test_trim_history_keeps_the_most_recent_messages_that_fit():
+    messages = [message("user", 10, f"m{i}") for i in range(6)]
+    per_message = estimate_message_tokens([messages[0]])
+
+    trimmed = trim_history(messages, per_message * 3 + 1)
+    assert trimmed == messages[-3:]
+    assert trim_history(messages, per_message * 100) == messages
+    assert trim_history([], 100) == []
+
+def test_trim_history_truncates_an_oversized_newest_message():
+    messages = [message("user", 5), message("assistant", 500)]
+    trimmed = trim_history(messages, 100)
+
+    assert len(trimmed) == 1
+    assert trimmed[0]["role"] == "assistant"
+    assert messages[1]["content"].startswith(trimmed[0]["content"])
+    assert 0 < estimate_message_tokens(trimmed) <= 100
+    # The caller's message is left untouched
+    assert estimate_tokens(messages[1]["content"]) > 100
+
+def test_trim_history_with_no_room_keeps_nothing():
+    assert trim_history([message("user", 50)], MESSAGE_OVERHEAD_TOKENS) == []
+    assert trim_history([message("user", 50)], 0) == []
+
+def test_fit_messages_leaves_fitting_prompts_alone():
+    messages = [message("system", 10), message("user", 10)]
+    fitted = fit_messages(messages, num_ctx=1000, reserve=100)
+    assert fitted == messages
+    assert fitted is not messages
+
+def test_fit_messages_drops_oldest_history_first():
+    system, question = message("system", 20), message("user", 20)
+    history = [message("user", 100, f"h{i}") for i in range(5)]
+    num_ctx, reserve = 400, 100
+
+    fitted = fit_messages([system, *history, question], num_ctx, reserve)
+    assert fitted[0] == system and fitted[-1] == question
+    assert fitted[1:-1] == history[-len(fitted) + 2:]
+    assert estimate_message_tokens(fitted) <= num_ctx - reserve
+
+def test_fit_messages_truncates_the_longest_message_when_history_is_gone():
+    system, question = message("system", 20), message("user", 1000)
+    num_ctx, reserve = 500, 100
+
+    fitted = fit_messages([system, question], num_ctx, reserve)
+    assert fitted[0] == system
+    assert question["content"].startswith(fitted[1]["content"])
+    assert estimate_message_tokens(fitted) <= num_ctx - reserve
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from inference.executors import BlockingExecutor
+from utils.tracing import (
+    MAX_SPANS_PER_TRACE,
+    STAGE_SECONDS,
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    current_trace,
+    span,
+    start_trace,
+)
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", (0.1, 1.0), label_names=("stage",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="plan")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{stage="plan",le="0.1"} 2',
+        'latency_seconds_bucket{stage="plan",le="1.0"} 3',
+        'latency_seconds_bucket{stage="plan",le="+Inf"} 4',
+        'latency_seconds_sum{stage="plan"} 3.65',
+        'latency_seconds_count{stage="plan"} 4',
+    ]
+
+def test_counter_escapes_label_values():
+    counter = Counter("requests_total", "Requests.", label_names=("model",))
+    counter.inc(model='a"b')
+    counter.inc(2, model='a"b')
+    assert counter.render()[-1] == 'requests_total{model="a\\"b"} 3.0'
+
+def test_registry_renders_all_metrics():
+    registry = MetricsRegistry()
+    registry.counter("a_total", "A.").inc()
+    registry.histogram("b_seconds", "B.", buckets=(1.0,)).observe(0.5)
+
+    text = registry.render()
+    assert text.endswith("\n")
+    assert "a_total 1.0" in text
+    assert 'b_seconds_bucket{le="1.0"} 1' in text
+
+def stage_count(stage: str) -> int:
+    series = STAGE_SECONDS.series.get((stage,))
+    return series["count"] if series else 0
+
+def test_spans_are_recorded_into_the_current_trace():
+    with start_trace() as trace:
+        with span("test_outer:video.mp4"):
+            with span("test_inner"):
+                pass
+        assert current_trace() is trace
+    assert current_trace() is None
+
+    result = trace.to_dict()
+    assert {span_data["name"] for span_data in result["spans"]} == {"test_outer:video.mp4", "test_inner"}
+    assert result["total_ms"] >= max(span_data["duration_ms"] for span_data in result["spans"])
+    assert stage_count("test_outer") == 1
+
+def test_failed_spans_are_marked_and_cancelled_spans_are_dropped():
+    async def cancelled_block():
+        with span("test_cancelled"):
+            await asyncio.sleep(10)
+
+    async def scenario():
+        with start_trace() as trace:
+            with pytest.raises(RuntimeError):
+                with span("test_failed"):
+                    raise RuntimeError("boom")
+
+            task = asyncio.create_task(cancelled_block())
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return trace.to_dict()["spans"]
+
+    spans = asyncio.run(scenario())
+    assert [(span_data["name"], span_data.get("error")) for span_data in spans] == [("test_failed", True)]
+    assert stage_count("test_cancelled") == 0
+
+def test_executor_work_joins_the_callers_trace():
+    executor = BlockingExecutor("test", 1)
+
+    def blocking_step():
+        with span("test_blocking"):
+            return current_trace()
+
+    async def scenario():
+        with start_trace() as trace:
+            return trace, await executor.run(blocking_step)
+
+    trace, seen_trace = asyncio.run(scenario())
+    assert seen_trace is trace
+    assert [span_data["name"] for span_data in trace.to_dict()["spans"]] == ["test_blocking"]
+
+def test_traces_keep_a_bounded_number_of_spans():
+    with start_trace() as trace:
+        for _ in range(MAX_SPANS_PER_TRACE + 10):
+            with span("test_bounded"):
+                pass
+    assert len(trace.spans) == MAX_SPANS_PER_TRACE
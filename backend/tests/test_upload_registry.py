@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from inference.upload_registry import AttachmentNotReadyError, UploadRegistry
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_files_on_disk_are_ready_without_an_upload(tmp_path):
+    (tmp_path / "old.png").write_bytes(b"x")
+
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        return registry.is_ready("old.png"), registry.is_ready("missing.png"), await registry.wait_ready(["old.png"])
+
+    ready, missing, paths = run(scenario())
+    assert ready and not missing
+    assert paths == [str(tmp_path / "old.png")]
+
+def test_waiting_question_resumes_when_the_upload_completes(tmp_path):
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        registry.begin("a.png")
+        waiter = asyncio.create_task(registry.wait_ready(["a.png"]))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        registry.complete("a.png", "hash-a")
+        return await asyncio.wait_for(waiter, 1), registry.content_hash("a.png")
+
+    paths, content_hash = run(scenario())
+    assert paths == [str(tmp_path / "a.png")]
+    assert content_hash == "hash-a"
+
+def test_questions_may_arrive_before_the_upload_starts(tmp_path):
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        waiter = asyncio.create_task(registry.wait_ready(["a.png"]))
+        await asyncio.sleep(0)
+        registry.begin("a.png")
+        registry.complete("a.png", "hash-a")
+        return await asyncio.wait_for(waiter, 1)
+
+    assert run(scenario()) == [str(tmp_path / "a.png")]
+
+def test_failed_upload_raises(tmp_path):
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        registry.begin("a.png")
+        waiter = asyncio.create_task(registry.wait_ready(["a.png"]))
+        await asyncio.sleep(0)
+        registry.fail("a.png", "disk full")
+        await waiter
+
+    with pytest.raises(AttachmentNotReadyError, match="disk full"):
+        run(scenario())
+
+def test_wait_times_out_naming_the_missing_files(tmp_path):
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path), ready_timeout_sec=0.01)
+        registry.begin("a.png")
+        registry.begin("b.png")
+        registry.complete("a.png", "hash-a")
+        await registry.wait_ready(["a.png", "b.png"])
+
+    with pytest.raises(AttachmentNotReadyError, match="b.png") as error:
+        run(scenario())
+    assert "a.png" not in str(error.value)
+
+def test_reupload_waits_for_the_new_contents(tmp_path):
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        registry.begin("a.png")
+        registry.complete("a.png", "first")
+        registry.begin("a.png")
+        waiter = asyncio.create_task(registry.wait_ready(["a.png"]))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        registry.complete("a.png", "second")
+        await waiter
+        return registry.content_hash("a.png")
+
+    assert run(scenario()) == "second"
+
+def test_preprocessor_runs_on_completed_uploads_of_its_extension(tmp_path):
+    calls = []
+
+    async def preprocess(file_path: str, content_hash: str):
+        calls.append((file_path, content_hash))
+        return content_hash.upper()
+
+    async def scenario():
+        registry = UploadRegistry(str(tmp_path))
+        registry.register_preprocessor(".pdf", preprocess)
+        for filename in ("doc.PDF", "image.png"):
+            registry.begin(filename)
+            registry.complete(filename, f"hash-{filename}")
+        return await registry.preprocessed("doc.PDF"), await registry.preprocessed("image.png"), registry.stats()
+
+    pdf_result, image_result, stats = run(scenario())
+    assert pdf_result == "HASH-DOC.PDF"
+    assert image_result is None
+    assert calls == [(str(tmp_path / "doc.PDF"), "hash-doc.PDF")]
+    assert stats == {"ready": 2}
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+# VideoRAG pulls in the model stack (torch, chromadb, ...), which test environments may lack
+videorag = pytest.importorskip("inference.videorag")
+
+from inference.retrieval_cache import RetrievalCache
+
+class FakeContextExtractor:
+    def __init__(self):
+        self.retrieval_cache = RetrievalCache()
+
+    def get_video_context(self, config, question, video_name):
+        return {
+            "metadata_context": f"Video: {video_name}",
+            "asr_metadatas": [{"ts_start": 0.0, "ts_end": 5.0, "text": "hello"}],
+            "frame_metadatas": [],
+        }
+
+class FakeOllamaClient:
+    planner_llm = "planner"
+
+    def __init__(self, delay: float = 0.01, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def get_num_ctx(self, model):
+        return 8192
+
+    async def get_video_summary(self, context, question, options=None):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("model unavailable")
+            return "timeline summary"
+        finally:
+            self.running -= 1
+
+@pytest.fixture
+def stored_summaries(monkeypatch):
+    summaries = {}
+    monkeypatch.setattr(videorag, "get_stored_video_summary", lambda video_name: summaries.get(video_name))
+    monkeypatch.setattr(videorag, "store_video_summary", lambda video_name, summary: summaries.__setitem__(video_name, summary))
+    return summaries
+
+def make_rag(ollama_client: FakeOllamaClient, max_concurrent_summaries: int = videorag.MAX_CONCURRENT_SUMMARIES):
+    # Bypass the singleton and its model loading, only summary state is needed
+    rag = object.__new__(videorag.VideoRAG)
+    rag.context_extractor = FakeContextExtractor()
+    rag.ollama_client = ollama_client
+    rag.summary_semaphore = asyncio.Semaphore(max_concurrent_summaries)
+    rag.video_summary_tasks = {}
+    rag.background_tasks = set()
+    return rag
+
+def run_capturing_loop_errors(coro):
+    """Run a coroutine and collect errors reported to the loop, e.g. unretrieved task exceptions."""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        return await coro
+
+    return asyncio.run(main()), errors
+
+async def drain_background_tasks(rag):
+    while rag.background_tasks:
+        await asyncio.gather(*rag.background_tasks)
+
+def test_scheduled_summary_after_ingest_is_stored(stored_summaries, capsys):
+    rag = make_rag(FakeOllamaClient())
+
+    async def scenario():
+        rag.schedule_video_summary("lecture.mp4")
+        await drain_background_tasks(rag)
+
+    _, errors = run_capturing_loop_errors(scenario())
+    assert stored_summaries == {"lecture.mp4": "timeline summary"}
+    assert rag.video_summary_tasks == {}
+    assert "Stored summary of video lecture.mp4" in capsys.readouterr().out
+    assert errors == []
+
+def test_failed_scheduled_summary_is_logged_and_retrieved(stored_summaries, capsys):
+    rag = make_rag(FakeOllamaClient(fail=True))
+
+    async def scenario():
+        rag.schedule_video_summary("lecture.mp4")
+        await drain_background_tasks(rag)
+
+    _, errors = run_capturing_loop_errors(scenario())
+    assert stored_summaries == {}
+    assert "Failed to summarize video lecture.mp4: model unavailable" in capsys.readouterr().out
+    assert errors == []
+
+def test_stored_summaries_are_not_regenerated(stored_summaries):
+    ollama_client = FakeOllamaClient()
+    rag = make_rag(ollama_client)
+    stored_summaries["lecture.mp4"] = "stored"
+
+    assert asyncio.run(rag.get_video_summary("lecture.mp4")) == "stored"
+    assert ollama_client.calls == 0
+
+def test_concurrent_requests_share_one_generation(stored_summaries):
+    ollama_client = FakeOllamaClient(delay=0.05)
+    rag = make_rag(ollama_client)
+    statuses = []
+
+    async def send_client(**kwargs):
+        statuses.append(kwargs["status"])
+
+    async def scenario():
+        rag.schedule_video_summary("lecture.mp4")
+        await asyncio.sleep(0.01)
+        summary = await rag.get_video_summary("lecture.mp4", 1, send_client)
+        await drain_background_tasks(rag)
+        return summary
+
+    assert asyncio.run(scenario()) == "timeline summary"
+    assert ollama_client.calls == 1
+    assert statuses == ["summarizing_context"]
+
+def test_multi_video_summaries_fan_out_under_the_semaphore(stored_summaries):
+    ollama_client = FakeOllamaClient(delay=0.02)
+    rag = make_rag(ollama_client, max_concurrent_summaries=2)
+    video_names = [f"video{i}.mp4" for i in range(5)]
+
+    async def scenario():
+        return await asyncio.gather(*(rag.get_video_summary(video_name, i + 1) for i, video_name in enumerate(video_names)))
+
+    summaries = asyncio.run(scenario())
+    assert summaries == ["timeline summary"] * 5
+    assert ollama_client.calls == 5
+    assert ollama_client.max_running == 2
+    assert sorted(stored_summaries) == video_names
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+class SQLitePool:
+    """
+    Persistent per-thread connections to one SQLite database.
+
+    sqlite3 connections must not be shared between threads, so each executor
+    thread opens its own connection once, in WAL mode so readers never block
+    the writer. Reusing a connection also reuses sqlite3's cache of prepared
+    statements. Connections run in autocommit mode and writes use transaction().
+    """
+
+    _pools: Dict[str, "SQLitePool"] = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str) -> "SQLitePool":
+        """Get the shared pool of a database file."""
+        with cls._pools_lock:
+            if db_path not in cls._pools:
+                cls._pools[db_path] = cls(db_path)
+            return cls._pools[db_path]
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.connections: List[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """
+        Run statements in one transaction, committed on success and rolled back on error.
+
+        Args:
+            immediate (bool): Take the write lock up front, so read-then-write
+                sequences such as ID allocation cannot interleave.
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close_all(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+        self.local = threading.local()
@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import os
+from typing import BinaryIO, Tuple
+
+from fastapi import UploadFile
+
+# Bytes read from the request and written to disk per step
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Suffix of files that are still being written
+PARTIAL_SUFFIX = ".part"
+
+def _write_chunk(f: BinaryIO, digest, chunk: bytes):
+    f.write(chunk)
+    digest.update(chunk)
+
+async def save_upload(file: UploadFile, file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+    """
+    Stream an upload to disk in fixed-size chunks, hashing it on the way.
+
+    Writing and hashing run in the default executor, so the event loop never
+    blocks on disk IO and at most one chunk of the file is held in memory.
+    The file is written to a partial file that replaces file_path only once
+    complete, so readers never see a half-written file.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        file_path (str): Path to save the file to.
+        chunk_size (int): Bytes per chunk.
+
+    Returns:
+        Tuple[str, int]: SHA-256 of the contents and the size in bytes.
+    """
+    loop = asyncio.get_running_loop()
+    partial_path = file_path + PARTIAL_SUFFIX
+    digest = hashlib.sha256()
+    size = 0
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    f = await loop.run_in_executor(None, open, partial_path, "wb")
+    try:
+        while chunk := await file.read(chunk_size):
+            await loop.run_in_executor(None, _write_chunk, f, digest, chunk)
+            size += len(chunk)
+    except BaseException:
+        await loop.run_in_executor(None, f.close)
+        await loop.run_in_executor(None, os.remove, partial_path)
+        raise
+    await loop.run_in_executor(None, f.close)
+
+    await loop.run_in_executor(None, os.replace, partial_path, file_path)
+    return digest.hexdigest(), size
@@ -0,0 +1,226 @@
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Upper bounds of the token rate histogram buckets, in tokens per second
+RATE_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0, 640.0, 1280.0, 2560.0)
+# Spans kept per trace, so a long-running request cannot grow its trace without bound
+MAX_SPANS_PER_TRACE = 256
+
+def _format_labels(label_names: Sequence[str], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    """A Prometheus counter with optional labels."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(_escape_label(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+class Histogram:
+    """A Prometheus histogram with fixed buckets and optional labels."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self.series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(_escape_label(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self.series[key] = series
+            # Counts are stored per bucket and made cumulative when rendered
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), series["counts"]):
+                    cumulative += count
+                    bucket_label = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, bucket_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    """The metrics exported on /metrics."""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, description, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS, label_names: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, description, buckets, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "chronochat_stage_seconds",
+    "Duration of the stages of chat requests.",
+    label_names=("stage",)
+)
+REQUEST_SECONDS = metrics.histogram(
+    "chronochat_request_seconds",
+    "Duration of chat requests, from receiving the question to the last token.",
+    label_names=("kind", "outcome")
+)
+TIME_TO_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "chronochat_time_to_first_token_seconds",
+    "Time from receiving a question to the first streamed token.",
+    label_names=("model",)
+)
+GENERATION_TOKENS_PER_SECOND = metrics.histogram(
+    "chronochat_generation_tokens_per_second",
+    "Answer generation rate reported by Ollama.",
+    RATE_BUCKETS,
+    label_names=("model",)
+)
+PROMPT_TOKENS_PER_SECOND = metrics.histogram(
+    "chronochat_prompt_tokens_per_second",
+    "Prompt evaluation (prefill) rate reported by Ollama.",
+    RATE_BUCKETS,
+    label_names=("model",)
+)
+
+class Trace:
+    """
+    The spans of one chat request.
+
+    Spans are recorded from the event loop and from executor threads, so
+    appending is locked. Span starts are relative to the start of the trace.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, end: float, error: bool = False):
+        with self.lock:
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                return
+            span_data = {
+                "name": name,
+                "start_ms": round((start - self.started_at) * 1000, 1),
+                "duration_ms": round((end - start) * 1000, 1),
+            }
+            if error:
+                span_data["error"] = True
+            self.spans.append(span_data)
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "total_ms": round(self.elapsed() * 1000, 1),
+                **self.attributes,
+                "spans": sorted(self.spans, key=lambda span_data: span_data["start_ms"]),
+            }
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """
+    Trace the enclosed request.
+
+    The trace follows the context, so tasks created inside it and blocking
+    work run through a BlockingExecutor record their spans into it.
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str, stage: Optional[str] = None) -> Iterator[None]:
+    """
+    Time the enclosed block as a stage, in sync and async code alike.
+
+    The duration is added to the stage histogram and, inside a trace, recorded
+    as a span. Cancelled blocks are not recorded, since abandoned speculative
+    work would otherwise skew the histograms.
+
+    Args:
+        name (str): Name of the span, e.g. "retrieve:lecture.mp4".
+        stage (Optional[str]): Histogram label, defaults to the name up to the
+            first colon, so per-video spans share one series.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        raise
+    except BaseException:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, start, time.perf_counter(), error=True)
+        raise
+
+    end = time.perf_counter()
+    STAGE_SECONDS.observe(end - start, stage=stage or name.split(":")[0])
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, end)
@@ -5,7 +5,7 @@ import { useRouter } from "next/navigation";
 import ChatContent from "@/components/chat/ChatContent";
 import ChatBar from "@/components/chat/ChatBar";
 import { useChatWebSocket } from "@/hooks/useChatWebSocket";
-import { fetchChatMessages } from "@/services/chat";
+import { fetchChatMessagesPage } from "@/services/chat";
 interface ChatPageClientProps {
   chatId: number;
 }
@@ -20,6 +20,9 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
   const bottomAnchorRef = useRef<HTMLDivElement>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [isLoadingMessages, setIsLoadingMessages] = useState(true);
+  // Oldest loaded message, the cursor for loading earlier pages
+  const [oldestMessageId, setOldestMessageId] = useState<number | null>(null);
+  const [hasEarlierMessages, setHasEarlierMessages] = useState(false);
   const [outputStateParams, setOutputStateParams] = useState<Record<string, string>>({});
   const pendingMarkdownRef = useRef<string>("");
   const pendingThinkingRef = useRef<string>("");
@@ -42,9 +45,11 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
     const loadMessages = async () => {
       try {
         setIsLoadingMessages(true);
-        const chatMessages = await fetchChatMessages(chatId);
-        console.log("Chat messages:", chatMessages);
-        setMessages(formatReceivedMessages(chatMessages));
+        const page = await fetchChatMessagesPage(chatId);
+        console.log("Chat messages:", page.messages);
+        setMessages(formatReceivedMessages(page.messages));
+        setOldestMessageId(page.messages.length ? page.messages[0].id : null);
+        setHasEarlierMessages(page.has_more);
       } catch (error) {
         console.error("Failed to load messages:", error);
         // If chat doesn't exist, treat it as a new chat
@@ -56,6 +61,22 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
     loadMessages();
   }, [chatId]);
 
+  const loadEarlierMessages = async () => {
+    if (oldestMessageId === null) {
+      return;
+    }
+    try {
+      const page = await fetchChatMessagesPage(chatId, oldestMessageId);
+      setMessages((prev) => [...formatReceivedMessages(page.messages), ...prev]);
+      if (page.messages.length) {
+        setOldestMessageId(page.messages[0].id);
+      }
+      setHasEarlierMessages(page.has_more);
+    } catch (error) {
+      console.error("Failed to load earlier messages:", error);
+    }
+  };
+
   const formatReceivedMessages = (messages: any) => {
     return messages.map((message: any) => {
       if (message.role === "assistant") {
@@ -158,7 +179,14 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
   };
 
   // Only establish WebSocket connection for existing chats
-  const { sendMessage, canSend, error, isConnecting } = useChatWebSocket(
+  const {
+    sendMessage,
+    stopGeneration,
+    isGenerating,
+    canSend,
+    error,
+    isConnecting,
+  } = useChatWebSocket(
     handleWebSocketMessage,
     !isLoadingMessages
   );
@@ -166,6 +194,14 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
   return (
     <div className="flex flex-col h-full">
       <div className="flex-1 overflow-y-auto flex flex-col">
+        {hasEarlierMessages && (
+          <button
+            className="mx-auto mt-4 text-sm text-gray-500 hover:underline cursor-pointer"
+            onClick={loadEarlierMessages}
+          >
+            Load earlier messages
+          </button>
+        )}
         {messages.length > 0 ? (
           <ChatContent messages={messages} params={outputStateParams} />
         ) : (
@@ -183,7 +219,12 @@ export default function ChatPageClient({ chatId }: ChatPageClientProps) {
         )}
       </div>
       <div ref={bottomAnchorRef} />
-      <ChatBar onSend={onSend} canSend={canSend && !isConnecting} />
+      <ChatBar
+        onSend={onSend}
+        canSend={canSend && !isConnecting}
+        isGenerating={isGenerating}
+        onStop={stopGeneration}
+      />
     </div>
   );
 }
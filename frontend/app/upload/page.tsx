@@ -2,9 +2,10 @@
 
 import { UploadDialog } from "@/components/upload/UploadDialog";
 import { MediaCard } from "@/components/upload/MediaCard";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import {
   deleteVideo,
+  cancelYoutubeImport,
   listUploadedVideos,
   VideoDetails,
 } from "@/services/media";
@@ -34,6 +35,11 @@ export default function UploadPage() {
   const searchParams = useSearchParams();
   const [mediaData, setMediaData] = useState<MediaGroup[]>([]);
   const [searchTerm, setSearchTerm] = useState<string>("");
+  const mediaDataRef = useRef<MediaGroup[]>([]);
+
+  useEffect(() => {
+    mediaDataRef.current = mediaData;
+  }, [mediaData]);
 
   const fetchAllMedia = async () => {
     try {
@@ -88,16 +94,46 @@ export default function UploadPage() {
   }, []);
 
   useEffect(() => {
-    console.log("Setting up polling for task status updates");
+    // Progress is pushed by the backend, the list is only refetched when a
+    // video appears or finishes processing
+    const source = new EventSource("http://localhost:8001/media/progress/stream");
+
+    source.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      const isTerminal =
+        event.status === "Processed" ||
+        event.status === "Failed" ||
+        event.status === "Cancelled";
+
+      const known = mediaDataRef.current.some((group) =>
+        group.items.some((item) => item.title === event.video_name)
+      );
+      setMediaData((groups) =>
+        groups.map((group) => ({
+          ...group,
+          items: group.items.map((item) => {
+            if (item.title !== event.video_name) return item;
+            return {
+              ...item,
+              isProcessing: event.status !== "Processed",
+              progress: event.progress,
+              status: event.status,
+            };
+          }),
+        }))
+      );
+
+      if (!known || isTerminal) {
+        fetchAllMedia();
+      }
+    };
 
-    // Poll for status updates every 2 seconds
-    const interval = setInterval(async () => {
-      fetchAllMedia();
-    }, 1500); // Poll every 1.5 seconds
+    source.onerror = () => {
+      console.error("Ingest progress stream interrupted, reconnecting");
+    };
 
     return () => {
-      console.log("Cleaning up polling interval");
-      clearInterval(interval);
+      source.close();
     };
   }, []);
 
@@ -136,6 +172,12 @@ export default function UploadPage() {
     deleteVideo(itemToDelete.title);
   };
 
+  const handleCancel = (itemToCancel: MediaItem) => {
+    if (itemToCancel.taskId) {
+      cancelYoutubeImport(itemToCancel.taskId);
+    }
+  };
+
   return (
     <div className="flex flex-col items-center justify-center px-4 w-full mt-10">
       <h1 className="text-3xl font-bold tracking-tight">My media</h1>
@@ -175,7 +217,12 @@ export default function UploadPage() {
             <div className="grid grid-cols-1 md:grid-cols-2 gap-2">
               {/* show the media data in a card for each item in the same date */}
               {group.items.map((item, idx) => (
-                <MediaCard key={idx} item={item} onDelete={handleDelete} />
+                <MediaCard
+                  key={idx}
+                  item={item}
+                  onDelete={handleDelete}
+                  onCancel={handleCancel}
+                />
               ))}
             </div>
           </div>
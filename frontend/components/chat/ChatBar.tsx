@@ -11,6 +11,7 @@ import {
   Sparkles,
   MessageSquareQuote,
   Ban,
+  Square,
 } from "lucide-react";
 import {
   Tooltip,
@@ -25,6 +26,7 @@ import { ToggleGroup, ToggleGroupItem } from "@/components/ui/toggle-group";
 import { SelectedVideoPreviews } from "./SelectedVideoPreviews";
 import { DataStatePropInterceptor } from "./DataStatePropInterceptor";
 import { FileUploadComponent } from "./FileUploadComponent";
+import { preloadModel } from "@/services/chat";
 
 interface ChatBarProps {
   onSend: (
@@ -36,6 +38,8 @@ interface ChatBarProps {
     files: File[]
   ) => Promise<void>;
   canSend: boolean;
+  isGenerating?: boolean;
+  onStop?: () => void;
 }
 
 export function TooltipToggle({
@@ -154,7 +158,12 @@ export function VideoModeToggles({
   );
 }
 
-export default function ChatBar({ onSend, canSend }: ChatBarProps) {
+export default function ChatBar({
+  onSend,
+  canSend,
+  isGenerating = false,
+  onStop,
+}: ChatBarProps) {
   const [isThinkingEnabled, setIsThinkingEnabled] = useState(false);
   const [selectedModel, setSelectedModel] = useState<string>("");
   const [selectedVideos, setSelectedVideos] = useState<string[]>([]);
@@ -162,6 +171,14 @@ export default function ChatBar({ onSend, canSend }: ChatBarProps) {
   const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
   const [modelCapabilities, setModelCapabilities] = useState<string[]>([]);
 
+  useEffect(() => {
+    if (selectedModel) {
+      preloadModel(selectedModel).catch((err) =>
+        console.error("Failed to preload model:", err)
+      );
+    }
+  }, [selectedModel]);
+
   useEffect(() => {
     if (!modelCapabilities.includes("thinking")) {
       setIsThinkingEnabled(false);
@@ -261,37 +278,49 @@ export default function ChatBar({ onSend, canSend }: ChatBarProps) {
               selectedFiles={selectedFiles}
               setSelectedVideoMode={setSelectedVideoMode}
             />
-            {/* Send button with tooltip */}
-            <Tooltip>
-              <TooltipTrigger asChild>
-                <Button
-                  size="sm"
-                  className="gap-1.5 cursor-pointer"
-                  type="submit"
-                  disabled={!canSend || selectedModel === ""}
-                >
-                  {canSend && selectedModel !== "" ? (
-                    <>
-                      <span className="font-semibold">Send</span>
-                      <CornerDownLeft className="size-3.5" />
-                    </>
-                  ) : (
-                    <>
-                      <span className="font-semibold">Loading...</span>
-                      <Loader2 className="size-3.5 animate-spin" />
-                    </>
-                  )}
-                </Button>
-              </TooltipTrigger>
-              <TooltipContent side="top">
-                <p className="text-white text-xs flex items-center gap-1 whitespace-nowrap">
-                  Press{" "}
-                  <kbd className="ml-1 z-10 bg-muted text-muted-foreground pointer-events-none inline-flex h-5 items-center gap-1 rounded border px-1.5 font-mono font-medium opacity-100 select-none">
-                    ⌘ Enter
-                  </kbd>
-                </p>
-              </TooltipContent>
-            </Tooltip>
+            {/* Stop button while an answer is streaming */}
+            {isGenerating && onStop ? (
+              <Button
+                size="sm"
+                className="gap-1.5 cursor-pointer"
+                type="button"
+                onClick={onStop}
+              >
+                <span className="font-semibold">Stop</span>
+                <Square className="size-3.5" />
+              </Button>
+            ) : (
+              <Tooltip>
+                <TooltipTrigger asChild>
+                  <Button
+                    size="sm"
+                    className="gap-1.5 cursor-pointer"
+                    type="submit"
+                    disabled={!canSend || selectedModel === ""}
+                  >
+                    {canSend && selectedModel !== "" ? (
+                      <>
+                        <span className="font-semibold">Send</span>
+                        <CornerDownLeft className="size-3.5" />
+                      </>
+                    ) : (
+                      <>
+                        <span className="font-semibold">Loading...</span>
+                        <Loader2 className="size-3.5 animate-spin" />
+                      </>
+                    )}
+                  </Button>
+                </TooltipTrigger>
+                <TooltipContent side="top">
+                  <p className="text-white text-xs flex items-center gap-1 whitespace-nowrap">
+                    Press{" "}
+                    <kbd className="ml-1 z-10 bg-muted text-muted-foreground pointer-events-none inline-flex h-5 items-center gap-1 rounded border px-1.5 font-mono font-medium opacity-100 select-none">
+                      ⌘ Enter
+                    </kbd>
+                  </p>
+                </TooltipContent>
+              </Tooltip>
+            )}
           </div>
         </div>
       </form>
@@ -15,6 +15,7 @@ import {
   BetweenHorizontalEnd,
   PictureInPicture,
   FileText,
+  FileClock,
 } from "lucide-react";
 import { Hourglass, MutatingDots } from "react-loader-spinner";
 
@@ -60,6 +61,11 @@ const stateDescriptions: StateDescriptions = {
     description: "Loading the {model} model for response generation",
     icon: Waypoints,
   },
+  waiting_for_files: {
+    title: "Waiting for Files",
+    description: "Waiting for {file_count} attachments to finish uploading",
+    icon: FileClock,
+  },
   processing_pdfs: {
     title: "Processing PDFs",
     description: "Extracting text and images from {file_count} PDFs",
@@ -16,6 +16,7 @@ import {
 } from "@/components/ui/file-upload";
 import { useState, useCallback } from "react";
 import { toast } from "sonner";
+import { isAxiosError } from "axios";
 import { uploadLocalVideo } from "@/services/media";
 
 interface FileUploaderProps {
@@ -41,17 +42,26 @@ export function FileUploader({ onUploadComplete }: FileUploaderProps) {
       try {
         const uploadPromises = files.map(async (file) => {
           try {
-            await uploadLocalVideo(file, (progress) => {
+            const result = await uploadLocalVideo(file, (progress) => {
               onProgress(file, progress);
             });
             onSuccess(file);
-            toast.success(`${file.name} uploaded successfully`);
+            if (result.status === "duplicate") {
+              toast.info(result.message);
+            } else {
+              toast.success(`${file.name} uploaded successfully`);
+            }
           } catch (error) {
             onError(
               file,
               error instanceof Error ? error : new Error("Upload failed")
             );
-            toast.error(`${file.name} failed to upload`);
+            // A different video with the same name is already in the library
+            if (isAxiosError(error) && error.response?.status === 409) {
+              toast.error(error.response.data.detail);
+            } else {
+              toast.error(`${file.name} failed to upload`);
+            }
           }
         });
 
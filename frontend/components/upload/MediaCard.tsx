@@ -28,9 +28,10 @@ interface MediaItem {
 interface MediaCardProps {
   item: MediaItem;
   onDelete: (item: MediaItem) => void;
+  onCancel?: (item: MediaItem) => void;
 }
 
-export function MediaCard({ item, onDelete }: MediaCardProps) {
+export function MediaCard({ item, onDelete, onCancel }: MediaCardProps) {
   const [isDeleteDialogOpen, setIsDeleteDialogOpen] = useState(false);
 
   const handleDelete = () => {
@@ -92,6 +93,16 @@ export function MediaCard({ item, onDelete }: MediaCardProps) {
                     )}
                     {item.status}
                   </Button>
+                  {item.status === "Downloading" && onCancel && (
+                    <Button
+                      variant="ghost"
+                      className="rounded-full cursor-pointer text-xs ml-2 hover:text-red-500 hover:bg-red-100"
+                      aria-label={`Cancel import of ${item.title}`}
+                      onClick={() => onCancel(item)}
+                    >
+                      <XCircle className="w-4 h-4" />
+                    </Button>
+                  )}
                   {item.status === "Failed" && (
                     <Button
                       variant="ghost"
@@ -53,8 +53,8 @@ export function YouTubeSearch() {
 
   const handleImport = async () => {
     try {
-      await uploadYoutubeVideo(downloadUrl);
-      toast.success("Video uploaded successfully");
+      const result = await uploadYoutubeVideo(downloadUrl);
+      toast.success(`Importing ${result.filename}`);
     } catch (error) {
       toast.error("Error uploading video");
     }
@@ -1,6 +1,13 @@
 import { uploadFile } from "@/services/chat";
 import { useRef, useEffect, useState } from "react";
 
+// Channels of binary stream frames, identified by their first byte
+const BINARY_CHANNELS: Record<number, string> = {
+  0x74: "thinking", // "t"
+  0x6d: "markdown", // "m"
+};
+const textDecoder = new TextDecoder();
+
 export function useChatWebSocket(
   onMessage: (data: any) => void,
   shouldConnect: boolean = true
@@ -9,6 +16,7 @@ export function useChatWebSocket(
   const [canSend, setCanSend] = useState(false); // Ready state for sending messages
   const [error, setError] = useState<string | null>(null);
   const [isConnecting, setIsConnecting] = useState(false);
+  const [isGenerating, setIsGenerating] = useState(false);
 
   useEffect(() => {
     // Only connect if shouldConnect is true
@@ -24,10 +32,15 @@ export function useChatWebSocket(
         }
 
         ws.current = new WebSocket("ws://localhost:8001/chat/ws");
+        ws.current.binaryType = "arraybuffer";
         setIsConnecting(true);
         setError(null);
 
         ws.current.onopen = () => {
+          // Streamed answer content arrives as compact binary frames
+          ws.current?.send(
+            JSON.stringify({ type: "negotiate", stream_protocol: "binary" })
+          );
           setCanSend(true);
           setIsConnecting(false);
           console.log("WebSocket connection established for chat");
@@ -35,11 +48,27 @@ export function useChatWebSocket(
 
         ws.current.onmessage = (event) => {
           try {
+            if (event.data instanceof ArrayBuffer) {
+              const bytes = new Uint8Array(event.data);
+              onMessage({
+                type: BINARY_CHANNELS[bytes[0]],
+                content: textDecoder.decode(bytes.subarray(1)),
+              });
+              return;
+            }
+
             const data = JSON.parse(event.data);
+            if (data.type === "negotiated") {
+              return;
+            }
             onMessage(data);
             // Allow sending messages after receiving any message
             if (data.done) {
               setCanSend(true);
+              setIsGenerating(false);
+              if (data.trace) {
+                console.debug("Answer trace:", data.trace);
+              }
             }
           } catch (parseError) {
             console.error("Error parsing WebSocket message:", parseError);
@@ -48,6 +77,7 @@ export function useChatWebSocket(
 
         ws.current.onclose = (event) => {
           setCanSend(false);
+          setIsGenerating(false);
           setIsConnecting(false);
           console.log("WebSocket connection closed", event.code, event.reason);
 
@@ -109,18 +139,30 @@ export function useChatWebSocket(
           model: model,
           video_mode: videoMode,
           files: fileNames,
+          // Development builds ask for the request's timing breakdown
+          trace: process.env.NODE_ENV === "development",
         })
       );
       console.log("Message sent:", message);
       setCanSend(false); // Disable sending until we receive a response
+      setIsGenerating(true);
     } else {
       console.error("WebSocket not open. Ready state:", ws.current?.readyState);
       setError("Cannot send message - WebSocket not connected");
     }
   };
 
+  // Abort the answer in progress, the server replies with a final done frame
+  const stopGeneration = () => {
+    if (ws.current?.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ type: "stop" }));
+    }
+  };
+
   return {
     sendMessage,
+    stopGeneration,
+    isGenerating,
     canSend,
     error,
     isConnecting,
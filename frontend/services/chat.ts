@@ -12,6 +12,22 @@ export async function fetchChatMessages(chatId: number) {
   return response.data.messages;
 }
 
+export async function fetchChatMessagesPage(
+  chatId: number,
+  before?: number,
+  limit: number = 50
+) {
+  const params = new URLSearchParams({
+    chat_id: String(chatId),
+    limit: String(limit),
+  });
+  if (before !== undefined) {
+    params.set("before", String(before));
+  }
+  const response = await axiosClient.get(`/chat/messages?${params}`);
+  return response.data;
+}
+
 export async function createNewChat(chatName?: string, firstMessage?: string) {
   const response = await axiosClient.post(`/chat/create_chat`, {
     chat_name: chatName,
@@ -55,6 +71,13 @@ export async function updatePlannerModel(model_name: string) {
   return response.data;
 }
 
+export async function preloadModel(model_name: string) {
+  const response = await axiosClient.post(
+    `/chat/preload_model?model_name=${encodeURIComponent(model_name)}`
+  );
+  return response.data;
+}
+
 export async function getModelCapabilities(model_name: string) {
   const response = await axiosClient.get(
     `/chat/get_model_capabilities?model_name=${encodeURIComponent(model_name)}`
@@ -21,13 +21,27 @@ export async function listUploadedVideos(): Promise<VideoDetails[]> {
   return response.data;
 }
 
-export async function uploadYoutubeVideo(url: string): Promise<VideoResponse> {
+export interface YouTubeImportResponse extends VideoResponse {
+  job_id: string;
+  filename: string;
+}
+
+export async function uploadYoutubeVideo(
+  url: string
+): Promise<YouTubeImportResponse> {
   const response = await axiosClient.post(
     `/media/upload/youtube_video?url=${encodeURIComponent(url)}`
   );
   return response.data;
 }
 
+export async function cancelYoutubeImport(
+  jobId: string
+): Promise<VideoResponse> {
+  const response = await axiosClient.delete(`/media/youtube_imports/${jobId}`);
+  return response.data;
+}
+
 export async function checkYouTubeVideo(url: string): Promise<{
   downloadable: boolean;
   url: string;